@@ -1,4 +1,5 @@
-from conans import ConanFile, CMake, tools
+from conans import ConanFile, tools
+import json, os
 
 class MediaIPCUe4Conan(ConanFile):
     name = "MediaIPC-ue4"
@@ -7,15 +8,27 @@ class MediaIPCUe4Conan(ConanFile):
     url = "https://github.com/adamrehn/ue4-conan-recipes/MediaIPC-ue4"
     description = "libMediaIPC custom build for Unreal Engine 4"
     settings = "os", "compiler", "build_type", "arch"
-    default_options = "boost:header_only=True"
+    options = {"gc_sections": [True, False]}
+    default_options = ("boost:header_only=True", "gc_sections=False")
     generators = "cmake",
     requires = (
         "libcxx/ue4@adamrehn/profile",
         "boost/1.69.0"
     )
     
+    def config_options(self):
+        
+        # Section garbage collection is only supported by GCC-compatible toolchains
+        if self.settings.os == "Windows":
+            del self.options.gc_sections
+    
+    def build_requirements(self):
+        self.build_requires("buildhelper-ue4/0.0.1@{}/{}".format(self.user, self.channel))
+    
     def source(self):
-        self.run("git clone --depth=1 https://github.com/adamrehn/MediaIPC.git -b v{}".format(self.version))
+        from build_helper import BuildTrace, SourceCache
+        with BuildTrace(self).phase("source"):
+            SourceCache(self).clone("https://github.com/adamrehn/MediaIPC.git", ref="v{}".format(self.version))
     
     def build(self):
         
@@ -24,10 +37,21 @@ class MediaIPCUe4Conan(ConanFile):
         LibCxx.set_vars(self)
         
         # Build libMediaIPC
-        cmake = CMake(self)
-        cmake.configure(source_folder="MediaIPC", args=["-DBUILD_EXAMPLES=OFF"])
-        cmake.build()
-        cmake.install()
+        from build_helper import RecipeBuild
+        build = RecipeBuild(self, memory_per_job=512, build_size=128, folders=["MediaIPC"])
+        cmake = build.cmake()
+        with build.phase("configure"):
+            cmake.configure(source_folder="MediaIPC", build_folder=build.build_folder, args=["-DBUILD_EXAMPLES=OFF"])
+        with build.phase("compile"):
+            cmake.build()
+        with build.phase("install"):
+            cmake.install()
+        build.finish()
+    
+    def package(self):
+        from build_helper import PackageManifest
+        PackageManifest(self).write()
     
     def package_info(self):
-        self.cpp_info.libs = tools.collect_libs(self)
+        manifest = os.path.join(self.package_folder, "package-info.json")
+        self.cpp_info.libs = json.loads(tools.load(manifest))["libs"] if os.path.exists(manifest) else tools.collect_libs(self)
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# Builds the recipes in this repository concurrently, following the dependency graph declared by their `requirements()` and `build_requirements()` methods.
+#
+# Recipes that don't depend on one another are built at the same time, and the total number of parallel compiler
+# jobs across all of the concurrent builds is bounded by a shared budget of job tokens. Each build acquires tokens
+# before it starts and returns them when it completes, and passes the number of tokens it holds to the recipe via the
+# `UE4_CONAN_MAX_JOBS` environment variable, which `JobPolicy` treats as an upper bound. If this script is itself run
+# by GNU make (e.g. from a Makefile rule prefixed with `+`) then the tokens are drawn from make's jobserver, so the
+# recipe builds share the job budget of the enclosing build.
+#
+# Usage: build_all.py [--jobs N] [--user USER] [--channel CHANNEL] [--profile PROFILE] [PACKAGE[==VERSION] ...]
+import argparse, ast, glob, os, queue, re, subprocess, sys, threading, time
+
+# The interval (in seconds) at which the scheduler polls for available job tokens while waiting for builds to complete
+_POLL_INTERVAL = 0.5
+
+# Returns the value of an AST node if it is a string literal, or the string on which `.format()` is called, or None otherwise
+def _string_literal(node):
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "format":
+        node = node.func.value
+    if type(node).__name__ in ["Constant", "Str"]:
+        value = getattr(node, "value", getattr(node, "s", None))
+        return value if isinstance(value, str) else None
+    return None
+
+# Parses a recipe and returns the `name/version` references of all of the packages that it requires, including its build requirements
+# (Requirements are extracted from the source code rather than by loading the recipe, so conditional requirements are always included)
+def _parse_requirements(conanfile):
+    with open(conanfile, "r") as f:
+        tree = ast.parse(f.read(), filename=conanfile)
+    
+    references = []
+    for node in ast.walk(tree):
+        
+        # Requirements declared by the `requires` or `build_requires` attributes, which may be a single string or a tuple of strings
+        if isinstance(node, ast.Assign) and any([isinstance(target, ast.Name) and target.id in ["requires", "build_requires"] for target in node.targets]):
+            values = node.value.elts if isinstance(node.value, (ast.Tuple, ast.List)) else [node.value]
+            references.extend([_string_literal(value) for value in values])
+        
+        # Requirements declared by calls to `self.requires()` or `self.build_requires()`
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in ["requires", "build_requires"] and len(node.args) > 0:
+            references.append(_string_literal(node.args[0]))
+    
+    return [reference.split("@")[0] for reference in references if reference is not None]
+
+# Discovers the recipes in the specified directory, returning a dictionary that maps `name/version` references
+# to the (recipe directory, dependencies) details of each recipe, where dependencies are limited to other recipes
+def discover_recipes(root):
+    recipes = {}
+    for conanfile in sorted(glob.glob(os.path.join(root, "*", "*", "conanfile.py"))):
+        directory = os.path.dirname(conanfile)
+        reference = "{}/{}".format(os.path.basename(os.path.dirname(directory)), os.path.basename(directory))
+        recipes[reference] = (directory, _parse_requirements(conanfile))
+    
+    return {
+        reference: (directory, sorted(set([dependency for dependency in dependencies if dependency in recipes])))
+        for reference, (directory, dependencies) in recipes.items()
+    }
+
+# Selects the recipes matching the specified `NAME` or `NAME==VERSION` specifiers, along with all of their dependencies
+def select_recipes(recipes, specifiers):
+    selected = set()
+    pending = []
+    for specifier in specifiers:
+        name, _, version = specifier.partition("==")
+        matches = [reference for reference in recipes if reference.split("/")[0] == name and version in ["", reference.split("/")[1]]]
+        if len(matches) == 0:
+            raise RuntimeError("no recipe found matching \"{}\"".format(specifier))
+        pending.extend(matches)
+    
+    while len(pending) > 0:
+        reference = pending.pop()
+        if reference not in selected:
+            selected.add(reference)
+            pending.extend(recipes[reference][1])
+    
+    return {reference: recipes[reference] for reference in selected}
+
+# Computes the length of the longest chain of dependents for each recipe, which is used to prioritise the recipes on the critical path
+def _critical_path_lengths(recipes):
+    lengths = {}
+    def length(reference):
+        if reference not in lengths:
+            dependents = [other for other, (directory, dependencies) in recipes.items() if reference in dependencies]
+            lengths[reference] = 1 + max([length(dependent) for dependent in dependents] + [0])
+        return lengths[reference]
+    for reference in recipes:
+        length(reference)
+    return lengths
+
+# Verifies that the dependency graph contains no cycles, raising an error if it does
+def _check_acyclic(recipes):
+    visiting, visited = set(), set()
+    def visit(reference, chain):
+        if reference in visiting:
+            raise RuntimeError("dependency cycle detected: {}".format(" -> ".join(chain + [reference])))
+        if reference not in visited:
+            visiting.add(reference)
+            for dependency in recipes[reference][1]:
+                visit(dependency, chain + [reference])
+            visiting.remove(reference)
+            visited.add(reference)
+    for reference in sorted(recipes):
+        visit(reference, [])
+
+# Determines the Conan channel used by conan-ue4cli for the current engine version (e.g. "4.27")
+def default_channel():
+    try:
+        return subprocess.run(["ue4", "version", "short"], stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        raise RuntimeError("could not determine the engine version using ue4cli, please specify the Conan channel with --channel")
+
+
+class JobTokens():
+    '''
+    A budget of job tokens that is shared between the concurrent recipe builds.
+    
+    By default the budget is a simple counter, but if the `MAKEFLAGS` environment variable indicates that we are running
+    under a GNU make jobserver then tokens beyond the first are read from and returned to the jobserver instead.
+    '''
+    
+    def __init__(self, jobs):
+        '''
+        Creates a new budget of the specified number of tokens, joining the enclosing GNU make jobserver if there is one
+        '''
+        self.jobs = jobs
+        self._available = jobs
+        self._implicit = True
+        self._reader, self._writer = self._open_jobserver(os.environ.get("MAKEFLAGS", ""))
+    
+    def acquire(self):
+        '''
+        Attempts to acquire a token without blocking, returning the token or None if no tokens are available
+        '''
+        
+        # When running under a jobserver, we hold one implicit token and must read any others from the jobserver
+        if self._reader is not None:
+            if self._implicit:
+                self._implicit = False
+                return b""
+            try:
+                token = os.read(self._reader, 1)
+                return token if len(token) > 0 else None
+            except BlockingIOError:
+                return None
+        
+        if self._available > 0:
+            self._available -= 1
+            return b""
+        return None
+    
+    def release(self, token):
+        '''
+        Returns a token to the budget
+        '''
+        if self._reader is not None:
+            if len(token) == 0:
+                self._implicit = True
+            else:
+                os.write(self._writer, token)
+        else:
+            self._available += 1
+    
+    def _open_jobserver(self, makeflags):
+        '''
+        Opens our own non-blocking connection to the jobserver described by the supplied make flags, if any
+        '''
+        auth = re.findall(r"--jobserver-(?:auth|fds)=(\S+)", makeflags)
+        if len(auth) == 0 or re.search(r"(^|\s)-j1?(\s|$)", makeflags):
+            return None, None
+        
+        try:
+            
+            # Named pipe jobservers are used by GNU make 4.4 and newer
+            if auth[-1].startswith("fifo:"):
+                fifo = auth[-1][len("fifo:") :]
+                return os.open(fifo, os.O_RDONLY | os.O_NONBLOCK), os.open(fifo, os.O_WRONLY)
+            
+            # Anonymous pipe jobservers are re-opened via procfs so that our non-blocking reads don't affect make's own reads
+            reader, writer = [int(fd) for fd in auth[-1].split(",")]
+            return (
+                os.open("/proc/self/fd/{}".format(reader), os.O_RDONLY | os.O_NONBLOCK),
+                os.open("/proc/self/fd/{}".format(writer), os.O_WRONLY)
+            )
+        
+        except (OSError, ValueError):
+            print("Warning: could not connect to the GNU make jobserver, using a private budget of {} jobs".format(self.jobs), file=sys.stderr)
+            return None, None
+
+
+class Scheduler():
+    '''
+    Builds a set of recipes in dependency order, running independent builds concurrently within a shared job budget
+    '''
+    
+    def __init__(self, recipes, tokens, command, logs):
+        '''
+        Creates a new Scheduler for the specified recipes, job budget, base build command and log directory
+        '''
+        self.recipes = recipes
+        self.tokens = tokens
+        self.command = command
+        self.logs = logs
+        self.priorities = _critical_path_lengths(recipes)
+    
+    def run(self):
+        '''
+        Builds all of the recipes and returns the lists of recipes that failed and recipes that were skipped as a result
+        '''
+        pending = set(self.recipes)
+        built, failed, skipped = set(), [], []
+        running = {}
+        completions = queue.Queue()
+        os.makedirs(self.logs, exist_ok=True)
+        
+        while len(pending) > 0 or len(running) > 0:
+            
+            # Skip any recipes whose dependencies failed to build
+            for reference in sorted(pending):
+                if any([dependency in failed or dependency in skipped for dependency in self.recipes[reference][1]]):
+                    print("[skipped] {} (a dependency failed to build)".format(reference), flush=True)
+                    pending.remove(reference)
+                    skipped.append(reference)
+            
+            # Start as many of the ready recipes as the job budget allows, prioritising the recipes on the critical path
+            ready = [reference for reference in pending if all([dependency in built for dependency in self.recipes[reference][1]])]
+            ready = sorted(ready, key=lambda reference: (-self.priorities[reference], reference))
+            for index, reference in enumerate(ready):
+                held = self._acquire(len(ready) - index + len(running))
+                if len(held) == 0:
+                    break
+                pending.remove(reference)
+                running[reference] = held
+                thread = threading.Thread(target=self._build, args=(reference, len(held), completions), daemon=True)
+                thread.start()
+            
+            # Wait for a build to complete, polling periodically so we can pick up tokens released by other jobserver clients
+            if len(running) == 0:
+                if len(pending) > 0 and len(ready) > 0:
+                    time.sleep(_POLL_INTERVAL)
+                continue
+            try:
+                reference, succeeded = completions.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            for token in running.pop(reference):
+                self.tokens.release(token)
+            if succeeded:
+                built.add(reference)
+            else:
+                failed.append(reference)
+        
+        return failed, skipped
+    
+    def _acquire(self, contenders):
+        '''
+        Acquires a fair share of the available tokens for a build, given the number of builds contending for them
+        '''
+        share = max(1, -(-self.tokens.jobs // max(1, contenders)))
+        held = []
+        while len(held) < share:
+            token = self.tokens.acquire()
+            if token is None:
+                break
+            held.append(token)
+        return held
+    
+    def _build(self, reference, jobs, completions):
+        '''
+        Builds a single recipe using the specified number of jobs, reporting the result via the completions queue
+        '''
+        directory = self.recipes[reference][0]
+        logFile = os.path.join(self.logs, "{}.log".format(reference.replace("/", "-")))
+        print("[started] {} ({} jobs, log: {})".format(reference, jobs, logFile), flush=True)
+        
+        # Limit the recipe to the jobs we hold, and prevent the build tools from joining any enclosing jobserver
+        # (The recipe's own build tools could otherwise draw additional tokens beyond those we have allocated to it)
+        environment = dict(os.environ)
+        environment["UE4_CONAN_MAX_JOBS"] = str(jobs)
+        environment.pop("MAKEFLAGS", None)
+        environment.pop("MFLAGS", None)
+        
+        started = time.time()
+        try:
+            with open(logFile, "w") as log:
+                returncode = subprocess.run(
+                    self.command[:2] + [directory] + self.command[2:],
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    env=environment
+                ).returncode
+        except OSError as e:
+            with open(logFile, "a") as log:
+                log.write("Failed to run {}: {}\n".format(self.command[0], e))
+            returncode = -1
+        
+        succeeded = returncode == 0
+        print("[{}] {} ({:.1f}s)".format("finished" if succeeded else "FAILED", reference, time.time() - started), flush=True)
+        completions.put((reference, succeeded))
+
+
+# Builds the recipes in this repository concurrently
+def main():
+    parser = argparse.ArgumentParser(description="Builds the recipes in this repository concurrently, following their dependency graph")
+    parser.add_argument("packages", nargs="*", help="packages to build, specified as NAME or NAME==VERSION (defaults to all packages)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="total number of parallel jobs across all builds (defaults to the number of CPU cores)")
+    parser.add_argument("--user", default="adamrehn", help="Conan user for the built packages (defaults to adamrehn)")
+    parser.add_argument("--channel", default=None, help="Conan channel for the built packages (defaults to the engine version reported by ue4cli)")
+    parser.add_argument("--profile", default=None, help="Conan profile to build with (defaults to Conan's default profile)")
+    parser.add_argument("--logs", default="logs", help="directory in which the build logs are written (defaults to ./logs)")
+    parser.add_argument("--dry-run", action="store_true", help="print the dependency graph without building anything")
+    args = parser.parse_args()
+    
+    try:
+        
+        # Discover the recipes and select the ones we are building
+        recipes = discover_recipes(os.path.dirname(os.path.abspath(__file__)))
+        if len(args.packages) > 0:
+            recipes = select_recipes(recipes, args.packages)
+        _check_acyclic(recipes)
+        
+        # Print the dependency graph if requested
+        if args.dry_run:
+            priorities = _critical_path_lengths(recipes)
+            for reference in sorted(recipes, key=lambda reference: (-priorities[reference], reference)):
+                print("{} (critical path length {}) <- {}".format(reference, priorities[reference], ", ".join(recipes[reference][1]) or "no dependencies"))
+            return
+        
+        # Build the recipes
+        channel = args.channel if args.channel is not None else default_channel()
+        command = ["conan", "create", "{}/{}".format(args.user, channel)] + (["--profile", args.profile] if args.profile is not None else [])
+        scheduler = Scheduler(recipes, JobTokens(max(1, args.jobs)), command, os.path.abspath(args.logs))
+        failed, skipped = scheduler.run()
+    
+    except RuntimeError as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        sys.exit(1)
+    
+    # Report any failures
+    if len(failed) > 0:
+        print("Failed to build: {}".format(", ".join(sorted(failed))), file=sys.stderr)
+        if len(skipped) > 0:
+            print("Skipped: {}".format(", ".join(sorted(skipped))), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1427 @@
+import atexit, concurrent.futures, contextlib, glob, hashlib, json, os, shlex, shutil, subprocess, tempfile, threading, time
+
+# Resource usage statistics for child processes are only available under Unix platforms
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# File locking is provided by different modules under Windows and other platforms
+try:
+    import fcntl
+except ImportError:
+    import msvcrt
+    fcntl = None
+
+# The statistics counters reported by ccache that represent cache hits and misses
+_CACHE_HITS = ["direct_cache_hit", "preprocessed_cache_hit"]
+_CACHE_MISSES = ["cache_miss"]
+
+# The environment variables that influence the flags passed to the compiler
+_COMPILER_VARIABLES = ["CC", "CXX", "CFLAGS", "CXXFLAGS", "CPPFLAGS", "LDFLAGS"]
+
+# Reads the contents of a small text file (such as a cgroup or procfs entry), returning None if the file cannot be read
+def _read_file(filename):
+    try:
+        with open(filename, "r") as f:
+            return f.read().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+# Runs git with the specified arguments and returns its output, raising an error that includes git's diagnostics if it fails
+def _git(args, cwd=None):
+    result = subprocess.run(["git"] + args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError("git {} failed: {}".format(" ".join(args), result.stderr.strip()))
+    return result.stdout.strip()
+
+# Runs a command-line tool with the specified arguments, raising an error that includes the tool's diagnostics if it fails
+def _run_tool(args):
+    result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError("{} failed: {}".format(" ".join(args), result.stderr.strip()))
+    return result.stdout.strip()
+
+# Lists the (path, name, URL) details of the submodules declared by the repository in the specified directory,
+# resolving relative submodule URLs against the URL of the repository itself
+def _list_submodules(directory, url):
+    if not os.path.exists(os.path.join(directory, ".gitmodules")):
+        return []
+    try:
+        paths = _git(["config", "-f", ".gitmodules", "--get-regexp", r"^submodule\..*\.path$"], cwd=directory)
+    except RuntimeError:
+        return []
+    submodules = []
+    for line in paths.splitlines():
+        key, path = line.split(" ", 1)
+        name = key[len("submodule.") : -len(".path")]
+        submoduleUrl = _git(["config", "-f", ".gitmodules", "submodule.{}.url".format(name)], cwd=directory)
+        if submoduleUrl.startswith("./") or submoduleUrl.startswith("../"):
+            base = url.rstrip("/")
+            for component in submoduleUrl.split("/"):
+                if component == "..":
+                    base = base.rsplit("/", 1)[0]
+                elif component != ".":
+                    base = base + "/" + component
+            submoduleUrl = base
+        submodules.append((path, name, submoduleUrl))
+    return submodules
+
+# Holds an exclusive lock on the specified lock file for the duration of a `with` block, so concurrent builds can share the caches
+@contextlib.contextmanager
+def _locked(filename):
+    with open(filename, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+# Computes the total resident set size (in bytes) of the specified process and all of its descendants,
+# returning None if the process table cannot be read (i.e. on platforms other than Linux)
+def _process_tree_rss(pid):
+    try:
+        pids = [int(entry) for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return None
+    
+    # Build the tree of parent-child relationships (the parent PID is the second field after the parenthesised command name)
+    children = {}
+    for child in pids:
+        stat = _read_file("/proc/{}/stat".format(child))
+        if stat is not None:
+            parent = int(stat[stat.rindex(")") + 1 :].split()[1])
+            children.setdefault(parent, []).append(child)
+    
+    # Sum the resident pages of the process and its descendants
+    total = 0
+    pending = [pid]
+    while len(pending) > 0:
+        current = pending.pop()
+        statm = _read_file("/proc/{}/statm".format(current))
+        if statm is not None:
+            total += int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        pending.extend(children.get(current, []))
+    return total
+
+# Computes the total size (in bytes) of the files in the specified directory and its subdirectories, without following symlinks
+def _directory_size(directory):
+    total = 0
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            try:
+                total += os.lstat(os.path.join(root, file)).st_size
+            except OSError:
+                pass
+    return total
+
+# Computes the SHA-256 hash of the contents of the specified file
+def _hash_file(filename):
+    sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+# Returns the path to the specified program from the compiler's toolchain, falling back to searching the PATH,
+# or None if the program cannot be found
+def _toolchain_program(name):
+    compiler = os.environ.get("CC", "clang").split(" ")[-1]
+    try:
+        path = subprocess.run(
+            [compiler, "-print-prog-name={}".format(name)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        path = ""
+    
+    # Clang returns the program name unmodified if it isn't found in the toolchain directories
+    return path if os.path.isabs(path) and os.path.exists(path) else shutil.which(name)
+
+
+class CompilerCache():
+    '''
+    Provides opt-in integration with ccache (or any ccache-compatible compiler launcher) for recipe builds.
+    
+    The cache is enabled by setting the `UE4_CONAN_COMPILER_CACHE` environment variable to the name or path
+    of the launcher (e.g. `ccache`), and the cache directory can be shared between builds and build agents
+    by setting the `UE4_CONAN_COMPILER_CACHE_DIR` environment variable. Recipes use the cache like so:
+    
+    ```
+    from build_helper import CompilerCache
+    cache = CompilerCache(self)
+    cmake = CMake(self)
+    cache.enable(cmake)
+    cmake.configure()
+    cmake.build()
+    cache.report()
+    ```
+    
+    The compiler interposition performed by `LibCxx.set_vars()` injects flags that ccache cannot see on
+    the command line, so ccache's compiler check is replaced with a hash of the libc++ toolchain identity.
+    '''
+    
+    def __init__(self, conanfile):
+        '''
+        Creates a new CompilerCache for the supplied recipe, which is disabled unless the launcher has been configured
+        '''
+        self.conanfile = conanfile
+        self.launcher = None
+        self._statslog = None
+        self._before = None
+        
+        # Compiler launchers are not supported by the Visual Studio generators or nmake builds used under Windows
+        launcher = os.environ.get("UE4_CONAN_COMPILER_CACHE", "")
+        if launcher == "" or conanfile.settings.os == "Windows":
+            return
+        
+        # Verify that the launcher exists
+        self.launcher = shutil.which(launcher)
+        if self.launcher is None:
+            conanfile.output.warn("Compiler cache launcher \"{}\" not found, building without the compiler cache".format(launcher))
+    
+    @property
+    def enabled(self):
+        '''
+        Determines whether the compiler cache is enabled for this build
+        '''
+        return self.launcher is not None
+    
+    def enable(self, cmake=None):
+        '''
+        Enables the compiler cache for the remainder of the build. This must be called after `LibCxx.set_vars()`,
+        so that the toolchain identity reflects the libc++ compiler interposition.
+        
+        If a CMake object is supplied then it is configured to use the cache as its compiler launcher, otherwise
+        the `CC` and `CXX` environment variables are prefixed with the launcher, as required for autotools builds.
+        
+        This can be called once for each CMake object that a build uses (e.g. for the instrumented and optimised
+        stages of a PGO build), and the statistics reported by `report()` cover every compilation since the first call.
+        '''
+        if not self.enabled:
+            return
+        
+        # Configure ccache, recording the result of each compilation in a log file so we can report statistics for just this build
+        # (Paths under the build folder are rewritten as relative paths, so that builds in different folders can share cache entries)
+        if self._statslog is None:
+            self._statslog = os.path.join(self.conanfile.build_folder, "ccache-stats.log")
+            if os.path.exists(self._statslog):
+                os.unlink(self._statslog)
+            os.environ["CCACHE_BASEDIR"] = self.conanfile.build_folder
+            os.environ["CCACHE_STATSLOG"] = self._statslog
+            if os.environ.get("UE4_CONAN_COMPILER_CACHE_DIR", "") != "":
+                os.environ["CCACHE_DIR"] = os.environ["UE4_CONAN_COMPILER_CACHE_DIR"]
+            self._before = self._stats()
+        
+        # The toolchain identity is refreshed on each call, since the compiler flags may have changed since the previous one
+        os.environ["CCACHE_COMPILERCHECK"] = "string:" + self.toolchain_identity()
+        
+        # Wrap the compiler invocations (taking care not to wrap the autotools compilers more than once)
+        if cmake is not None:
+            cmake.definitions["CMAKE_C_COMPILER_LAUNCHER"] = self.launcher
+            cmake.definitions["CMAKE_CXX_COMPILER_LAUNCHER"] = self.launcher
+        else:
+            for variable, default in [("CC", "cc"), ("CXX", "c++")]:
+                compiler = os.environ.get(variable, default)
+                if not compiler.startswith(self.launcher + " "):
+                    os.environ[variable] = "{} {}".format(self.launcher, compiler)
+    
+    def toolchain_identity(self):
+        '''
+        Computes a hash identifying the compiler toolchain, including the UE4 libc++ package and the compiler interposition
+        '''
+        sha = hashlib.sha256()
+        
+        # The path to the libc++ package includes its package ID, which identifies the UE4 version and bundled toolchain
+        settings = self.conanfile.settings
+        deps = self.conanfile.deps_cpp_info
+        libcxx = deps["libcxx"].rootpath if "libcxx" in deps.deps else ""
+        sha.update("\n".join([libcxx, str(settings.compiler), str(settings.compiler.version), str(settings.arch)]).encode("utf-8"))
+        
+        # Include the compiler flags and the contents of the compiler executables (or the interposition scripts that wrap them)
+        # (Any launcher prefix added to the autotools compilers by a previous call to `enable()` is ignored)
+        environment = {variable: os.environ.get(variable, "") for variable in _COMPILER_VARIABLES}
+        for variable in ["CC", "CXX"]:
+            if environment[variable].startswith(str(self.launcher) + " "):
+                environment[variable] = environment[variable][len(self.launcher) + 1:]
+        for variable in _COMPILER_VARIABLES:
+            sha.update("\n{}={}".format(variable, environment[variable]).encode("utf-8"))
+        for variable in ["CC", "CXX"]:
+            compiler = shutil.which(environment[variable].split(" ")[0] or ("cc" if variable == "CC" else "c++"))
+            if compiler is not None:
+                sha.update(_hash_file(compiler).encode("utf-8"))
+        
+        return sha.hexdigest()
+    
+    def report(self):
+        '''
+        Reports the cache hit and miss statistics for the build
+        '''
+        if not self.enabled:
+            return
+        
+        # Count the results recorded in the stats log if the launcher supports it (ccache 4.0 and newer),
+        # falling back to the difference between the cache statistics before and after the build
+        if os.path.exists(self._statslog):
+            with open(self._statslog, "r") as f:
+                results = [line.strip() for line in f.readlines() if not line.startswith("#")]
+            hits = len([result for result in results if result in _CACHE_HITS])
+            misses = len([result for result in results if result in _CACHE_MISSES])
+        else:
+            after = self._stats()
+            if self._before is None or after is None:
+                self.conanfile.output.info("Compiler cache statistics are not available for this launcher")
+                return
+            delta = lambda counters: sum([after.get(counter, 0) - self._before.get(counter, 0) for counter in counters])
+            hits = delta(_CACHE_HITS)
+            misses = delta(_CACHE_MISSES)
+        
+        total = hits + misses
+        self.conanfile.output.info("Compiler cache: {} hits, {} misses ({:.1f}% hit rate)".format(
+            hits,
+            misses,
+            (100.0 * hits / total) if total > 0 else 0.0
+        ))
+    
+    def _stats(self):
+        '''
+        Retrieves the current cache statistics as a dictionary of counters, or None if they are unavailable
+        '''
+        try:
+            output = subprocess.run(
+                [self.launcher, "--print-stats"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                universal_newlines=True,
+                check=True
+            ).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        
+        # Each line contains a counter name and its value, separated by a tab
+        stats = {}
+        for line in output.splitlines():
+            fields = line.split("\t")
+            if len(fields) == 2 and fields[1].isdigit():
+                stats[fields[0]] = int(fields[1])
+        return stats
+
+
+class CompilerFlags():
+    '''
+    Appends additional flags to the compiler and linker flags used by recipe builds. The flags are passed via the
+    `CFLAGS`, `CXXFLAGS` and `LDFLAGS` environment variables, which are respected by both CMake and autotools and
+    are passed through by the compiler interposition, so they must be appended after `LibCxx.set_vars()` has been
+    called and before the build is configured:
+    
+    ```
+    from build_helper import CompilerFlags
+    LibCxx.set_vars(self)
+    if self.options.get_safe("gc_sections"):
+        CompilerFlags(self).gc_sections()
+    ```
+    '''
+    
+    def __init__(self, conanfile):
+        '''
+        Creates a new CompilerFlags for the supplied recipe
+        '''
+        self.conanfile = conanfile
+    
+    def append(self, cflags=[], cxxflags=None, ldflags=[]):
+        '''
+        Appends the specified flags to the compiler and linker flags. If no C++ compiler flags are specified
+        then the C compiler flags are used for both languages.
+        '''
+        cxxflags = cxxflags if cxxflags is not None else cflags
+        for variable, flags in [("CFLAGS", cflags), ("CXXFLAGS", cxxflags), ("LDFLAGS", ldflags)]:
+            if len(flags) > 0:
+                os.environ[variable] = " ".join([os.environ.get(variable, "")] + flags).strip()
+    
+    def gc_sections(self, hidden_visibility=True):
+        '''
+        Places each function and data item in its own section so that unused code can be discarded at link time,
+        both when linking the recipe's own binaries and when consumers link its static libraries with `--gc-sections`.
+        
+        If `hidden_visibility` is true then symbols are also given hidden visibility by default, so that they are not
+        exported from the shared libraries that consumers link them into, which reduces binary size and load times
+        and prevents symbol interposition. This must not be used for libraries whose symbols need to be exported
+        without explicit visibility annotations (e.g. shared libraries that are built without export macros.)
+        '''
+        cflags = ["-ffunction-sections", "-fdata-sections"]
+        cxxflags = list(cflags)
+        if hidden_visibility:
+            cflags.append("-fvisibility=hidden")
+            cxxflags.extend(["-fvisibility=hidden", "-fvisibility-inlines-hidden"])
+        
+        # The Apple linker performs the equivalent of section garbage collection when dead stripping
+        ldflags = ["-Wl,-dead_strip"] if self.conanfile.settings.os == "Macos" else ["-Wl,--gc-sections"]
+        
+        self.append(cflags, cxxflags, ldflags)
+        self.conanfile.output.info("Enabled section garbage collection{}".format(" and hidden symbol visibility" if hidden_visibility else ""))
+
+
+class DebugInfo():
+    '''
+    Splits the debug information out of the libraries in a package, so that the package itself contains only stripped
+    libraries and the debug information can be stored and fetched separately when it is needed. Recipes that support
+    this expose a `split_debug_info` option and split the libraries after they have been installed:
+    
+    ```
+    from build_helper import DebugInfo
+    cmake.install()
+    if self.options.get_safe("split_debug_info"):
+        DebugInfo(self).split()
+    ```
+    
+    The debug information for each library is extracted with `objcopy --only-keep-debug` into a `.debug` file in the
+    debug info store, and the library is then stripped with `objcopy --strip-debug`. Shared libraries also receive a
+    `.gnu_debuglink` section referencing their `.debug` file, so debuggers can locate it. (Static libraries don't, since
+    the debuglinks of archive members would be merged when linking them into an executable.) The store is located in
+    `~/.ue4-conan/debug-info` by default, which can be overridden by setting the `UE4_CONAN_DEBUG_STORE` environment
+    variable, and the debug information for each package is stored under `<name>/<version>/<package ID>`. A list of
+    the split libraries is written to `debug-info.json` in the package folder. Only ELF binaries (i.e. Linux) are supported.
+    '''
+    
+    # The name of the file in the package folder that lists the split libraries
+    MANIFEST = "debug-info.json"
+    
+    def __init__(self, conanfile, store=None):
+        '''
+        Creates a new DebugInfo for the supplied recipe, using the specified debug info store
+        '''
+        self.conanfile = conanfile
+        if store is None:
+            store = os.environ.get("UE4_CONAN_DEBUG_STORE", os.path.join(os.path.expanduser("~"), ".ue4-conan", "debug-info"))
+        self.store = store
+    
+    def split(self, folders=["lib"]):
+        '''
+        Splits the debug information out of the static and shared libraries in the specified folders of the package,
+        returning a dictionary that maps the path of each split library to the path of its debug information (both
+        relative to the package folder and the debug info store, respectively)
+        '''
+        if self.conanfile.settings.os != "Linux":
+            self.conanfile.output.warn("Splitting debug information is only supported under Linux")
+            return {}
+        
+        # Determine the location of the debug information for this package in the store
+        packageFolder = self.conanfile.package_folder
+        relativeStore = "/".join([self.conanfile.name, self.conanfile.version, os.path.basename(packageFolder)])
+        destination = os.path.join(self.store, *relativeStore.split("/"))
+        
+        # Split each of the libraries
+        split = {}
+        sizeBefore, sizeAfter = 0, 0
+        for folder in folders:
+            for root, dirs, files in os.walk(os.path.join(packageFolder, folder)):
+                for file in sorted(files):
+                    library = os.path.join(root, file)
+                    shared = file.endswith(".so") or ".so." in file
+                    if os.path.islink(library) or not (shared or file.endswith(".a")):
+                        continue
+                    
+                    # Skip any libraries that were built without debug information
+                    if ".debug_info" not in _run_tool(["readelf", "--section-headers", "--wide", library]):
+                        continue
+                    
+                    # Extract the debug information and strip the library
+                    relative = os.path.relpath(library, packageFolder).replace(os.sep, "/")
+                    debugFile = os.path.join(destination, *(relative + ".debug").split("/"))
+                    os.makedirs(os.path.dirname(debugFile), exist_ok=True)
+                    original = os.path.getsize(library)
+                    _run_tool(["objcopy", "--only-keep-debug", library, debugFile])
+                    _run_tool(["objcopy", "--strip-debug", library])
+                    stripped = os.path.getsize(library)
+                    
+                    # Link shared libraries to their debug information
+                    if shared:
+                        _run_tool(["objcopy", "--add-gnu-debuglink={}".format(debugFile), library])
+                    
+                    split[relative] = "{}/{}.debug".format(relativeStore, relative)
+                    sizeBefore += original
+                    sizeAfter += stripped
+        
+        # Record the split libraries in the package so consumers can locate their debug information
+        with open(os.path.join(packageFolder, self.MANIFEST), "w") as f:
+            json.dump({"store": relativeStore, "libraries": split}, f, indent=4, sort_keys=True)
+        
+        megabyte = 1024 * 1024
+        self.conanfile.output.info("Split debug information from {} libraries into {} ({:.1f} MB reduced to {:.1f} MB)".format(
+            len(split),
+            destination,
+            sizeBefore / megabyte,
+            sizeAfter / megabyte
+        ))
+        return split
+
+
+class PackageManifest():
+    '''
+    Records the metadata that a recipe's `package_info()` method provides to consumers (its libraries, system libraries,
+    preprocessor definitions and binaries) in a JSON manifest in the package folder when the package is created, so
+    that `package_info()` only needs to read the manifest when the package is resolved, rather than scanning the
+    package folder or running tools every time:
+    
+    ```
+    def package(self):
+        from build_helper import PackageManifest
+        PackageManifest(self).write(defines=["EXAMPLE=1"])
+    
+    def package_info(self):
+        manifest = os.path.join(self.package_folder, "package-info.json")
+        self.cpp_info.libs = json.loads(tools.load(manifest))["libs"] if os.path.exists(manifest) else tools.collect_libs(self)
+    ```
+    
+    The manifest is read directly by `package_info()`, since this module is only available to recipes when they build.
+    Packages created before the manifest was introduced don't contain it, so `package_info()` falls back to computing
+    the metadata itself when the manifest is missing.
+    '''
+    
+    # The filename of the manifest in the package folder
+    MANIFEST = "package-info.json"
+    
+    def __init__(self, conanfile):
+        '''
+        Creates a new PackageManifest for the supplied recipe
+        '''
+        self.conanfile = conanfile
+    
+    def collect_libs(self, exclude=[]):
+        '''
+        Lists the libraries in the package's `lib` directory, omitting any libraries whose names contain one of the
+        strings in `exclude`
+        '''
+        from conans import tools
+        libs = tools.collect_libs(self.conanfile, folder="lib")
+        return [lib for lib in libs if not any([pattern in lib for pattern in exclude])]
+    
+    def write(self, libs=None, system_libs=[], defines=[], binaries=[]):
+        '''
+        Writes the manifest to the package folder. If no list of libraries is specified then the libraries in the
+        package's `lib` directory are listed.
+        '''
+        manifest = {
+            "libs": libs if libs is not None else self.collect_libs(),
+            "system_libs": system_libs,
+            "defines": defines,
+            "binaries": binaries
+        }
+        with open(os.path.join(self.conanfile.package_folder, self.MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=4)
+
+
+class JobPolicy():
+    '''
+    Determines the number of parallel build jobs for a recipe from the CPU quota and memory available to the build.
+    
+    Recipes specify an estimate of the peak memory consumed by each compiler process (in megabytes), so that builds
+    with large translation units (such as gRPC) don't exhaust the available memory on machines with many cores:
+    
+    ```
+    from build_helper import JobPolicy
+    jobs = JobPolicy(self, memory_per_job=2048).apply()
+    ```
+    
+    Both limits respect Linux cgroups, so the policy behaves correctly inside containers. If the `UE4_CONAN_MAX_JOBS`
+    or `CONAN_CPU_COUNT` environment variables are set then they are treated as an upper bound on the number of jobs.
+    '''
+    
+    def __init__(self, conanfile, memory_per_job=1024):
+        '''
+        Creates a new JobPolicy for the supplied recipe, using the specified per-job memory estimate in megabytes
+        '''
+        self.conanfile = conanfile
+        self.memory_per_job = memory_per_job
+    
+    def cpus(self):
+        '''
+        Returns the number of CPU cores available to the build, taking into account CPU affinity and the cgroup CPU quota
+        '''
+        try:
+            cpus = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cpus = os.cpu_count() or 1
+        
+        # Apply the CFS quota from cgroups v2 or cgroups v1, if any
+        quota = _read_file("/sys/fs/cgroup/cpu.max")
+        if quota is not None:
+            quota, period = (quota.split() + ["100000"])[:2]
+        else:
+            quota, period = _read_file("/sys/fs/cgroup/cpu/cpu.cfs_quota_us"), _read_file("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        try:
+            if int(quota) > 0 and int(period) > 0:
+                cpus = min(cpus, max(1, int(quota) // int(period)))
+        except (TypeError, ValueError):
+            pass
+        
+        return cpus
+    
+    def memory(self):
+        '''
+        Returns the memory available to the build in megabytes, taking into account the cgroup memory limit,
+        or None if it cannot be determined
+        '''
+        available = []
+        
+        # Under Linux, use the memory that is available without swapping
+        meminfo = _read_file("/proc/meminfo")
+        if meminfo is not None:
+            for line in meminfo.splitlines():
+                if line.startswith("MemAvailable:"):
+                    available.append(int(line.split()[1]) * 1024)
+        else:
+            try:
+                available.append(os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE"))
+            except (AttributeError, ValueError, OSError):
+                pass
+        
+        # Apply the memory limit from cgroups v2 or cgroups v1, if any
+        for limitFile, usageFile in [
+            ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+            ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes")
+        ]:
+            limit, usage = _read_file(limitFile), _read_file(usageFile)
+            if limit is not None and limit.isdigit() and usage is not None and usage.isdigit():
+                available.append(int(limit) - int(usage))
+                break
+        
+        return max(0, min(available)) // (1024 * 1024) if len(available) > 0 else None
+    
+    def jobs(self):
+        '''
+        Computes the number of parallel build jobs
+        '''
+        jobs = self.cpus()
+        
+        # Limit the number of jobs so that the compiler processes fit within the available memory
+        memory = self.memory()
+        if memory is not None:
+            jobs = min(jobs, memory // self.memory_per_job)
+        
+        # Respect any limit set by the user
+        override = os.environ.get("UE4_CONAN_MAX_JOBS", os.environ.get("CONAN_CPU_COUNT", ""))
+        if override.isdigit() and int(override) > 0:
+            jobs = min(jobs, int(override))
+        
+        return max(1, jobs)
+    
+    def apply(self):
+        '''
+        Applies the job policy to the remainder of the build and returns the number of jobs, which should be passed
+        explicitly to any build tools that do not use Conan's `tools.cpu_count()`
+        '''
+        jobs = self.jobs()
+        memory = self.memory()
+        self.conanfile.output.info("Using {} parallel build jobs ({} CPUs, {} MB memory available, {} MB per job)".format(
+            jobs,
+            self.cpus(),
+            memory if memory is not None else "unknown",
+            self.memory_per_job
+        ))
+        
+        # Conan's CMake and autotools helpers use `tools.cpu_count()`, which respects the `CONAN_CPU_COUNT` environment variable
+        # (The user's original setting is preserved so that it remains an upper bound if the policy is applied again)
+        if "UE4_CONAN_MAX_JOBS" not in os.environ:
+            os.environ["UE4_CONAN_MAX_JOBS"] = os.environ.get("CONAN_CPU_COUNT", "")
+        os.environ["CONAN_CPU_COUNT"] = str(jobs)
+        
+        # Conan's CMake helper only passes the number of jobs to make, so we also set it for `cmake --build` (which uses it for Ninja)
+        os.environ["CMAKE_BUILD_PARALLEL_LEVEL"] = str(jobs)
+        return jobs
+
+
+class CMakeGenerator():
+    '''
+    Selects the CMake generator for recipe builds, preferring Ninja where it is available and falling back to CMake's
+    default generator (Unix Makefiles, or Visual Studio under Windows) otherwise:
+    
+    ```
+    from build_helper import CMakeGenerator
+    generator = CMakeGenerator(self)
+    cmake = CMake(self, generator=generator.name)
+    generator.apply(cmake)
+    ```
+    
+    The generator can be overridden by setting the `UE4_CONAN_CMAKE_GENERATOR` environment variable to the name of
+    any CMake generator. Specifying `Ninja Multi-Config` generates the build rules for both the Debug and Release
+    configurations from a single configure step, so that a build folder can be reused to build either configuration.
+    Ninja is only selected automatically under Linux and macOS, since it requires the Visual Studio environment to be
+    configured under Windows.
+    '''
+    
+    # The configurations that are generated when using a multi-config generator
+    _CONFIGURATIONS = ["Debug", "Release"]
+    
+    def __init__(self, conanfile):
+        '''
+        Creates a new CMakeGenerator for the supplied recipe and selects the generator to use
+        '''
+        self.conanfile = conanfile
+        self.name = os.environ.get("UE4_CONAN_CMAKE_GENERATOR", "")
+        
+        # Use Ninja if it is available and no generator has been specified
+        if self.name == "":
+            self.name = "Ninja" if conanfile.settings.os != "Windows" and shutil.which("ninja") is not None else None
+        
+        # Verify that the Ninja generators can actually be used
+        elif self.name.startswith("Ninja") and shutil.which("ninja") is None:
+            conanfile.output.warn("Ninja not found, building with the default CMake generator")
+            self.name = None
+        elif self.name == "Ninja Multi-Config" and self._cmake_version() < (3, 17):
+            conanfile.output.warn("Ninja Multi-Config requires CMake 3.17 or newer, building with the Ninja generator")
+            self.name = "Ninja"
+        
+        conanfile.output.info("Using CMake generator: {}".format(self.name if self.name is not None else "default"))
+    
+    @property
+    def multi_config(self):
+        '''
+        Determines whether the selected generator is the Ninja multi-config generator
+        '''
+        return self.name == "Ninja Multi-Config"
+    
+    def apply(self, cmake):
+        '''
+        Applies any configuration that the selected generator requires to the supplied CMake object
+        '''
+        if not self.multi_config:
+            return
+        
+        # Generate the rules for both configurations, and make the recipe's configuration the default so that
+        # Conan's CMake helper builds and installs it regardless of whether it recognises the generator as multi-config
+        buildType = str(self.conanfile.settings.build_type)
+        configurations = self._CONFIGURATIONS + ([buildType] if buildType not in self._CONFIGURATIONS else [])
+        cmake.definitions["CMAKE_CONFIGURATION_TYPES"] = ";".join(configurations)
+        cmake.definitions["CMAKE_DEFAULT_BUILD_TYPE"] = buildType
+    
+    def _cmake_version(self):
+        '''
+        Returns the version of CMake as a tuple of integers, or (0,) if it cannot be determined
+        '''
+        try:
+            output = subprocess.run(["cmake", "--version"], stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+            return tuple([int(component) for component in output.split()[2].split("-")[0].split(".")[:2]])
+        except (OSError, subprocess.CalledProcessError, IndexError, ValueError):
+            return (0,)
+
+
+class LinkTimeOptimisation():
+    '''
+    Enables link-time optimisation (LTO) for CMake builds using CMake's interprocedural optimisation support:
+    
+    ```
+    from build_helper import LinkTimeOptimisation
+    cmake = CMake(self)
+    if self.options.get_safe("lto"):
+        LinkTimeOptimisation(self).enable(cmake)
+    ```
+    
+    When building with clang, the resulting static libraries contain LLVM bitcode rather than machine code, so the
+    code from the libraries is optimised together with the consumer's code when it is linked with an LTO-capable
+    linker (such as the lld linker bundled with the UE4 clang toolchain.) The LLVM archiver is used to create the
+    static libraries, since it generates the symbol index for bitcode objects that the linker requires.
+    '''
+    
+    def __init__(self, conanfile):
+        '''
+        Creates a new LinkTimeOptimisation for the supplied recipe
+        '''
+        self.conanfile = conanfile
+    
+    def enable(self, cmake):
+        '''
+        Configures the supplied CMake object to build with LTO. This must be called after `LibCxx.set_vars()`.
+        '''
+        cmake.definitions["CMAKE_INTERPROCEDURAL_OPTIMIZATION"] = "ON"
+        
+        # Projects that require a CMake version older than 3.9 ignore the setting above for most compilers unless we set the policy that enables it
+        cmake.definitions["CMAKE_POLICY_DEFAULT_CMP0069"] = "NEW"
+        
+        # Under Linux, use the LLVM archiver and linker from the toolchain if they are available
+        if self.conanfile.settings.os == "Linux" and self.conanfile.settings.compiler == "clang":
+            archiver, ranlib, linker = [_toolchain_program(name) for name in ["llvm-ar", "llvm-ranlib", "ld.lld"]]
+            for language in ["C", "CXX"]:
+                if archiver is not None:
+                    cmake.definitions["CMAKE_{}_COMPILER_AR".format(language)] = archiver
+                if ranlib is not None:
+                    cmake.definitions["CMAKE_{}_COMPILER_RANLIB".format(language)] = ranlib
+            if linker is not None:
+                CompilerFlags(self.conanfile).append(ldflags=["-fuse-ld=lld"])
+            else:
+                self.conanfile.output.warn("ld.lld not found, any executables will be linked with the default linker")
+        
+        self.conanfile.output.info("Enabled link-time optimisation")
+
+
+class ProfileGuidedOptimisation():
+    '''
+    Performs a two-stage profile-guided optimisation (PGO) build with clang under Linux. The first stage builds an
+    instrumented copy of the libraries and installs it to a staging directory, then compiles and runs a training
+    workload against it to record a profile. The second stage is the regular build, which is optimised using the
+    merged profile:
+    
+    ```
+    from build_helper import ProfileGuidedOptimisation
+    pgo = ProfileGuidedOptimisation(self)
+    with pgo.instrumented():
+        cmake = CMake(self)
+        pgo.apply(cmake)
+        cmake.configure(source_folder="src", build_folder=pgo.build_folder)
+        cmake.install()
+        pgo.train(["pgo_training.cpp"])
+    pgo.optimise()
+    ```
+    
+    The workload is compiled and linked against every static library in the staging directory and the libraries of
+    the recipe's dependencies, using the flags from the `CXXFLAGS` and `LDFLAGS` environment variables.
+    '''
+    
+    def __init__(self, conanfile, directory="pgo"):
+        '''
+        Creates a new ProfileGuidedOptimisation for the supplied recipe, using the specified working directory
+        '''
+        self.conanfile = conanfile
+        self.directory = os.path.abspath(directory)
+        self.build_folder = os.path.join(self.directory, "build")
+        self.staging = os.path.join(self.directory, "install")
+        self.profiles = os.path.join(self.directory, "profiles")
+        self.profile = os.path.join(self.directory, "merged.profdata")
+    
+    @contextlib.contextmanager
+    def instrumented(self):
+        '''
+        Adds the instrumentation flags to the compiler and linker flags for the duration of a `with` block
+        '''
+        original = {variable: os.environ.get(variable) for variable in ["CFLAGS", "CXXFLAGS", "LDFLAGS"]}
+        instrumentation = ["-fprofile-generate={}".format(self.profiles)]
+        CompilerFlags(self.conanfile).append(instrumentation, ldflags=instrumentation)
+        try:
+            yield
+        finally:
+            for variable, value in original.items():
+                if value is not None:
+                    os.environ[variable] = value
+                else:
+                    os.environ.pop(variable, None)
+    
+    def apply(self, cmake):
+        '''
+        Configures the supplied CMake object to install the instrumented libraries to the staging directory
+        '''
+        cmake.definitions["CMAKE_INSTALL_PREFIX"] = self.staging
+    
+    def train(self, sources, exclude=[]):
+        '''
+        Compiles the specified training workload source files against the instrumented libraries, runs the workload
+        and merges the recorded profile. Any static libraries whose names contain one of the strings in `exclude`
+        are not linked into the workload (e.g. alternative builds of a library that define the same symbols.)
+        '''
+        
+        # Gather the static libraries from the staging directory and the libraries of our dependencies
+        dependencies = self.conanfile.deps_cpp_info
+        staticLibs = sorted(glob.glob(os.path.join(self.staging, "lib", "*.a")))
+        staticLibs = [lib for lib in staticLibs if not any([pattern in os.path.basename(lib) for pattern in exclude])]
+        libs = list(dependencies.libs) + list(dependencies.system_libs) + ["pthread"]
+        if self.conanfile.settings.os == "Linux":
+            libs.extend(["dl", "m"])
+        
+        # Under Linux, the static libraries are grouped so that their order does not matter
+        linked = staticLibs + ["-l" + lib for lib in libs]
+        if self.conanfile.settings.os == "Linux":
+            linked = ["-Wl,--start-group"] + linked + ["-Wl,--end-group"]
+        
+        # Compile the workload
+        workload = os.path.join(self.directory, "pgo-training")
+        _run_tool(
+            shlex.split(os.environ.get("CXX", "clang++")) +
+            ["-std=c++11", "-O2", "-o", workload] +
+            shlex.split(os.environ.get("CXXFLAGS", "")) +
+            ["-I" + path for path in [os.path.join(self.staging, "include")] + list(dependencies.include_paths)] +
+            [os.path.abspath(source) for source in sources] +
+            ["-L" + path for path in [os.path.join(self.staging, "lib")] + list(dependencies.lib_paths)] +
+            linked +
+            shlex.split(os.environ.get("LDFLAGS", ""))
+        )
+        
+        # Run the workload, discarding any profiles left over from previous runs
+        shutil.rmtree(self.profiles, ignore_errors=True)
+        self.conanfile.output.info("Running the PGO training workload")
+        subprocess.run([workload], cwd=self.directory, check=True)
+        
+        # Merge the recorded profiles
+        rawProfiles = glob.glob(os.path.join(self.profiles, "*.profraw"))
+        if len(rawProfiles) == 0:
+            raise RuntimeError("the PGO training workload did not record a profile in {}".format(self.profiles))
+        profdata = _toolchain_program("llvm-profdata")
+        if profdata is None:
+            raise RuntimeError("llvm-profdata is required to merge the PGO profile but could not be found")
+        _run_tool([profdata, "merge", "-output={}".format(self.profile)] + rawProfiles)
+        self.conanfile.output.info("Merged {} PGO profile(s) into {}".format(len(rawProfiles), self.profile))
+    
+    def optimise(self):
+        '''
+        Appends the flags to optimise the remainder of the build using the merged profile. Functions that the
+        workload did not execute are optimised as usual, so the warnings about them are suppressed.
+        '''
+        CompilerFlags(self.conanfile).append([
+            "-fprofile-use={}".format(self.profile),
+            "-Wno-profile-instr-unprofiled",
+            "-Wno-profile-instr-out-of-date"
+        ])
+        self.conanfile.output.info("Enabled profile-guided optimisation")
+
+
+class RamDisk():
+    '''
+    Provides an opt-in mode that places a recipe's source and build folders on a RAM disk (i.e. a tmpfs mount), which
+    speeds up builds that perform large amounts of small-file I/O, such as autotools configure scripts and CMake checks.
+    
+    The mode is enabled by setting the `UE4_CONAN_RAMDISK` environment variable to the path of a tmpfs mount, or to `1`
+    to use `/dev/shm`. The specified folders are moved onto the RAM disk and replaced with symlinks, so the recipe's
+    paths are unchanged, and the build output is installed into the package folder on disk as usual:
+    
+    ```
+    from build_helper import RamDisk
+    ramdisk = RamDisk(self, build_size=2048)
+    ramdisk.enable(["grpc"])
+    cmake.configure(source_folder="grpc", build_folder=ramdisk.build_folder)
+    ...
+    ramdisk.release()
+    ```
+    
+    Recipes specify an estimate of the size of their build output (in megabytes.) Recipes that build inside their source
+    folders (e.g. with autotools) pass `build_folder=False` to `enable()`, so that no separate CMake build folder is
+    created and their build output is written to the source folders on the RAM disk. If the RAM disk doesn't have enough free
+    space for the sources and the build output, or using it would leave less than `reserve` megabytes of memory available
+    for the compiler processes, then the build falls back to using the disk. Because only folders inside the recipe's
+    build folder are moved, this works regardless of where Conan places the build folder (e.g. with `short_paths`.)
+    RAM disks are not supported under Windows.
+    '''
+    
+    # The name of the folder that is used as the CMake build folder when the RAM disk is enabled
+    _BUILD_FOLDER = "build"
+    
+    def __init__(self, conanfile, build_size=1024, reserve=2048):
+        '''
+        Creates a new RamDisk for the supplied recipe, using the specified estimates of the build output size and the
+        memory to reserve for the build (both in megabytes.) The RAM disk is not used until `enable()` is called.
+        '''
+        self.conanfile = conanfile
+        self.build_size = build_size
+        self.reserve = reserve
+        self.directory = None
+        self._links = []
+        self._build_folder = False
+        
+        # Determine the location of the RAM disk, if one has been enabled
+        location = os.environ.get("UE4_CONAN_RAMDISK", "")
+        self.location = "/dev/shm" if location.lower() in ["1", "true", "yes"] else location
+        if conanfile.settings.os == "Windows":
+            self.location = ""
+    
+    @property
+    def enabled(self):
+        '''
+        Determines whether the build is using the RAM disk
+        '''
+        return self.directory is not None
+    
+    @property
+    def build_folder(self):
+        '''
+        Returns the build folder that CMake should use, which is None (i.e. Conan's default) unless the RAM disk is enabled
+        '''
+        return self._BUILD_FOLDER if self.enabled and self._build_folder else None
+    
+    def enable(self, folders, build_folder=True):
+        '''
+        Moves the specified folders (relative to the recipe's build folder) onto the RAM disk along with the CMake build
+        folder (unless `build_folder` is False), provided the RAM disk has sufficient space and there is sufficient memory available
+        '''
+        if self.location == "":
+            return
+        
+        # Verify that the sources and the build output will fit on the RAM disk, and leave enough memory for the build
+        megabyte = 1024 * 1024
+        folders = [os.path.join(self.conanfile.build_folder, folder) for folder in folders]
+        required = sum([_directory_size(folder) for folder in folders]) // megabyte + self.build_size
+        try:
+            stats = os.statvfs(self.location)
+            free = (stats.f_bavail * stats.f_frsize) // megabyte
+        except (AttributeError, OSError) as e:
+            self.conanfile.output.warn("Cannot use the RAM disk at {} ({}), building on disk".format(self.location, e))
+            return
+        memory = JobPolicy(self.conanfile).memory()
+        if free < required or (memory is not None and memory - required < self.reserve):
+            self.conanfile.output.warn("Insufficient space for a RAM disk build ({} MB required, {} MB free, {} MB memory available), building on disk".format(
+                required,
+                free,
+                memory if memory is not None else "unknown"
+            ))
+            return
+        
+        # Move the folders onto the RAM disk and replace them with symlinks
+        self.directory = tempfile.mkdtemp(prefix="{}-".format(self.conanfile.name), dir=self.location)
+        self._build_folder = build_folder
+        atexit.register(self.release)
+        self.conanfile.output.info("Building on the RAM disk at {} ({} MB required, {} MB free)".format(self.directory, required, free))
+        if build_folder:
+            folders.append(os.path.join(self.conanfile.build_folder, self._BUILD_FOLDER))
+        for folder in folders:
+            target = os.path.join(self.directory, os.path.basename(folder))
+            if os.path.exists(folder):
+                shutil.move(folder, target)
+            else:
+                os.makedirs(target)
+            os.symlink(target, folder)
+            self._links.append(folder)
+    
+    def release(self):
+        '''
+        Frees the memory used by the RAM disk once the build output has been installed to the package folder.
+        The build folders on the RAM disk are deleted rather than being moved back to the disk.
+        '''
+        if not self.enabled:
+            return
+        
+        # Ensure we're not inside a folder that we are about to delete
+        if os.path.realpath(os.getcwd()).startswith(os.path.realpath(self.directory)):
+            os.chdir(self.conanfile.build_folder)
+        
+        for link in self._links:
+            if os.path.islink(link):
+                os.unlink(link)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory = None
+        self._links = []
+
+
+class SourceCache():
+    '''
+    Provides a local cache of the git repositories that recipes clone in their `source()` methods.
+    
+    Each repository is stored as a bare mirror keyed by its URL, and each tag or branch that is fetched is stored
+    under its own ref in the mirror, so that repeat builds (and builds of other versions of the same recipe) don't
+    need to access the network. Submodules are fetched shallowly and in parallel, and are cached in the same way.
+    Recipes clone repositories like so:
+    
+    ```
+    from build_helper import SourceCache
+    SourceCache(self).clone("https://github.com/grpc/grpc.git", ref="v1.42.0", submodules=True)
+    ```
+    
+    The cache is located in `~/.ue4-conan/source-cache` by default, which can be overridden by setting the
+    `UE4_CONAN_SOURCE_CACHE` environment variable (specifying an empty string disables the cache.) Setting the
+    `UE4_CONAN_OFFLINE` environment variable to `1` enables offline mode, whereby missing cache entries are
+    reported as errors immediately rather than being fetched.
+    '''
+    
+    # The namespace under which fetched tags and branches are stored in the mirrors
+    _REF_NAMESPACE = "refs/ue4-conan/"
+    
+    def __init__(self, conanfile, cache_dir=None, offline=None, jobs=None):
+        '''
+        Creates a new SourceCache for the supplied recipe
+        '''
+        self.conanfile = conanfile
+        self.jobs = jobs if jobs is not None else min(8, (os.cpu_count() or 1) * 2)
+        
+        # Determine the location of the cache
+        if cache_dir is None:
+            cache_dir = os.environ.get("UE4_CONAN_SOURCE_CACHE", os.path.join(os.path.expanduser("~"), ".ue4-conan", "source-cache"))
+        self.cache_dir = cache_dir
+        
+        # Determine whether we are running in offline mode
+        if offline is None:
+            offline = os.environ.get("UE4_CONAN_OFFLINE", "").lower() in ["1", "true", "yes"]
+        self.offline = offline
+        if self.offline and not self.cache_dir:
+            raise RuntimeError("offline mode requires the source cache to be enabled")
+    
+    def clone(self, url, ref=None, commit=None, directory=None, submodules=False, exclude=[]):
+        '''
+        Clones the specified git repository into `directory` (defaulting to the repository name) and checks out
+        the specified tag or branch (`ref`) or commit (`commit`), optionally including its submodules.
+        Submodules whose paths are listed in `exclude` are not fetched.
+        '''
+        directory = directory if directory is not None else self._repository_name(url)
+        
+        # If the cache is disabled then perform a shallow clone directly from the remote
+        if not self.cache_dir:
+            if commit is not None:
+                _git(["clone", "--quiet", url, directory])
+                _git(["checkout", "--quiet", commit], cwd=directory)
+            else:
+                _git(["clone", "--quiet", "--depth=1", url, directory] + (["-b", ref] if ref is not None else []))
+        else:
+            
+            # Otherwise, clone from the mirror (fetching the commit by its hash, since cloning only copies the branches and tags of the mirror)
+            mirror, revision = self._fetch(url, ref, commit)
+            _git(["init", "--quiet", directory])
+            _git(["fetch", "--quiet", mirror, revision], cwd=directory)
+            _git(["checkout", "--quiet", "--detach", revision], cwd=directory)
+            _git(["remote", "add", "origin", url], cwd=directory)
+        
+        # Fetch the submodules if requested
+        if submodules:
+            self._submodules(directory, url, exclude)
+    
+    def _repository_name(self, url):
+        '''
+        Returns the name of the directory that `git clone` would create for the specified URL
+        '''
+        name = url.rstrip("/").split("/")[-1].split(":")[-1]
+        return name[: -len(".git")] if name.endswith(".git") else name
+    
+    def _mirror(self, url):
+        '''
+        Returns the path to the bare mirror for the specified URL
+        '''
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, "{}-{}.git".format(key, self._repository_name(url)))
+    
+    def _fetch(self, url, ref=None, commit=None):
+        '''
+        Ensures the specified tag, branch or commit of a repository is present in its mirror, fetching it if necessary,
+        and returns the path to the mirror along with the hash of the commit
+        '''
+        mirror = self._mirror(url)
+        ref = ref if ref is not None or commit is not None else "HEAD"
+        target = commit if commit is not None else self._REF_NAMESPACE + ref
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with _locked(mirror + ".lock"):
+            
+            # Use the cached commit if we have it
+            if os.path.isdir(mirror):
+                revision = self._resolve(mirror, target)
+                if revision is not None:
+                    self.conanfile.output.info("Using cached source for {} {}".format(url, ref or commit or ""))
+                    return mirror, revision
+            
+            # Don't touch the network in offline mode
+            if self.offline:
+                raise RuntimeError("the source cache has no entry for {} {} and offline mode is enabled".format(url, ref or commit or ""))
+            
+            # Create the mirror if it doesn't already exist, allowing submodule commits to be fetched directly from it
+            if not os.path.isdir(mirror):
+                _git(["init", "--quiet", "--bare", mirror])
+                _git(["config", "uploadpack.allowAnySHA1InWant", "true"], cwd=mirror)
+            
+            # Perform a shallow fetch of the tag, branch or full commit hash, falling back to fetching all refs for abbreviated hashes
+            self.conanfile.output.info("Fetching {} {}".format(url, ref or commit or ""))
+            if commit is not None and len(commit) < 40:
+                _git(["fetch", "--quiet", url, "+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"], cwd=mirror)
+            elif commit is not None:
+                _git(["fetch", "--quiet", "--depth=1", url, commit], cwd=mirror)
+                _git(["update-ref", self._REF_NAMESPACE + "commits/" + commit, commit], cwd=mirror)
+            else:
+                _git(["fetch", "--quiet", "--depth=1", url, "+{}:{}".format(ref, target)], cwd=mirror)
+            
+            revision = self._resolve(mirror, target)
+            if revision is None:
+                raise RuntimeError("failed to fetch {} {}".format(url, ref or commit or ""))
+            return mirror, revision
+    
+    def _resolve(self, mirror, target):
+        '''
+        Resolves a ref or commit hash to a full commit hash in the specified mirror, returning None if it is not present
+        '''
+        try:
+            return _git(["rev-parse", "--quiet", "--verify", target + "^{commit}"], cwd=mirror)
+        except RuntimeError:
+            return None
+    
+    def _submodules(self, directory, url, exclude):
+        '''
+        Fetches the submodules of the repository cloned into the specified directory, shallowly and in parallel
+        '''
+        
+        # Determine the commit that the repository references for each of the submodules that we need
+        submodules = []
+        for path, name, submoduleUrl in _list_submodules(directory, url):
+            entry = _git(["ls-tree", "HEAD", path], cwd=directory).split()
+            if path not in exclude and len(entry) >= 3 and entry[1] == "commit":
+                submodules.append((path, name, submoduleUrl, entry[2]))
+        if len(submodules) == 0:
+            return
+        
+        # Register the submodules, and if the cache is enabled then fetch the submodule commits into their mirrors in parallel
+        # and point the submodules at the mirrors rather than the remotes
+        paths = [path for path, name, submoduleUrl, commit in submodules]
+        _git(["submodule", "init", "--quiet", "--"] + paths, cwd=directory)
+        if self.cache_dir:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                fetched = list(executor.map(lambda submodule: self._fetch(submodule[2], commit=submodule[3]), submodules))
+            for (path, name, submoduleUrl, commit), (mirror, revision) in zip(submodules, fetched):
+                _git(["config", "submodule.{}.url".format(name), mirror], cwd=directory)
+        
+        # Check out the submodules in parallel, cloning shallowly when we're fetching directly from the remotes
+        # (Recent versions of git disallow the local file transport for submodules by default, so we explicitly allow it for our mirrors)
+        depth = ["--depth=1"] if not self.cache_dir else []
+        _git(["-c", "protocol.file.allow=always", "submodule", "update", "--quiet", "--jobs", str(self.jobs)] + depth + ["--"] + paths, cwd=directory)
+        
+        # Restore the remote URLs and fetch any nested submodules
+        for path, name, submoduleUrl, commit in submodules:
+            _git(["config", "submodule.{}.url".format(name), submoduleUrl], cwd=directory)
+            self._submodules(os.path.join(directory, path), submoduleUrl, [])
+
+
+class BuildTrace():
+    '''
+    Records the wall-clock time, CPU time and peak memory usage of each phase of a recipe build.
+    
+    Tracing is enabled by setting the `UE4_CONAN_BUILD_TRACE` environment variable to the path of a trace file,
+    which is shared by all of the recipes built while the variable is set (e.g. during `ue4 conan build all`.)
+    Each phase is appended to the file as an event in the Chrome trace event format, so the file can be viewed
+    with `chrome://tracing` or https://ui.perfetto.dev. Recipes trace their phases like so:
+    
+    ```
+    from build_helper import BuildTrace
+    trace = BuildTrace(self)
+    trace.wrap("package_info")
+    with trace.phase("configure"):
+        cmake.configure()
+    with trace.phase("compile"):
+        cmake.build()
+    ```
+    
+    CPU time includes all child processes that have completed. Peak memory usage is the peak combined resident set
+    size of the build process and its descendants under Linux, and the peak of the largest child process elsewhere.
+    '''
+    
+    # The interval (in seconds) at which the memory usage of the process tree is sampled
+    _SAMPLE_INTERVAL = 0.25
+    
+    def __init__(self, conanfile, trace_file=None):
+        '''
+        Creates a new BuildTrace for the supplied recipe, which is disabled unless a trace file has been configured
+        '''
+        self.conanfile = conanfile
+        self.trace_file = trace_file if trace_file is not None else os.environ.get("UE4_CONAN_BUILD_TRACE", "")
+    
+    @property
+    def enabled(self):
+        '''
+        Determines whether tracing is enabled for this build
+        '''
+        return self.trace_file != ""
+    
+    @contextlib.contextmanager
+    def phase(self, name):
+        '''
+        Records the resource usage of the code executed within a `with` block as the specified phase
+        '''
+        if not self.enabled:
+            yield
+            return
+        
+        # Start sampling the memory usage of the process tree in the background
+        peak = [_process_tree_rss(os.getpid())]
+        stop = threading.Event()
+        def sample():
+            while not stop.wait(self._SAMPLE_INTERVAL):
+                peak[0] = max(peak[0], _process_tree_rss(os.getpid()) or 0)
+        sampler = threading.Thread(target=sample, daemon=True)
+        if peak[0] is not None:
+            sampler.start()
+        
+        # Run the phase
+        started = time.time()
+        timesBefore = os.times()
+        try:
+            yield
+        finally:
+            wall = time.time() - started
+            timesAfter = os.times()
+            cpu = sum([after - before for after, before in zip(timesAfter[:4], timesBefore[:4])])
+            if peak[0] is not None:
+                stop.set()
+                sampler.join()
+            else:
+                peak[0] = self._largest_child_rss()
+            self._record(name, started, wall, cpu, peak[0])
+    
+    def wrap(self, method):
+        '''
+        Wraps the specified method of the recipe (e.g. `package_info`) so that each call to it is recorded as a phase.
+        This allows methods that cannot import this module themselves to be traced, but only for calls made by the same
+        Conan process that performs the build (e.g. the `package_info` call when `conan create` finishes building the
+        package), since the wrapper is attached to that run's recipe object. Calls made when consumers later resolve the
+        built package use a fresh recipe object and are not traced.
+        '''
+        if not self.enabled:
+            return
+        
+        original = getattr(self.conanfile, method)
+        def traced(*args, **kwargs):
+            with self.phase(method):
+                return original(*args, **kwargs)
+        setattr(self.conanfile, method, traced)
+    
+    def _largest_child_rss(self):
+        '''
+        Returns the peak resident set size (in bytes) of the largest child process, or None if it is unavailable
+        '''
+        if resource is None:
+            return None
+        
+        # The value is reported in kilobytes under Linux and in bytes under macOS
+        maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return maxrss if self.conanfile.settings.os == "Macos" else maxrss * 1024
+    
+    def _record(self, name, started, wall, cpu, peak):
+        '''
+        Reports the resource usage of a phase and appends it to the trace file
+        '''
+        peakMB = (peak // (1024 * 1024)) if peak is not None else None
+        self.conanfile.output.info("Phase {}: {:.1f}s wall, {:.1f}s CPU, {} MB peak memory".format(
+            name,
+            wall,
+            cpu,
+            peakMB if peakMB is not None else "unknown"
+        ))
+        
+        # Each recipe build is displayed as a separate process in the trace, named after the recipe
+        recipe = "{}/{}".format(self.conanfile.name, self.conanfile.version)
+        events = [
+            {"name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 0, "args": {"name": recipe}},
+            {
+                "name": name,
+                "cat": recipe,
+                "ph": "X",
+                "ts": int(started * 1000000),
+                "dur": int(wall * 1000000),
+                "pid": os.getpid(),
+                "tid": 0,
+                "args": {
+                    "wall_seconds": round(wall, 3),
+                    "cpu_seconds": round(cpu, 3),
+                    "peak_rss_mb": peakMB
+                }
+            }
+        ]
+        
+        # Append the events to the trace file, which uses the JSON array format with the closing bracket omitted
+        # so that multiple builds (including concurrent builds) can append to it
+        directory = os.path.dirname(os.path.abspath(self.trace_file))
+        os.makedirs(directory, exist_ok=True)
+        with _locked(self.trace_file + ".lock"):
+            with open(self.trace_file, "a") as f:
+                if f.tell() == 0:
+                    f.write("[\n")
+                for event in events:
+                    f.write(json.dumps(event) + ",\n")
+
+
+class RecipeBuild():
+    '''
+    Sets up the features of this module that every recipe build uses, so that a recipe's `build()` method needs only a
+    single call to enable them (after `LibCxx.set_vars()`, since the compiler flags and the compiler cache depend on it):
+    
+    ```
+    from build_helper import RecipeBuild
+    build = RecipeBuild(self, memory_per_job=512, build_size=256, folders=["proj.4"])
+    cmake = build.cmake()
+    with build.phase("configure"):
+        cmake.configure(source_folder="proj.4", build_folder=build.build_folder)
+    with build.phase("compile"):
+        cmake.build()
+    with build.phase("install"):
+        cmake.install()
+    build.finish()
+    ```
+    
+    Creating the RecipeBuild applies the `JobPolicy` for the recipe's per-job memory estimate, enables section garbage
+    collection with `CompilerFlags` if the recipe's `gc_sections` option is set, moves the specified folders onto the
+    `RamDisk`, and traces the build phases and `package_info()` with `BuildTrace`. The CMake objects created by `cmake()`
+    use the generator selected by `CMakeGenerator` and the `CompilerCache`, along with `LinkTimeOptimisation` if the
+    recipe's `lto` option is set. `finish()` splits the debug information out of the packaged libraries with `DebugInfo`
+    if the recipe's `split_debug_info` option is set, reports the compiler cache statistics and releases the RAM disk.
+    
+    Recipes that build with autotools pass `autotools=True`, so that the compiler cache is enabled through the `CC` and
+    `CXX` environment variables, and pass the number of jobs in the `jobs` attribute to make.
+    '''
+    
+    def __init__(self, conanfile, memory_per_job=1024, build_size=1024, folders=[], build_folder=True, hidden_visibility=True, autotools=False):
+        '''
+        Creates a new RecipeBuild for the supplied recipe and sets up the build. The estimates of the peak memory per job
+        and the size of the build output (both in megabytes) are passed to `JobPolicy` and `RamDisk`, and `build_folder` and
+        `hidden_visibility` are passed to `RamDisk.enable()` and `CompilerFlags.gc_sections()` respectively.
+        '''
+        self.conanfile = conanfile
+        self._generator = None
+        
+        # Limit the number of parallel build jobs based on the available CPU quota and memory
+        self.jobs = JobPolicy(conanfile, memory_per_job=memory_per_job).apply()
+        
+        # Enable section garbage collection if requested
+        if conanfile.options.get_safe("gc_sections"):
+            CompilerFlags(conanfile).gc_sections(hidden_visibility=hidden_visibility)
+        
+        # Use the compiler cache if it has been enabled (CMake builds enable it for each CMake object instead)
+        self.cache = CompilerCache(conanfile)
+        if autotools:
+            self.cache.enable()
+        
+        # Build on a RAM disk if one has been enabled and there is enough memory available
+        self.ramdisk = RamDisk(conanfile, build_size=build_size)
+        if len(folders) > 0:
+            self.ramdisk.enable(folders, build_folder=build_folder)
+        
+        # Record the duration and resource usage of each build phase if tracing has been enabled
+        self.trace = BuildTrace(conanfile)
+        self.trace.wrap("package_info")
+    
+    @property
+    def build_folder(self):
+        '''
+        Returns the build folder that CMake should use, which is None (i.e. Conan's default) unless the RAM disk is enabled
+        '''
+        return self.ramdisk.build_folder
+    
+    def phase(self, name):
+        '''
+        Records the resource usage of the code executed within a `with` block as the specified phase
+        '''
+        return self.trace.phase(name)
+    
+    def cmake(self, lto=True):
+        '''
+        Creates a CMake object that uses the selected generator and the compiler cache. Link-time optimisation is enabled
+        if the recipe's `lto` option is set, unless `lto` is False (e.g. for the instrumented stage of a PGO build.)
+        '''
+        from conans import CMake
+        
+        # Use Ninja if it is available, falling back to the default CMake generator otherwise
+        if self._generator is None:
+            self._generator = CMakeGenerator(self.conanfile)
+        cmake = CMake(self.conanfile, generator=self._generator.name)
+        self._generator.apply(cmake)
+        
+        # Enable link-time optimisation if requested
+        if lto and self.conanfile.options.get_safe("lto"):
+            LinkTimeOptimisation(self.conanfile).enable(cmake)
+        
+        self.cache.enable(cmake)
+        return cmake
+    
+    def finish(self):
+        '''
+        Completes the build once the recipe's libraries have been installed to the package folder
+        '''
+        if self.conanfile.options.get_safe("split_debug_info"):
+            DebugInfo(self.conanfile).split()
+        self.cache.report()
+        self.ramdisk.release()
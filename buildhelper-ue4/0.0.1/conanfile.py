@@ -0,0 +1,17 @@
+from conans import ConanFile
+
+class BuildHelperUe4Conan(ConanFile):
+    name = "buildhelper-ue4"
+    version = "0.0.1"
+    license = "MIT"
+    url = "https://github.com/adamrehn/ue4-conan-recipes/buildhelper-ue4"
+    description = "Shared build infrastructure for the UE4 Conan recipes"
+    exports = "*.py"
+    
+    def package(self):
+        self.copy("build_helper.py")
+    
+    def package_info(self):
+        
+        # Make the `build_helper` module available to the recipes that list us as a build requirement
+        self.env_info.PYTHONPATH.append(self.package_folder)
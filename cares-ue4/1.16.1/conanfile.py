@@ -1,4 +1,5 @@
-from conans import ConanFile, CMake, tools
+from conans import ConanFile, tools
+import json, os
 
 class CaresUe4Conan(ConanFile):
     name = "cares-ue4"
@@ -7,9 +8,24 @@ class CaresUe4Conan(ConanFile):
     url = "https://github.com/adamrehn/ue4-conan-recipes/cares-ue4"
     description = "c-ares custom build for Unreal Engine 4"
     settings = "os", "compiler", "build_type", "arch"
+    options = {"gc_sections": [True, False], "lto": [True, False]}
+    default_options = {"gc_sections": False, "lto": False}
     generators = "cmake"
     requires = ("libcxx/ue4@adamrehn/profile")
     
+    def config_options(self):
+        
+        # Section garbage collection is only supported by GCC-compatible toolchains
+        if self.settings.os == "Windows":
+            del self.options.gc_sections
+        
+        # Link-time optimisation is not supported under Windows, since MSVC ties the resulting libraries to a specific compiler version
+        if self.settings.os == "Windows":
+            del self.options.lto
+    
+    def build_requirements(self):
+        self.build_requires("buildhelper-ue4/0.0.1@{}/{}".format(self.user, self.channel))
+    
     def cmake_flags(self):
         return [
             "-DCARES_STATIC=ON",
@@ -18,7 +34,9 @@ class CaresUe4Conan(ConanFile):
         ]
     
     def source(self):
-        self.run("git clone --progress --depth=1 https://github.com/c-ares/c-ares.git -b cares-{}".format(self.version.replace('.', '_')))
+        from build_helper import BuildTrace, SourceCache
+        with BuildTrace(self).phase("source"):
+            SourceCache(self).clone("https://github.com/c-ares/c-ares.git", ref="cares-{}".format(self.version.replace('.', '_')))
     
     def build(self):
         
@@ -27,10 +45,21 @@ class CaresUe4Conan(ConanFile):
         LibCxx.set_vars(self)
         
         # Build c-ares
-        cmake = CMake(self)
-        cmake.configure(source_folder="c-ares", args=self.cmake_flags())
-        cmake.build()
-        cmake.install()
+        from build_helper import RecipeBuild
+        build = RecipeBuild(self, memory_per_job=256, build_size=64, folders=["c-ares"])
+        cmake = build.cmake()
+        with build.phase("configure"):
+            cmake.configure(source_folder="c-ares", build_folder=build.build_folder, args=self.cmake_flags())
+        with build.phase("compile"):
+            cmake.build()
+        with build.phase("install"):
+            cmake.install()
+        build.finish()
+    
+    def package(self):
+        from build_helper import PackageManifest
+        PackageManifest(self).write()
     
     def package_info(self):
-        self.cpp_info.libs = tools.collect_libs(self)
+        manifest = os.path.join(self.package_folder, "package-info.json")
+        self.cpp_info.libs = json.loads(tools.load(manifest))["libs"] if os.path.exists(manifest) else tools.collect_libs(self)
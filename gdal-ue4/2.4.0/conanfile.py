@@ -1,5 +1,5 @@
 from conans import AutoToolsBuildEnvironment, ConanFile, MSBuild, tools
-import os
+import json, os
 
 class GdalUe4Conan(ConanFile):
     name = "gdal-ue4"
@@ -8,6 +8,8 @@ class GdalUe4Conan(ConanFile):
     url = "https://github.com/adamrehn/ue4-conan-recipes/gdal-ue4"
     description = "GDAL custom build for Unreal Engine 4"
     settings = "os", "compiler", "build_type", "arch"
+    options = {"split_debug_info": [True, False], "gc_sections": [True, False]}
+    default_options = {"split_debug_info": False, "gc_sections": False}
     generators = "cmake"
     short_paths = True
     requires = (
@@ -20,6 +22,16 @@ class GdalUe4Conan(ConanFile):
             search, replace = pair
             tools.replace_in_file(filename, search, replace)
     
+    def config_options(self):
+        
+        # Splitting debug information is only supported for ELF binaries
+        if self.settings.os != "Linux":
+            del self.options.split_debug_info
+        
+        # Section garbage collection is only supported by GCC-compatible toolchains
+        if self.settings.os == "Windows":
+            del self.options.gc_sections
+    
     def requirements(self):
         self.requires("geos-ue4/3.6.3@adamrehn/{}".format(self.channel))
         self.requires("proj-ue4/4.9.3@adamrehn/{}".format(self.channel))
@@ -27,6 +39,9 @@ class GdalUe4Conan(ConanFile):
         self.requires("UElibPNG/ue4@adamrehn/{}".format(self.channel))
         self.requires("zlib/ue4@adamrehn/{}".format(self.channel))
     
+    def build_requirements(self):
+        self.build_requires("buildhelper-ue4/0.0.1@{}/{}".format(self.user, self.channel))
+    
     def configure_flags(self):
         
         # Determine the absolute path to `geos-config`
@@ -120,16 +135,28 @@ class GdalUe4Conan(ConanFile):
         ]
     
     def source(self):
-        self.run("git clone --progress --depth=1 https://github.com/OSGeo/gdal.git -b v{}".format(self.version))
+        from build_helper import BuildTrace, SourceCache
+        with BuildTrace(self).phase("source"):
+            SourceCache(self).clone("https://github.com/OSGeo/gdal.git", ref="v{}".format(self.version))
     
     def build(self):
         
+        # Enable compiler interposition under Linux to enforce the correct flags for libc++
+        from libcxx import LibCxx
+        LibCxx.set_vars(self)
+        
+        # Set up the build for both platforms
+        # (GDAL is built inside its source tree, so no separate RAM disk build folder is needed)
+        from build_helper import RecipeBuild
+        self._build = RecipeBuild(self, memory_per_job=1024, build_size=2048, folders=["gdal"], build_folder=False, autotools=self.settings.os != "Windows")
+        
         # Build GDAL using Visual Studio under Windows and autotools under other platforms
         with tools.chdir("./gdal/gdal"):
             if self.settings.os == "Windows":
                 self.build_windows()
             else:
                 self.build_unix()
+        self._build.finish()
     
     def build_windows(self):
         
@@ -204,23 +231,22 @@ class GdalUe4Conan(ConanFile):
         
         # Generate the Visual Studio project file
         msvcVersion = int(str(self.settings.compiler.version))
-        self.run("generate_vcxproj.bat {:.1f} {} gdal".format(
-            15 if msvcVersion > 15 else msvcVersion,
-            '64' if self.settings.arch == 'x86_64' else '32'
-        ))
+        with self._build.phase("configure"):
+            self.run("generate_vcxproj.bat {:.1f} {} gdal".format(
+                15 if msvcVersion > 15 else msvcVersion,
+                '64' if self.settings.arch == 'x86_64' else '32'
+            ))
         
         # Build the project and install the built files in our package folder
         msbuild = MSBuild(self)
-        msbuild.build("gdal.vcxproj")
+        with self._build.phase("compile"):
+            msbuild.build("gdal.vcxproj")
     
     def build_unix(self):
         
-        # Enable compiler interposition under Linux to enforce the correct flags for libc++
-        from libcxx import LibCxx
-        LibCxx.set_vars(self)
-        
         # Run autogen.sh
-        self.run("./autogen.sh")
+        with self._build.phase("autogen"):
+            self.run("./autogen.sh")
 
         # Patch out iconv support under Mac OS X and patch GDAL v2.4.0 for XCode 12.x
         if self.settings.os == "Macos":
@@ -237,6 +263,7 @@ class GdalUe4Conan(ConanFile):
             tools.replace_in_file("./configure", "-lz", "-l{}".format(zlibName))
         
         # Prepare the autotools build environment
+        from libcxx import LibCxx
         autotools = AutoToolsBuildEnvironment(self)
         LibCxx.fix_autotools(autotools)
         
@@ -246,10 +273,18 @@ class GdalUe4Conan(ConanFile):
         
         # Build using autotools
         with tools.environment_append({"LD_LIBRARY_PATH": ldPath}):
-            autotools.configure(args=self.configure_flags())
-            autotools.make(args=["-j{}".format(tools.cpu_count())])
-            autotools.make(target="install")
+            with self._build.phase("configure"):
+                autotools.configure(args=self.configure_flags())
+            with self._build.phase("compile"):
+                autotools.make(args=["-j{}".format(self._build.jobs)])
+            with self._build.phase("install"):
+                autotools.make(target="install")
+    
+    def package(self):
+        from build_helper import PackageManifest
+        PackageManifest(self).write()
     
     def package_info(self):
-        self.cpp_info.libs = tools.collect_libs(self)
+        manifest = os.path.join(self.package_folder, "package-info.json")
+        self.cpp_info.libs = json.loads(tools.load(manifest))["libs"] if os.path.exists(manifest) else tools.collect_libs(self)
         self.cpp_info.resdirs = ["data"]
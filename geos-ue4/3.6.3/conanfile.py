@@ -1,5 +1,5 @@
-from conans import ConanFile, CMake, tools
-import os
+from conans import ConanFile, tools
+import json, os
 
 class GeosUe4Conan(ConanFile):
     name = "geos-ue4"
@@ -8,9 +8,24 @@ class GeosUe4Conan(ConanFile):
     url = "https://github.com/adamrehn/ue4-conan-recipes/geos-ue4"
     description = "GEOS custom build for Unreal Engine 4"
     settings = "os", "compiler", "build_type", "arch"
+    options = {"split_debug_info": [True, False], "gc_sections": [True, False]}
+    default_options = {"split_debug_info": False, "gc_sections": False}
     generators = "cmake"
     requires = ("libcxx/ue4@adamrehn/profile")
     
+    def config_options(self):
+        
+        # Splitting debug information is only supported for ELF binaries
+        if self.settings.os != "Linux":
+            del self.options.split_debug_info
+        
+        # Section garbage collection is only supported by GCC-compatible toolchains
+        if self.settings.os == "Windows":
+            del self.options.gc_sections
+    
+    def build_requirements(self):
+        self.build_requires("buildhelper-ue4/0.0.1@{}/{}".format(self.user, self.channel))
+    
     def cmake_flags(self):
         return [
             "-DGEOS_BUILD_STATIC=OFF",
@@ -21,7 +36,9 @@ class GeosUe4Conan(ConanFile):
     def source(self):
         
         # Clone the source code
-        self.run("git clone --progress --depth=1 https://github.com/libgeos/geos -b {}".format(self.version))
+        from build_helper import BuildTrace, SourceCache
+        with BuildTrace(self).phase("source"):
+            SourceCache(self).clone("https://github.com/libgeos/geos", ref=self.version)
         
         # Prevent CMake from creating .so files with version suffixes under Unix platforms
         tools.replace_in_file("geos/src/CMakeLists.txt", "VERSION ${VERSION}", "")
@@ -35,11 +52,18 @@ class GeosUe4Conan(ConanFile):
         LibCxx.set_vars(self)
         
         # Build GEOS
+        # (Hidden symbol visibility is not used, since GEOS relies on default visibility to export the symbols of its shared libraries)
+        from build_helper import RecipeBuild
+        build = RecipeBuild(self, memory_per_job=768, build_size=1024, folders=["geos"], hidden_visibility=False)
         with tools.environment_append({"CI": "1"}):
-            cmake = CMake(self)
-            cmake.configure(source_folder="geos", args=self.cmake_flags())
-            cmake.build()
-            cmake.install()
+            cmake = build.cmake()
+            with build.phase("configure"):
+                cmake.configure(source_folder="geos", build_folder=build.build_folder, args=self.cmake_flags())
+            with build.phase("compile"):
+                cmake.build()
+            with build.phase("install"):
+                cmake.install()
+            build.finish()
         
         # We need to post-process `geos-config` on platforms where it is generated
         geosConfig = os.path.join(self.package_folder, "bin", "geos-config")
@@ -59,5 +83,10 @@ class GeosUe4Conan(ConanFile):
             ]) + script[ script.index("usage()") : ]
             tools.save(geosConfig, script)
     
+    def package(self):
+        from build_helper import PackageManifest
+        PackageManifest(self).write()
+    
     def package_info(self):
-        self.cpp_info.libs = tools.collect_libs(self)
+        manifest = os.path.join(self.package_folder, "package-info.json")
+        self.cpp_info.libs = json.loads(tools.load(manifest))["libs"] if os.path.exists(manifest) else tools.collect_libs(self)
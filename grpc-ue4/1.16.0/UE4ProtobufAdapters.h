@@ -0,0 +1,102 @@
+// Runtime support for the adapter code generated by protoc-gen-ue4
+#pragma once
+
+#include "CoreMinimal.h"
+
+THIRD_PARTY_INCLUDES_START
+#include <google/protobuf/io/zero_copy_stream.h>
+#include <google/protobuf/io/zero_copy_stream_impl_lite.h>
+#include <google/protobuf/message_lite.h>
+#include <cstdint>
+#include <string>
+THIRD_PARTY_INCLUDES_END
+
+namespace UE4Protobuf
+{
+	// A ZeroCopyOutputStream that hands out blocks of a TArray<uint8> buffer, growing the array as required
+	class FTArrayOutputStream : public google::protobuf::io::ZeroCopyOutputStream
+	{
+		public:
+			explicit FTArrayOutputStream(TArray<uint8>& InBuffer) : Buffer(InBuffer), Initial(InBuffer.Num()) {}
+
+			virtual bool Next(void** Data, int* Size) override
+			{
+				// Double the capacity of the array each time, so the total number of reallocations is logarithmic
+				const int32 Position = Buffer.Num();
+				const int32 Grow = FMath::Max(FMath::Max(Position, Buffer.Max() - Position), MinimumBlockSize);
+				Buffer.AddUninitialized(Grow);
+				*Data = Buffer.GetData() + Position;
+				*Size = Grow;
+				return true;
+			}
+
+			virtual void BackUp(int Count) override
+			{
+				Buffer.SetNum(Buffer.Num() - Count, false);
+			}
+
+			virtual int64_t ByteCount() const override
+			{
+				return Buffer.Num() - Initial;
+			}
+
+		private:
+			static const int32 MinimumBlockSize = 256;
+			TArray<uint8>& Buffer;
+			int32 Initial;
+	};
+
+	// A ZeroCopyInputStream that reads directly from the memory owned by a TArray<uint8> or TArrayView<const uint8>
+	class FTArrayInputStream : public google::protobuf::io::ArrayInputStream
+	{
+		public:
+			explicit FTArrayInputStream(TArrayView<const uint8> Bytes) : ArrayInputStream(Bytes.GetData(), Bytes.Num()) {}
+	};
+
+	// Serialises a message into a TArray<uint8>, replacing its existing contents
+	// (The message size is known up front, so the array is sized once and the message is written straight into it)
+	template <typename MessageType>
+	inline bool SerializeToTArray(const MessageType& Message, TArray<uint8>& OutBytes)
+	{
+		const size_t Size = Message.ByteSizeLong();
+		OutBytes.SetNumUninitialized(static_cast<int32>(Size));
+		return Message.SerializeToArray(OutBytes.GetData(), static_cast<int>(Size));
+	}
+
+	// Serialises a message onto the end of a TArray<uint8>, preserving its existing contents
+	template <typename MessageType>
+	inline bool AppendToTArray(const MessageType& Message, TArray<uint8>& OutBytes)
+	{
+		FTArrayOutputStream Stream(OutBytes);
+		return Message.SerializeToZeroCopyStream(&Stream);
+	}
+
+	// Parses a message directly from the memory of a TArrayView<const uint8>
+	template <typename MessageType>
+	inline bool ParseFromTArrayView(MessageType& Message, TArrayView<const uint8> Bytes)
+	{
+		FTArrayInputStream Stream(Bytes);
+		return Message.ParseFromZeroCopyStream(&Stream);
+	}
+
+	// Parses a message directly from the memory of a TArray<uint8>
+	template <typename MessageType>
+	inline bool ParseFromTArray(MessageType& Message, const TArray<uint8>& Bytes)
+	{
+		return ParseFromTArrayView(Message, TArrayView<const uint8>(Bytes));
+	}
+
+	// Returns a view of the bytes held by a std::string, without copying them
+	inline TArrayView<const uint8> ToView(const std::string& Value)
+	{
+		return TArrayView<const uint8>(reinterpret_cast<const uint8*>(Value.data()), static_cast<int32>(Value.size()));
+	}
+
+	// Converts a UTF-8 std::string to an FString
+	// (FString stores TCHAR data, so this is the one copy that cannot be avoided for string fields)
+	inline FString ToFString(const std::string& Value)
+	{
+		const FUTF8ToTCHAR Converted(Value.data(), static_cast<int32>(Value.size()));
+		return FString(Converted.Length(), Converted.Get());
+	}
+}
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# protoc plugin that generates Unreal Engine 4 adapter code for each message in a .proto file.
+#
+# The plugin is invoked by `ProtoCompiler.codegen()` when adapter generation is enabled, and emits a
+# `<name>.ue4.h` header alongside each `<name>.pb.h` header. The generated adapters serialise messages
+# directly into `TArray<uint8>` buffers and parse directly from them (via the zero-copy streams in
+# `UE4ProtobufAdapters.h`) and provide `FString` and `TArrayView` accessors for string and bytes fields.
+#
+# The plugin decodes the CodeGeneratorRequest wire format itself, so that it has no dependencies
+# beyond the Python standard library.
+import sys
+
+# Field numbers and enum values from descriptor.proto and plugin.proto
+_FIELD_LABEL_REPEATED = 3
+_FIELD_TYPE_STRING = 9
+_FIELD_TYPE_BYTES = 12
+_FEATURE_PROTO3_OPTIONAL = 1
+
+# Field names that protobuf suffixes with an underscore when generating C++ accessors
+_CPP_KEYWORDS = set([
+    "alignas", "alignof", "and", "and_eq", "asm", "auto", "bitand", "bitor", "bool", "break", "case", "catch", "char",
+    "class", "compl", "const", "constexpr", "const_cast", "continue", "decltype", "default", "delete", "do", "double",
+    "dynamic_cast", "else", "enum", "explicit", "export", "extern", "false", "float", "for", "friend", "goto", "if",
+    "inline", "int", "long", "mutable", "namespace", "new", "noexcept", "not", "not_eq", "nullptr", "operator", "or",
+    "or_eq", "private", "protected", "public", "register", "reinterpret_cast", "return", "short", "signed", "sizeof",
+    "static", "static_assert", "static_cast", "struct", "switch", "template", "this", "thread_local", "throw", "true",
+    "try", "typedef", "typeid", "typename", "union", "unsigned", "using", "virtual", "void", "volatile", "wchar_t",
+    "while", "xor", "xor_eq"
+])
+
+# Decodes a base-128 varint, returning its value and the offset of the following byte
+def _read_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, offset
+
+# Decodes a protobuf message into a dictionary mapping field numbers to lists of values
+# (Length-delimited fields are returned as raw bytes and all other scalar fields as integers)
+def _parse(data):
+    fields = {}
+    offset = 0
+    while offset < len(data):
+        key, offset = _read_varint(data, offset)
+        number, wireType = key >> 3, key & 0x7
+        if wireType == 0:
+            value, offset = _read_varint(data, offset)
+        elif wireType == 1:
+            value, offset = int.from_bytes(data[offset : offset + 8], "little"), offset + 8
+        elif wireType == 2:
+            length, offset = _read_varint(data, offset)
+            value, offset = data[offset : offset + length], offset + length
+        elif wireType == 5:
+            value, offset = int.from_bytes(data[offset : offset + 4], "little"), offset + 4
+        else:
+            raise RuntimeError("unsupported wire type {}".format(wireType))
+        fields.setdefault(number, []).append(value)
+    return fields
+
+# Encodes an unsigned integer as a base-128 varint
+def _encode_varint(value):
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+# Encodes a single field, where bytes values are length-delimited and integer values are varints
+def _encode_field(number, value):
+    if isinstance(value, int):
+        return _encode_varint(number << 3) + _encode_varint(value)
+    return _encode_varint((number << 3) | 2) + _encode_varint(len(value)) + value
+
+# Retrieves the first value of a string field from a decoded message
+def _string(fields, number, default=""):
+    return fields[number][0].decode("utf-8") if number in fields else default
+
+# Retrieves the first value of an integer field from a decoded message
+def _integer(fields, number, default=0):
+    return fields[number][0] if number in fields else default
+
+# Converts a snake_case field name to the CamelCase form used by Unreal Engine function names
+def _camel_case(name):
+    return "".join([part[:1].upper() + part[1:] for part in name.split("_")])
+
+# Returns the (C++ class name, fields) pairs for the specified message descriptors and their nested messages
+# (The synthetic entry messages that protoc generates for map fields are excluded)
+def _messages(descriptors, prefix=""):
+    messages = []
+    for descriptor in descriptors:
+        message = _parse(descriptor)
+        options = _parse(message[7][0]) if 7 in message else {}
+        if _integer(options, 7) != 0:
+            continue
+        name = prefix + _string(message, 1)
+        messages.append((name, [_parse(field) for field in message.get(2, [])]))
+        messages.extend(_messages(message.get(3, []), name + "_"))
+    return messages
+
+# Generates the adapter header for the specified FileDescriptorProto
+def _generate(descriptor):
+    protoName = _string(descriptor, 1)
+    stem = protoName[: -len(".proto")] if protoName.endswith(".proto") else protoName
+    package = _string(descriptor, 2)
+    
+    lines = [
+        "// Generated by protoc-gen-ue4 from {}, do not edit".format(protoName),
+        "#pragma once",
+        "",
+        "#include \"{}.pb.h\"".format(stem),
+        "#include \"UE4ProtobufAdapters.h\"",
+        ""
+    ]
+    
+    # The adapters are declared in the same namespace as the messages, so they can be found via argument-dependent lookup
+    namespaces = [part for part in package.split(".") if len(part) > 0]
+    lines.extend(["namespace {} {{".format(namespace) for namespace in namespaces] + [""])
+    for message, fields in _messages(descriptor.get(4, [])):
+        
+        # Serialisation to and from TArray buffers
+        lines.extend([
+            "inline bool SerializeToTArray(const {0}& Message, TArray<uint8>& OutBytes) {{ return UE4Protobuf::SerializeToTArray(Message, OutBytes); }}".format(message),
+            "inline bool AppendToTArray(const {0}& Message, TArray<uint8>& OutBytes) {{ return UE4Protobuf::AppendToTArray(Message, OutBytes); }}".format(message),
+            "inline bool ParseFromTArray({0}& Message, const TArray<uint8>& Bytes) {{ return UE4Protobuf::ParseFromTArray(Message, Bytes); }}".format(message),
+            "inline bool ParseFromTArrayView({0}& Message, TArrayView<const uint8> Bytes) {{ return UE4Protobuf::ParseFromTArrayView(Message, Bytes); }}".format(message)
+        ])
+        
+        # Accessors for singular string and bytes fields
+        for field in fields:
+            fieldName = _string(field, 1)
+            accessor = fieldName.lower() + ("_" if fieldName.lower() in _CPP_KEYWORDS else "")
+            function = _camel_case(fieldName)
+            if _integer(field, 4) == _FIELD_LABEL_REPEATED:
+                continue
+            if _integer(field, 5) == _FIELD_TYPE_STRING:
+                lines.extend([
+                    "inline FString Get{0}AsFString(const {1}& Message) {{ return UE4Protobuf::ToFString(Message.{2}()); }}".format(function, message, accessor),
+                    "inline void Set{0}FromFString({1}& Message, const FString& Value) {{ const FTCHARToUTF8 Converted(*Value); Message.set_{2}(Converted.Get(), Converted.Length()); }}".format(function, message, accessor)
+                ])
+            elif _integer(field, 5) == _FIELD_TYPE_BYTES:
+                lines.extend([
+                    "inline TArrayView<const uint8> Get{0}AsView(const {1}& Message) {{ return UE4Protobuf::ToView(Message.{2}()); }}".format(function, message, accessor),
+                    "inline void Set{0}FromTArray({1}& Message, TArrayView<const uint8> Value) {{ Message.set_{2}(reinterpret_cast<const char*>(Value.GetData()), Value.Num()); }}".format(function, message, accessor)
+                ])
+        
+        lines.append("")
+    
+    lines.extend(["}} // namespace {}".format(namespace) for namespace in reversed(namespaces)] + [""])
+    return stem + ".ue4.h", "\n".join(lines)
+
+# Generates an adapter header for each of the files in the CodeGeneratorRequest read from stdin
+def main():
+    
+    # Parse the CodeGeneratorRequest and generate an adapter header for each of the requested files
+    request = _parse(sys.stdin.buffer.read())
+    requested = [name.decode("utf-8") for name in request.get(1, [])]
+    descriptors = {}
+    for encoded in request.get(15, []):
+        descriptor = _parse(encoded)
+        descriptors[_string(descriptor, 1)] = descriptor
+    
+    # Encode the CodeGeneratorResponse
+    response = _encode_field(2, _FEATURE_PROTO3_OPTIONAL)
+    for name in requested:
+        filename, content = _generate(descriptors[name])
+        response += _encode_field(15, _encode_field(1, filename.encode("utf-8")) + _encode_field(15, content.encode("utf-8")))
+    sys.stdout.buffer.write(response)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from conans import ConanFile, CMake, tools
+from conans import ConanFile, tools
 import json, os
 
 class GrpcUe4Conan(ConanFile):
@@ -8,20 +8,43 @@ class GrpcUe4Conan(ConanFile):
     url = "https://github.com/adamrehn/ue4-conan-recipes/grpc-ue4"
     description = "gRPC custom build for Unreal Engine 4"
     settings = "os", "compiler", "build_type", "arch"
+    options = {"split_debug_info": [True, False], "gc_sections": [True, False], "lto": [True, False], "pgo": [True, False]}
+    default_options = {"split_debug_info": False, "gc_sections": False, "lto": False, "pgo": False}
     generators = "cmake"
     short_paths = True
-    exports = "*.py"
+    exports = "*.py", "*.h", "*.cpp"
     requires = (
         "libcxx/ue4@adamrehn/profile",
         "ue4util/ue4@adamrehn/profile"
     )
     
+    def config_options(self):
+        
+        # Splitting debug information is only supported for ELF binaries
+        if self.settings.os != "Linux":
+            del self.options.split_debug_info
+        
+        # Section garbage collection is only supported by GCC-compatible toolchains
+        if self.settings.os == "Windows":
+            del self.options.gc_sections
+        
+        # Link-time optimisation is not supported under Windows, since MSVC ties the resulting libraries to a specific compiler version
+        if self.settings.os == "Windows":
+            del self.options.lto
+        
+        # Profile-guided optimisation is only supported when building with clang under Linux, since Apple's toolchain lacks `llvm-profdata`
+        if self.settings.os != "Linux" or self.settings.compiler != "clang":
+            del self.options.pgo
+    
     def requirements(self):
         self.requires("OpenSSL/ue4@adamrehn/{}".format(self.channel))
         self.requires("zlib/ue4@adamrehn/{}".format(self.channel))
         self.requires("cares-ue4/1.16.1@{}/{}".format(self.user, self.channel))
         self.requires("protobuf-ue4/3.12.3@{}/{}".format(self.user, self.channel))
     
+    def build_requirements(self):
+        self.build_requires("buildhelper-ue4/0.0.1@{}/{}".format(self.user, self.channel))
+    
     def cmake_flags(self):
         
         # Retrieve the absolute paths to libprotobuf, libprotoc, and protoc
@@ -56,22 +79,25 @@ class GrpcUe4Conan(ConanFile):
     def source(self):
         
         # Clone the gRPC repo and the submodules that we need
-        self.run(" ".join([
-            "git", "clone",
-            "--progress", "--recursive", "--depth=1",
-            "https://github.com/grpc/grpc.git", "-b", "v{}".format(self.version),
-            "--recurse-submodules=\".\"",
-            "--recurse-submodules=\":(exclude)third_party/benchmark\"",
-            "--recurse-submodules=\":(exclude)third_party/bloaty\"",
-            "--recurse-submodules=\":(exclude)third_party/boringssl\"",
-            "--recurse-submodules=\":(exclude)third_party/boringssl-with-bazel\"",
-            "--recurse-submodules=\":(exclude)third_party/cares\"",
-            "--recurse-submodules=\":(exclude)third_party/googletest\"",
-            "--recurse-submodules=\":(exclude)third_party/libcxx\"",
-            "--recurse-submodules=\":(exclude)third_party/libcxxabi\"",
-            "--recurse-submodules=\":(exclude)third_party/protobuf\"",
-            "--recurse-submodules=\":(exclude)third_party/zlib\""
-        ]))
+        from build_helper import BuildTrace, SourceCache
+        with BuildTrace(self).phase("source"):
+            SourceCache(self).clone(
+                "https://github.com/grpc/grpc.git",
+                ref="v{}".format(self.version),
+                submodules=True,
+                exclude=[
+                    "third_party/benchmark",
+                    "third_party/bloaty",
+                    "third_party/boringssl",
+                    "third_party/boringssl-with-bazel",
+                    "third_party/cares",
+                    "third_party/googletest",
+                    "third_party/libcxx",
+                    "third_party/libcxxabi",
+                    "third_party/protobuf",
+                    "third_party/zlib"
+                ]
+            )
         
         # Disable the dependency on the Google benchmarking library
         tools.replace_in_file(
@@ -93,21 +119,51 @@ class GrpcUe4Conan(ConanFile):
         from libcxx import LibCxx
         LibCxx.set_vars(self)
         
+        # Set up the build first, since both stages of a profile-guided optimisation build share it
+        from build_helper import ProfileGuidedOptimisation, RecipeBuild
+        build = RecipeBuild(self, memory_per_job=2048, build_size=3072, folders=["grpc"])
+        
+        # If profile-guided optimisation has been requested then build an instrumented copy of grpc and train it with the bundled workload
+        if self.options.get_safe("pgo"):
+            pgo = ProfileGuidedOptimisation(self)
+            with pgo.instrumented():
+                cmake = build.cmake(lto=False)
+                pgo.apply(cmake)
+                with build.phase("pgo-instrumented"):
+                    cmake.configure(source_folder="grpc", build_folder=pgo.build_folder, args=self.cmake_flags())
+                    cmake.install()
+                with build.phase("pgo-training"):
+                    pgo.train(["pgo_training.cpp"], exclude=["_cronet", "_unsecure"])
+            pgo.optimise()
+        
         # Build grpc
-        cmake = CMake(self)
-        cmake.configure(source_folder="grpc", args=self.cmake_flags())
-        cmake.build(target="grpc++")
-        cmake.install()
+        cmake = build.cmake()
+        with build.phase("configure"):
+            cmake.configure(source_folder="grpc", build_folder=build.build_folder, args=self.cmake_flags())
+        with build.phase("compile"):
+            cmake.build(target="grpc++")
+        with build.phase("install"):
+            cmake.install()
+        build.finish()
     
     def package(self):
         self.copy("__init__.py")
         self.copy("grpc_helper.py")
+        self.copy("protoc_gen_ue4.py")
+        self.copy("UE4ProtobufAdapters.h", dst="include")
+        from build_helper import PackageManifest
+        PackageManifest(self).write(**self._metadata())
     
-    def package_info(self):
+    def _metadata(self):
         
         # Filter out any extensions when listing our exported libraries
-        self.cpp_info.libs = tools.collect_libs(self)
-        self.cpp_info.libs = list([lib for lib in self.cpp_info.libs if "_ext" not in lib])
+        libs = [lib for lib in tools.collect_libs(self, folder="lib") if "_ext" not in lib]
+        return {"libs": libs}
+    
+    def package_info(self):
+        manifest = os.path.join(self.package_folder, "package-info.json")
+        metadata = json.loads(tools.load(manifest)) if os.path.exists(manifest) else self._metadata()
+        self.cpp_info.libs = metadata["libs"]
         
         # Provide the necessary data so that consumers can instantiate a `ProtoCompiler` object
         self.env_info.PYTHONPATH.append(self.package_folder)
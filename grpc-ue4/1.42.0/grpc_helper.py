@@ -1,11 +1,495 @@
-import glob, json, os, subprocess
+import asyncio, collections, concurrent.futures, ctypes, ctypes.util, glob, hashlib, json, os, re, select, shutil, struct, subprocess, sys, tempfile, threading, time
 from ue4util import Utility
 
-# Generator to interleave two lists
-# (Based on this example: <https://stackoverflow.com/a/50312321>)
-def _interleave(*args):
-    for vals in zip(*args):
-        yield from vals
+# The regular expression used to extract the import statements from .proto files
+_IMPORT_REGEX = re.compile(r'^\s*import\s+(?:public\s+|weak\s+)?"([^"]+)"\s*;', re.MULTILINE)
+
+# The suffixes of the files that are generated for each .proto file
+# (The protobuf message code is listed first, since it is the only code that is generated for every .proto file)
+_OUTPUT_SUFFIXES = [".pb.h", ".pb.cc", ".grpc.pb.h", ".grpc.pb.cc", ".ue4.h"]
+
+# The protoc plugin that generates UE4 adapter code, which is packaged alongside this module
+_ADAPTER_PLUGIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "protoc_gen_ue4.py")
+
+# The name of the file in the output directory that stores the import graph between runs
+_INDEX_FILENAME = ".grpc_helper_index.json"
+
+# The prefix for the temporary directories in which generated code is staged prior to being moved to the output directory
+_STAGING_PREFIX = ".grpc_helper_staging_"
+
+# The default filename prefix for unity translation units
+_UNITY_PREFIX = "ProtoUnity"
+
+# The preprocessor symbol that unity translation units define before including the generated sources
+_UNITY_DEFINE = "GRPC_HELPER_UNITY_BUILD"
+
+# The regular expression used to identify file-scope static variables in generated sources
+_STATIC_REGEX = re.compile(r'^static\s[^=;(]*?\b([A-Za-z_]\w*)\s*(?:\[[^\]]*\]\s*)?(?:PROTOBUF_SECTION_VARIABLE\([^)]*\)\s*)?[=;]', re.MULTILINE)
+
+# The regular expression used to identify the symbols declared at the top level of anonymous namespaces in generated sources
+_ANONYMOUS_SYMBOL_REGEX = re.compile(r'^(?:(?:class|struct|enum)\s+([A-Za-z_]\w*)|[^\s#/}][^=;(]*?\b([A-Za-z_]\w*)\s*(?:\[[^\]]*\]\s*)?[=;(])', re.MULTILINE)
+
+# Returns the items of a list with any duplicates removed, preserving the order in which they first appear
+def _unique(items):
+    seen = set()
+    return [item for item in items if not (item in seen or seen.add(item))]
+
+# Determines the maximum length of a command line that can safely be passed to a child process
+def _command_line_limit():
+    
+    # Windows limits the total length of the command line passed to CreateProcess() to 32767 characters
+    if os.name == "nt":
+        return 32000
+    
+    # Under other platforms the limit applies to the combined size of the arguments and the environment block
+    try:
+        limit = os.sysconf("SC_ARG_MAX")
+    except (AttributeError, ValueError, OSError):
+        limit = 131072
+    environment = sum([len(key) + len(value) + 2 for key, value in os.environ.items()])
+    return max(limit - environment - 4096, 8192)
+
+# Splits a list of arguments into batches whose combined length does not exceed the specified limit
+def _batches(args, limit):
+    batch = []
+    length = 0
+    for arg in args:
+        if len(batch) > 0 and length + len(arg) + 1 > limit:
+            yield batch
+            batch = []
+            length = 0
+        batch.append(arg)
+        length += len(arg) + 1
+    if len(batch) > 0:
+        yield batch
+
+# Parses the import statements from the specified .proto file and returns the list of imported filenames
+def _parse_imports(filename):
+    with open(filename, "r", encoding="utf-8", errors="replace") as f:
+        return _IMPORT_REGEX.findall(f.read())
+
+# Normalises a filesystem path so it can be used as a dictionary key
+def _normalise(path):
+    return os.path.normcase(os.path.abspath(path))
+
+# Resolves the path to an imported .proto file against a list of include directories, returning None if it cannot be found
+def _resolve_import(name, includes):
+    for include in includes:
+        candidate = os.path.join(include, name)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+# Determines whether two files have identical contents
+def _same_contents(first, second):
+    if os.path.getsize(first) != os.path.getsize(second):
+        return False
+    with open(first, "rb") as f1, open(second, "rb") as f2:
+        while True:
+            chunk1 = f1.read(65536)
+            chunk2 = f2.read(65536)
+            if chunk1 != chunk2:
+                return False
+            if len(chunk1) == 0:
+                return True
+
+# Moves the files from a staging directory into the output directory, skipping any files whose contents are unchanged
+# so that their modification times are preserved, and returns the list of files that were written
+def _publish(staging, outdir):
+    written = []
+    for root, dirs, files in os.walk(staging):
+        for filename in files:
+            source = os.path.join(root, filename)
+            target = os.path.join(outdir, os.path.relpath(source, staging))
+            if not os.path.exists(target) or not _same_contents(source, target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(source, target)
+                written.append(target)
+    return written
+
+# Removes a previously generated file from the output directory, along with any of its parent directories that are left empty
+def _remove_generated(outdir, name):
+    path = os.path.join(outdir, name)
+    if os.path.exists(path):
+        os.unlink(path)
+    directory = os.path.dirname(path)
+    while _normalise(directory) != _normalise(outdir) and os.path.isdir(directory) and len(os.listdir(directory)) == 0:
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+# Returns the symbols declared in the anonymous namespaces of a generated source file
+def _anonymous_symbols(source):
+    symbols = set()
+    for match in re.finditer(r'^namespace\s*\{', source, re.MULTILINE):
+        
+        # Find the closing brace of the namespace, extracting the declarations at its top level
+        depth = 0
+        body = []
+        for index in range(match.end() - 1, len(source)):
+            char = source[index]
+            depth += 1 if char == "{" else -1 if char == "}" else 0
+            if depth == 0:
+                break
+            if depth == 1:
+                body.append(char)
+        for declaration in _ANONYMOUS_SYMBOL_REGEX.finditer("".join(body)):
+            symbols.add(declaration.group(1) or declaration.group(2))
+    return symbols
+
+# Prepares a generated source file for inclusion in a unity translation unit, guarding its contents so
+# that compiling it on its own produces an empty object file, and giving its file-scope static variables
+# unique names so that they do not collide with those of the other sources in the same translation unit
+def _prepare_unity_source(source, suffix):
+    if source.startswith("#ifdef " + _UNITY_DEFINE):
+        return source
+    for name in set(_STATIC_REGEX.findall(source)):
+        
+        # Names that already include the mangled .proto filename, such as `file_level_metadata_foo_2eproto`, cannot collide
+        if "_2eproto" in name:
+            continue
+        
+        # Only rename unqualified uses of the variable, so that class members with the same name are not affected
+        source = re.sub(r'(?<![\w:.>])' + re.escape(name) + r'(?![\w(])', name + "_" + suffix, source)
+    return "#ifdef {}\n{}\n#endif // {}\n".format(_UNITY_DEFINE, source, _UNITY_DEFINE)
+
+# Returns the path of a .proto file relative to the specified include root, or None if the root does not contain the file
+def _relative_to(proto, root):
+    if not _normalise(proto).startswith(os.path.join(_normalise(root), "")):
+        return None
+    return os.path.relpath(os.path.abspath(proto), os.path.abspath(root))
+
+# Returns the name that protoc gives a .proto file, which is its path relative to the first of the include roots that contains it
+# (protoc names the generated files after this path, so a file in a subdirectory of an earlier include root has nested outputs)
+def _proto_name(proto, roots):
+    for root in roots:
+        name = _relative_to(proto, root)
+        if name is not None:
+            return name
+    return os.path.basename(proto)
+
+# Writes copies of the specified .proto files with the supplied contents, preserving their paths relative to their include roots,
+# and returns a mapping from each original file to its copy along with the list of include roots for the copies
+# (Each file is copied beneath every include root that contains it, so that the copies have the same names as the originals)
+def _write_copies(protos, contents, directory, roots):
+    copies = {}
+    for proto in protos:
+        for index, root in enumerate(roots):
+            name = _relative_to(proto, root)
+            if name is None:
+                continue
+            copy = os.path.join(directory, str(index), name)
+            copies.setdefault(proto, copy)
+            os.makedirs(os.path.dirname(copy), exist_ok=True)
+            with open(copy, "w", encoding="utf-8") as f:
+                f.write(contents[proto])
+    return copies, [os.path.join(directory, str(index)) for index in range(len(roots))]
+
+# Locates the Python interpreter that runs the UE4 adapter plugin, which can be overridden by setting the `GRPC_UE4_PYTHON` environment variable
+# (When Conan is a frozen executable, `sys.executable` is the Conan executable itself, so we search the PATH for an interpreter instead)
+def _python_interpreter():
+    override = os.environ.get("GRPC_UE4_PYTHON", "")
+    if len(override) > 0:
+        return override
+    if not getattr(sys, "frozen", False) and sys.executable:
+        return sys.executable
+    for name in ["python3", "python"]:
+        interpreter = shutil.which(name)
+        if interpreter is not None:
+            return interpreter
+    raise RuntimeError("could not find a Python interpreter to run the UE4 adapter plugin, set the GRPC_UE4_PYTHON environment variable to the path of one")
+
+# Writes a launcher script for the UE4 adapter plugin to the specified directory, since protoc can only run plugins that are executables
+def _write_adapter_launcher(directory):
+    interpreter = _python_interpreter()
+    if os.name == "nt":
+        launcher = os.path.join(directory, "protoc-gen-ue4.bat")
+        with open(launcher, "w") as f:
+            f.write('@"{}" "{}" %*\r\n'.format(interpreter, _ADAPTER_PLUGIN))
+    else:
+        launcher = os.path.join(directory, "protoc-gen-ue4")
+        with open(launcher, "w") as f:
+            f.write('#!/bin/sh\nexec "{}" "{}" "$@"\n'.format(interpreter, _ADAPTER_PLUGIN))
+        os.chmod(launcher, 0o755)
+    return launcher
+
+# Decodes a line of protoc's diagnostic output and passes it to the supplied callback, or prints it to stderr if no callback was supplied
+def _report(line, diagnostics):
+    line = line.decode("utf-8", errors="replace").rstrip("\r\n")
+    if diagnostics is not None:
+        diagnostics(line)
+    else:
+        print(line, file=sys.stderr)
+    return line
+
+# Runs protoc, streaming its diagnostics as they are produced, and returns its exit code along with the diagnostic lines
+def _run_protoc(command, diagnostics):
+    process = subprocess.Popen(command, stderr=subprocess.PIPE)
+    with process.stderr:
+        lines = [_report(line, diagnostics) for line in process.stderr]
+    return process.wait(), lines
+
+# Asynchronous equivalent of `_run_protoc()`, which acquires the supplied semaphore before starting protoc
+async def _run_protoc_async(command, semaphore, diagnostics):
+    async with semaphore:
+        process = await asyncio.create_subprocess_exec(*command, stderr=asyncio.subprocess.PIPE)
+        try:
+            lines = []
+            while True:
+                line = await process.stderr.readline()
+                if len(line) == 0:
+                    break
+                lines.append(_report(line, diagnostics))
+            return await process.wait(), lines
+        
+        except BaseException:
+            
+            # Don't leave protoc running if we were cancelled
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+
+# Resumes a code generation run with the results of its protoc invocations and returns the list of files that it wrote
+def _resume(steps, results):
+    try:
+        steps.send(results)
+    except StopIteration as finished:
+        return finished.value
+    raise RuntimeError("code generation did not complete")
+
+# Computes the SHA-256 hash of the contents of the specified file
+def _hash_file(filename):
+    sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class _ImportGraph():
+    '''
+    Tracks the import relationships between .proto files and the hashes of their contents,
+    persisting them to disk so that only changed files need to be re-parsed on subsequent runs
+    '''
+    
+    def __init__(self, filename):
+        self.filename = filename
+        self.files = {}
+        self.generated = {"signature": None, "hashes": {}, "protos": []}
+        self.outputs = {}
+        self.unity = []
+        self._edges = {}
+        
+        # Load the graph from the previous run, if one exists
+        try:
+            with open(self.filename, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                self.files = data["files"]
+                self.generated = data["generated"]
+                self.outputs = data.get("outputs", {})
+                self.unity = data.get("unity", [])
+        except (OSError, ValueError, KeyError):
+            pass
+    
+    def save(self):
+        '''
+        Writes the graph to disk, replacing the file atomically so that an interrupted run never leaves a truncated index
+        '''
+        staging = self.filename + ".tmp"
+        with open(staging, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files, "generated": self.generated, "outputs": self.outputs, "unity": self.unity}, f)
+        os.replace(staging, self.filename)
+    
+    def scan(self, protos, includes):
+        '''
+        Updates the graph to reflect the current contents of the specified .proto files and their transitive imports,
+        only re-hashing and re-parsing files whose size or modification time have changed since the previous run
+        '''
+        self._edges = {}
+        pending = [_normalise(proto) for proto in protos]
+        while len(pending) > 0:
+            path = pending.pop()
+            if path in self._edges:
+                continue
+            
+            # Refresh the record for the file if it is new or has been modified
+            stat = os.stat(path)
+            record = self.files.get(path)
+            if record is None or record["mtime"] != stat.st_mtime_ns or record["size"] != stat.st_size:
+                record = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "hash": _hash_file(path), "imports": _parse_imports(path)}
+                self.files[path] = record
+            
+            # Resolve the file's imports against the current include directories
+            self._edges[path] = []
+            for name in record["imports"]:
+                resolved = _resolve_import(name, includes)
+                self._edges[path].append((name, _normalise(resolved) if resolved is not None else None))
+                if resolved is not None:
+                    pending.append(_normalise(resolved))
+    
+    def hash(self, path):
+        '''
+        Returns the hash of the contents of the specified file
+        '''
+        return self.files[_normalise(path)]["hash"]
+    
+    def imports(self, path):
+        '''
+        Returns the list of (name, resolved path) pairs for the imports of the specified file, where unresolved paths are None
+        '''
+        return self._edges[_normalise(path)]
+    
+    def closure(self, path):
+        '''
+        Returns the set of files that the specified file imports, either directly or transitively
+        '''
+        visited = set()
+        pending = [_normalise(path)]
+        while len(pending) > 0:
+            for name, resolved in self._edges[pending.pop()]:
+                if resolved is not None and resolved not in visited:
+                    visited.add(resolved)
+                    pending.append(resolved)
+        return visited
+    
+    def dependents(self, paths):
+        '''
+        Returns the set of files that import any of the specified files, either directly or transitively
+        '''
+        
+        # Invert the import edges so we can walk from each file to the files that import it
+        importers = {}
+        for path, imports in self._edges.items():
+            for name, resolved in imports:
+                if resolved is not None:
+                    importers.setdefault(resolved, set()).add(path)
+        
+        visited = set()
+        pending = list(paths)
+        while len(pending) > 0:
+            for importer in importers.get(pending.pop(), []):
+                if importer not in visited:
+                    visited.add(importer)
+                    pending.append(importer)
+        return visited
+    
+    def outdated(self, protos, signature):
+        '''
+        Returns the list of .proto files that need regenerating, which includes any files that have changed since they were last generated
+        along with all of the files that import them. All files are outdated if the code generation signature has changed.
+        '''
+        if self.generated["signature"] != signature:
+            return list(protos)
+        
+        # Identify the files whose contents differ from when code was last generated
+        hashes = self.generated["hashes"]
+        changed = set([path for path in self._edges if hashes.get(path) != self.files[path]["hash"]])
+        changed |= self.dependents(changed)
+        
+        # Files that were not successfully generated by the previous run are also outdated
+        generated = set(self.generated["protos"])
+        return [proto for proto in protos if _normalise(proto) in changed or _normalise(proto) not in generated]
+    
+    def update(self, protos, signature):
+        '''
+        Records that code has been successfully generated for the specified .proto files
+        '''
+        self.generated = {
+            "signature": signature,
+            "hashes": {path: self.files[path]["hash"] for path in self._edges},
+            "protos": sorted(set([_normalise(proto) for proto in protos]))
+        }
+
+
+class OptionPolicy():
+    '''
+    Applies file-level options to .proto files at code generation time, without modifying the files themselves.
+    
+    By default, the policy applies `option optimize_for = SPEED;` and `option cc_enable_arenas = true;`
+    to every file, replacing any conflicting values. Either option can be disabled by passing None:
+    
+    ```
+    from grpc_helper import OptionPolicy, ProtoCompiler
+    policy = OptionPolicy()
+    compiler.codegen(protos, outdir, options=policy)
+    print(policy.changed)
+    ```
+    
+    After code generation, the `changed` attribute maps each .proto file that the policy modified to the
+    list of options that were applied to it.
+    '''
+    
+    def __init__(self, optimize_for="SPEED", cc_enable_arenas=True):
+        self.options = {}
+        if optimize_for is not None:
+            self.options["optimize_for"] = optimize_for
+        if cc_enable_arenas is not None:
+            self.options["cc_enable_arenas"] = "true" if cc_enable_arenas else "false"
+        self.changed = {}
+    
+    def signature(self):
+        '''
+        Returns a string that uniquely identifies the options applied by the policy
+        '''
+        return json.dumps(self.options, sort_keys=True)
+    
+    def apply(self, protos):
+        '''
+        Applies the policy to the specified .proto files, returning a mapping from each file to its rewritten contents
+        '''
+        contents = {}
+        self.changed = {}
+        for proto in protos:
+            with open(proto, "r", encoding="utf-8") as f:
+                contents[proto], applied = self.rewrite(f.read())
+            if len(applied) > 0:
+                self.changed[proto] = applied
+        return contents
+    
+    def rewrite(self, source):
+        '''
+        Applies the policy to the contents of a .proto file, returning the rewritten contents and the list of options that were applied
+        '''
+        applied = []
+        for name, value in sorted(self.options.items()):
+            
+            # Replace the value of the option if the file already specifies a different one
+            existing = re.search(r'^[ \t]*option\s+' + name + r'\s*=\s*([^;]+?)\s*;', source, re.MULTILINE)
+            if existing is not None:
+                if existing.group(1) != value:
+                    source = source[:existing.start(1)] + value + source[existing.end(1):]
+                    applied.append(name)
+                continue
+            
+            # Otherwise, insert the option after the package statement (or the syntax statement if there is no package statement)
+            anchor = re.search(r'^[ \t]*package\s+[\w.]+\s*;', source, re.MULTILINE) or re.search(r'^[ \t]*syntax\s*=\s*"[^"]*"\s*;', source, re.MULTILINE)
+            position = anchor.end() if anchor is not None else 0
+            source = source[:position] + "\noption {} = {};\n".format(name, value) + source[position:]
+            applied.append(name)
+        
+        return source, applied
+
+
+# Describes a failed invocation of protoc, including the .proto files it was processing and the diagnostics it printed
+ProtocFailure = collections.namedtuple("ProtocFailure", ["protos", "command", "returncode", "diagnostics"])
+
+
+class ProtoCompilerError(RuntimeError):
+    '''
+    Raised when protoc fails to generate code for one or more .proto files. The `failures` attribute
+    contains a ProtocFailure for each failed invocation of protoc, and the `protos` attribute lists
+    all of the .proto files whose code could not be generated.
+    '''
+    
+    def __init__(self, failures):
+        self.failures = failures
+        self.protos = [proto for failure in failures for proto in failure.protos]
+        details = ["protoc exited with code {} for {}:\n{}".format(
+            failure.returncode,
+            ", ".join(failure.protos),
+            "\n".join(["    " + line for line in failure.diagnostics])
+        ) for failure in failures]
+        super().__init__("code generation failed for {} .proto file(s)\n{}".format(len(self.protos), "\n".join(details)))
 
 
 class ProtoCompiler():
@@ -19,9 +503,21 @@ class ProtoCompiler():
     from grpc_helper import ProtoCompiler
     compiler = ProtoCompiler(self.deps_user_info["grpc-ue4"].build_data)
     ```
+    
+    Generated code is stored in a persistent cache, so that .proto files which have not changed
+    since a previous run are restored from the cache rather than being passed to the protobuf
+    compiler again. The cache is located in `~/.grpc-ue4/codegen-cache` by default, which can be
+    overridden by setting the `GRPC_UE4_CODEGEN_CACHE` environment variable or by passing the
+    `cache_dir` parameter to the constructor. Specifying an empty string disables the cache.
+    
+    The cache is limited to 1024MiB by default, which can be overridden by setting the
+    `GRPC_UE4_CODEGEN_CACHE_SIZE` environment variable or by passing the `cache_size` parameter to
+    the constructor (both in MiB, where zero removes the limit.) The least recently used entries are
+    evicted whenever the limit is exceeded. The cache can be cleared at any time by deleting its
+    directory, since it only ever holds copies of generated code.
     '''
     
-    def __init__(self, build_data):
+    def __init__(self, build_data, cache_dir=None, cache_size=None):
         '''
         Creates a new ProtoCompiler using the supplied builder data, which is provided
         by the `grpc-ue4` package to consumers via `user_info.build_data`
@@ -33,11 +529,756 @@ class ProtoCompiler():
         # Retrieve the absolute path to protoc and the gRPC C++ plugin
         self.protoc = Utility.resolve_file(protobuf, "protoc")
         self.plugin = Utility.resolve_file(grpc, "grpc_cpp_plugin")
+        
+        # Determine the location of the code generation cache
+        if cache_dir is None:
+            cache_dir = os.environ.get("GRPC_UE4_CODEGEN_CACHE", os.path.join(os.path.expanduser("~"), ".grpc-ue4", "codegen-cache"))
+        self.cache_dir = cache_dir
+        
+        # Determine the maximum size of the code generation cache, in bytes
+        if cache_size is None:
+            cache_size = int(os.environ.get("GRPC_UE4_CODEGEN_CACHE_SIZE", "1024"))
+        self.cache_size = cache_size * 1024 * 1024
+        
+        # protoc automatically searches the `include` directory alongside its `bin` directory for imports (e.g. the well-known types)
+        self._builtin_includes = os.path.join(os.path.dirname(os.path.dirname(self.protoc)), "include")
+        
+        # The hash of the protoc and plugin binaries is computed on demand, since it is only needed when the cache is enabled
+        self._toolchain_hash = None
+    
+    def codegen(self, protos, outdir, jobs=None, manifest=None, depfile=None, unity=None, options=None, adapters=False, diagnostics=None):
+        '''
+        Invokes the protobuf compiler to perform code generation for the specified .proto files,
+        returning the list of generated files whose contents changed
+        
+        The import relationships between the .proto files are stored in the output directory, so that
+        subsequent runs only regenerate the files that have changed and the files that import them.
+        Generated files that a run no longer produces (such as the code for .proto files that have been
+        removed from the list) are deleted, so each output directory should only be used for one list
+        of .proto files.
+        
+        The .proto files are split into independent groups based on their import relationships and
+        code generation for these groups is performed in parallel using up to `jobs` concurrent
+        invocations of protoc (defaulting to the number of CPU cores.) Specify `jobs=1` to perform
+        code generation serially.
+        
+        If `manifest` is specified then a JSON manifest is written to that path, listing each generated
+        file and the .proto files it was generated from. If `depfile` is specified then the same
+        information is written to that path as a Makefile-style depfile, in the format produced by
+        protoc's `--dependency_out` flag.
+        
+        If `unity` is specified then the generated sources are grouped into balanced unity translation
+        units, which are written to the output directory alongside the generated code. `unity` is a dict
+        containing a `max_bytes` or `max_lines` budget for each translation unit and an optional `prefix`
+        for their filenames (defaulting to "ProtoUnity".) The generated sources are guarded so that they
+        compile to empty object files when built individually, and only the unity translation units
+        need to be compiled.
+        
+        If `options` is specified then it is an OptionPolicy whose file-level options are applied to all
+        of the .proto files at generation time, without modifying the files themselves.
+        
+        If `adapters` is True then a `.ue4.h` header is also generated for each .proto file, containing
+        adapters that serialise each message directly into a `TArray<uint8>`, parse directly from one, and
+        convert string and bytes fields to `FString` and `TArrayView` values. The adapters are built on the
+        zero-copy stream wrappers in `UE4ProtobufAdapters.h`, which the grpc-ue4 package provides. The adapter
+        plugin is run with the current Python interpreter, or with the first `python3` or `python` on the PATH
+        when running under a frozen build of Conan. Set the `GRPC_UE4_PYTHON` environment variable to use a
+        specific interpreter instead.
+        
+        protoc's diagnostics are passed line by line to the `diagnostics` callable as they are produced
+        (by default they are printed to stderr.) If protoc fails for any of the .proto files then a
+        ProtoCompilerError is raised, once the code for the remaining files has been written.
+        '''
+        steps = self._codegen_steps(protos, outdir, jobs, manifest, depfile, unity, options, adapters)
+        commands, jobs = next(steps)
+        
+        # Run protoc for each batch, using a thread pool to bound the number of concurrent child processes
+        try:
+            results = []
+            if len(commands) > 0:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=min(jobs, len(commands))) as executor:
+                    results = list(executor.map(lambda command: _run_protoc(command, diagnostics), commands))
+        except BaseException:
+            steps.close()
+            raise
+        return _resume(steps, results)
+    
+    async def codegen_async(self, protos, outdir, jobs=None, manifest=None, depfile=None, unity=None, options=None, adapters=False, diagnostics=None):
+        '''
+        Asynchronous equivalent of `codegen()`, which runs protoc using asyncio subprocesses so that code generation
+        can be overlapped with other work on the same event loop. Code generation can be performed for several
+        sets of .proto files concurrently by gathering multiple calls, provided each call uses its own output directory:
+        
+        ```
+        await asyncio.gather(
+            compiler.codegen_async(gameplayProtos, gameplayOutdir),
+            compiler.codegen_async(serviceProtos, serviceOutdir)
+        )
+        ```
+        
+        The file I/O that takes place before and after protoc is run is offloaded to the event loop's default executor.
+        Note that under Windows the event loop must be a ProactorEventLoop, since other event loops do not support subprocesses.
+        '''
+        
+        # Python 3.5 and 3.6 lack `get_running_loop()`, but there `get_event_loop()` also returns the running loop when called from a coroutine
+        loop = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)()
+        steps = self._codegen_steps(protos, outdir, jobs, manifest, depfile, unity, options, adapters)
+        commands, jobs = await loop.run_in_executor(None, next, steps)
+        
+        # Run protoc for each batch, using a semaphore to bound the number of concurrent child processes
+        try:
+            semaphore = asyncio.Semaphore(jobs)
+            results = await asyncio.gather(*[_run_protoc_async(command, semaphore, diagnostics) for command in commands])
+        except BaseException:
+            steps.close()
+            raise
+        return await loop.run_in_executor(None, _resume, steps, results)
+    
+    def _codegen_steps(self, protos, outdir, jobs, manifest, depfile, unity, options, adapters):
+        '''
+        Performs code generation on behalf of `codegen()` and `codegen_async()`. This is a generator that yields the list
+        of protoc commands to run (along with the maximum number of concurrent invocations), receives the exit code
+        and diagnostics for each command, and returns the list of files that were written.
+        '''
+        flags = self._flags(options, adapters)
+        
+        # Determine the contents of the .proto files after applying the option policy, if one was specified
+        rewritten = options.apply(protos) if options is not None else {}
+        
+        # Update the import graph from the previous run to reflect the current state of the .proto files
+        graph = _ImportGraph(os.path.join(outdir, _INDEX_FILENAME))
+        graph.scan(protos, self._include_dirs(protos))
+        includeRoots = self._include_roots(protos)
+        
+        # Determine which of the .proto files have changed (or import files that have changed) since they were last generated
+        signature = self._signature(protos, flags + [json.dumps(unity, sort_keys=True)])
+        outdated = self._outdated(graph, protos, outdir, signature)
+        
+        # Generate code into a staging directory, so that only files whose contents have actually changed are written to the output directory
+        # (Any staging directories left behind by an interrupted run are removed first, since build tools would otherwise pick them up)
+        for stale in glob.glob(os.path.join(outdir, _STAGING_PREFIX + "*")):
+            shutil.rmtree(stale, ignore_errors=True)
+        staging = tempfile.mkdtemp(prefix=_STAGING_PREFIX, dir=outdir)
+        try:
+            
+            # Determine which of the outdated .proto files have cached outputs that we can restore instead of running protoc
+            pending = outdated
+            if self.cache_dir:
+                keys = {proto: self._cache_key(proto, includeRoots, graph, flags) for proto in outdated}
+                pending = [proto for proto in outdated if not self._restore(keys[proto], staging)]
+            
+            # Generate both the gRPC stubs and the protobuf message code in a single pass over each batch of .proto files
+            # (The include roots for the full list of .proto files are always specified so that imports resolve consistently)
+            failures = []
+            if len(pending) > 0:
+                
+                # If an option policy was specified then protoc is run against rewritten copies of the .proto files,
+                # whose include roots take precedence over the originals so that imports also resolve to the copies
+                # (The launcher for the adapter plugin is written to the same scratch directory, if adapters were requested)
+                scratch = tempfile.mkdtemp(prefix="grpc_helper_") if options is not None or adapters else None
+                try:
+                    inputs, roots = _write_copies(protos, rewritten, os.path.join(scratch, "protos"), includeRoots) if options is not None else ({}, [])
+                    launcher = _write_adapter_launcher(scratch) if adapters else None
+                    command = self._command(protos, staging, roots, launcher)
+                    jobs = max(1, jobs if jobs is not None else (os.cpu_count() or 1))
+                    limit = _command_line_limit() - len(subprocess.list2cmdline(command)) - 1
+                    batches = []
+                    for bucket in self._schedule(pending, graph, jobs):
+                        batches.extend(_batches(bucket, limit))
+                    
+                    # Have the caller run protoc for each batch and record the batches that failed
+                    commands = [command + [inputs.get(proto, proto) for proto in batch] for batch in batches]
+                    results = yield commands, jobs
+                    for batch, batchCommand, (returncode, lines) in zip(batches, commands, results):
+                        if returncode != 0:
+                            failures.append(ProtocFailure(batch, batchCommand, returncode, lines))
+                
+                finally:
+                    if scratch is not None:
+                        shutil.rmtree(scratch, ignore_errors=True)
+            
+            else:
+                
+                # The caller still expects a list of commands to run, even when there is nothing to generate
+                yield [], 1
+            
+            # Store the generated code in the cache so that subsequent runs can re-use it
+            failed = [proto for failure in failures for proto in failure.protos]
+            if self.cache_dir:
+                stored = [self._store(keys[proto], proto, includeRoots, staging) for proto in pending if proto not in failed]
+                if any(stored):
+                    self._evict()
+            
+            # Record the files that are generated for each .proto file, so that any files which are no longer generated can be removed
+            # (Files that were not regenerated by this run, or that failed to generate, retain the outputs recorded by the previous run)
+            outputs = {}
+            regenerated = set(outdated) - set(failed)
+            for proto in protos:
+                previous = graph.outputs.get(_normalise(proto))
+                if proto in regenerated:
+                    outputs[_normalise(proto)] = self._generated(proto, includeRoots, staging)
+                else:
+                    outputs[_normalise(proto)] = previous if previous is not None else self._generated(proto, includeRoots, outdir)
+            
+            # Group the generated sources into unity translation units if requested
+            if unity is not None:
+                translationUnits = self._unity(protos, staging, outdir, **unity)
+            
+            # Move any files whose contents differ from the existing outputs into the output directory
+            written = _publish(staging, outdir)
+        
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        
+        # Remove any unity translation units from previous runs that are no longer required
+        translationUnits = translationUnits if unity is not None else []
+        for stale in set(graph.unity) - set(translationUnits):
+            _remove_generated(outdir, stale)
+        graph.unity = translationUnits
+        
+        # Remove any files from previous runs that are no longer generated, such as the code for deleted .proto files
+        current = set([output for files in outputs.values() for output in files])
+        for stale in set([output for files in graph.outputs.values() for output in files]) - current:
+            _remove_generated(outdir, stale)
+        graph.outputs = outputs
+        
+        # Record the files that were successfully generated so that failed files are retried by the next run
+        graph.update([proto for proto in protos if proto not in failed], signature)
+        graph.save()
+        
+        # Write the dependency manifest and/or depfile if they were requested
+        if manifest is not None or depfile is not None:
+            self._write_dependencies(graph, protos, outdir, manifest, depfile)
+        
+        # Report any failures now that the code for the remaining .proto files has been written
+        if len(failures) > 0:
+            raise ProtoCompilerError(failures)
+        return written
+    
+    def outdated(self, protos, outdir, unity=None, options=None, adapters=False):
+        '''
+        Returns the list of .proto files whose generated code in the specified output directory is out of date,
+        without invoking protoc. This is the list of files that would be regenerated by a call to `codegen()`.
+        '''
+        graph = _ImportGraph(os.path.join(outdir, _INDEX_FILENAME))
+        graph.scan(protos, self._include_dirs(protos))
+        return self._outdated(graph, protos, outdir, self._signature(protos, self._flags(options, adapters) + [json.dumps(unity, sort_keys=True)]))
+    
+    def _flags(self, options=None, adapters=False):
+        '''
+        Returns the list of flags that identify the code generation options, which form part of the signature and cache keys
+        (The adapter plugin is identified by its hash, so that changes to the plugin invalidate previously generated adapters)
+        '''
+        policy = ["--options=" + options.signature()] if options is not None else []
+        plugins = ["--ue4_out=" + _hash_file(_ADAPTER_PLUGIN)] if adapters else []
+        return ["--grpc_out", "--plugin=protoc-gen-grpc", "--cpp_out"] + policy + plugins
+    
+    def _outdated(self, graph, protos, outdir, signature):
+        '''
+        Determines which of the .proto files have changed (or import files that have changed) since they were last generated,
+        or are missing their generated code
+        '''
+        outdated = graph.outdated(protos, signature)
+        roots = self._include_roots(protos)
+        return outdated + [proto for proto in protos if proto not in outdated and not self._outputs_exist(proto, roots, outdir)]
+    
+    def _write_dependencies(self, graph, protos, outdir, manifest, depfile):
+        '''
+        Writes the dependency manifest and/or depfile for the generated code of the specified .proto files
+        
+        protoc refuses to process more than one input file when `--dependency_out` is specified, so rather than
+        invoking it once per file we derive the dependencies from the import graph, which resolves imports the
+        same way that protoc does.
+        '''
+        
+        # Determine the generated files for each .proto file, along with that file's transitive imports
+        rules = []
+        roots = self._include_roots(protos)
+        for proto in protos:
+            outputs = [_normalise(output) for output in self._outputs(proto, roots, outdir) if os.path.exists(output)]
+            inputs = [_normalise(proto)] + sorted(graph.closure(proto))
+            rules.append((outputs, inputs))
+        
+        # Write the JSON manifest, mapping each generated file to the .proto files it was generated from
+        if manifest is not None:
+            data = {
+                "outputs": {output: inputs for outputs, inputs in rules for output in outputs},
+                "inputs": sorted(set([path for outputs, inputs in rules for path in inputs]))
+            }
+            with open(manifest, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, sort_keys=True)
+        
+        # Write the Makefile-style depfile, with one rule for the generated files of each .proto file
+        if depfile is not None:
+            escape = lambda path: path.replace("\\", "/").replace(" ", "\\ ")
+            with open(depfile, "w", encoding="utf-8") as f:
+                for outputs, inputs in rules:
+                    if len(outputs) > 0:
+                        f.write(" \\\n".join([escape(output) for output in outputs]) + ": " + " \\\n ".join([escape(path) for path in inputs]) + "\n")
+    
+    def _unity(self, protos, staging, outdir, max_bytes=None, max_lines=None, prefix=_UNITY_PREFIX):
+        '''
+        Groups the generated sources for the specified .proto files into balanced unity translation units, writing them
+        to the staging directory along with the prepared versions of any newly-generated sources, and returns their filenames
+        (The translation units are written to the root of the output directory and include each source by its relative path)
+        '''
+        if max_bytes is None and max_lines is None:
+            raise ValueError("a `max_bytes` or `max_lines` budget must be specified for unity builds")
+        
+        # Gather the generated sources, preparing any that were generated by this run for inclusion in a unity translation unit
+        # (Sources that were not regenerated by this run were already prepared by a previous run with the same unity settings)
+        sources = []
+        roots = self._include_roots(protos)
+        for proto in protos:
+            for output in self._outputs(proto, roots, outdir):
+                if not output.endswith(".cc"):
+                    continue
+                filename = os.path.relpath(output, outdir)
+                path = os.path.join(staging, filename)
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        source = _prepare_unity_source(f.read(), re.sub(r'\W', "_", filename))
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(source)
+                elif os.path.exists(output):
+                    with open(output, "r", encoding="utf-8") as f:
+                        source = f.read()
+                else:
+                    continue
+                size = len(source.encode("utf-8")) if max_bytes is not None else source.count("\n")
+                sources.append((filename.replace(os.sep, "/"), size, _anonymous_symbols(source)))
+        
+        # Determine the number of translation units required to stay within the budget, and the target size for each of them
+        sources = sorted(sources)
+        total = sum([size for filename, size, symbols in sources])
+        budget = max_bytes if max_bytes is not None else max_lines
+        target = total / max(1, -(-total // max(1, budget)))
+        
+        # Fill each translation unit in turn, starting a new one whenever the target size is reached or when a source
+        # declares a symbol in an anonymous namespace that has already been declared by another source in the current unit
+        units = [[]]
+        size = 0
+        declared = set()
+        for filename, filesize, symbols in sources:
+            if len(units[-1]) > 0 and (size >= target or len(declared & symbols) > 0):
+                units.append([])
+                size = 0
+                declared = set()
+            units[-1].append(filename)
+            size += filesize
+            declared |= symbols
+        
+        # Write the translation units to the staging directory
+        filenames = []
+        for index, unit in enumerate([unit for unit in units if len(unit) > 0]):
+            filename = "{}_{}.cpp".format(prefix, index + 1)
+            with open(os.path.join(staging, filename), "w", encoding="utf-8") as f:
+                f.write("// Unity translation unit generated by grpc_helper, do not edit\n")
+                f.write("#define {} 1\n".format(_UNITY_DEFINE))
+                f.write("".join(["#include \"{}\"\n".format(source) for source in unit]))
+            filenames.append(filename)
+        return filenames
+    
+    def _signature(self, protos, flags):
+        '''
+        Computes a signature identifying the protoc and plugin binaries, the include directories and the code generation flags,
+        such that any change to the signature invalidates all previously generated code
+        '''
+        binaries = []
+        for binary in [self.protoc, self.plugin]:
+            stat = os.stat(binary)
+            binaries.append([binary, stat.st_mtime_ns, stat.st_size])
+        return json.dumps([binaries, self._include_dirs(protos), flags])
+    
+    def _outputs(self, proto, roots, outdir):
+        '''
+        Returns the list of files that protoc may generate in the output directory for the specified .proto file,
+        whose paths mirror the name of the .proto file relative to the include root that protoc resolves it against
+        '''
+        stem = os.path.splitext(_proto_name(proto, roots))[0]
+        return [os.path.join(outdir, stem + suffix) for suffix in _OUTPUT_SUFFIXES]
     
-    def codegen(self, protos, outdir):
+    def _generated(self, proto, roots, directory):
         '''
-        Invokes the protobuf compiler to perform code generation for the specified .proto files
+        Returns the paths relative to the specified directory of the files that are present in it for the specified .proto file
+        '''
+        outputs = [output for output in self._outputs(proto, roots, directory) if os.path.exists(output)]
+        return [os.path.relpath(output, directory).replace(os.sep, "/") for output in outputs]
+    
+    def _outputs_exist(self, proto, roots, outdir):
+        '''
+        Determines whether the protobuf message code for the specified .proto file is present in the output directory
+        '''
+        return all([os.path.exists(output) for output in self._outputs(proto, roots, outdir)[:2]])
+    
+    def _groups(self, pending, graph):
+        '''
+        Splits the specified .proto files into groups that have no import relationships with one another
+        '''
+        
+        # Map each .proto file to the group it belongs to, with every file initially in its own group
+        parent = {proto: proto for proto in pending}
+        def find(proto):
+            while parent[proto] != proto:
+                parent[proto] = parent[parent[proto]]
+                proto = parent[proto]
+            return proto
+        
+        # Merge the groups of any .proto files that import one another, either directly or via a shared import
+        owners = {_normalise(proto): proto for proto in pending}
+        for proto in pending:
+            for path in graph.closure(proto):
+                owner = owners.setdefault(path, proto)
+                parent[find(owner)] = find(proto)
+        
+        # Gather the members of each group, preserving the original ordering of the .proto files
+        groups = {}
+        for proto in pending:
+            groups.setdefault(find(proto), []).append(proto)
+        return list(groups.values())
+    
+    def _schedule(self, pending, graph, jobs):
+        '''
+        Distributes the groups of independent .proto files across the specified number of workers
+        '''
+        
+        # Assign the largest groups first, always placing each group with the least-loaded worker
+        buckets = [[] for _ in range(jobs)]
+        for group in sorted(self._groups(pending, graph), key=len, reverse=True):
+            min(buckets, key=len).extend(group)
+        return [bucket for bucket in buckets if len(bucket) > 0]
+    
+    def _command(self, protos, outdir, roots=[], adapter_launcher=None):
+        '''
+        Returns the protoc command (minus the list of input files) that generates both the gRPC and protobuf code,
+        searching any additional include roots before the include roots of the .proto files themselves
+        
+        If the launcher for the UE4 adapter plugin is specified then the command also generates the adapter code.
+        '''
+        includes = ["-I" + include for include in roots + self._include_roots(protos)]
+        command = [self.protoc] + includes + ["--grpc_out=" + outdir, "--plugin=protoc-gen-grpc=" + self.plugin, "--cpp_out=" + outdir]
+        if adapter_launcher is not None:
+            command.extend(["--plugin=protoc-gen-ue4=" + adapter_launcher, "--ue4_out=" + outdir])
+        return command
+    
+    def _include_roots(self, protos):
+        '''
+        Returns the deduplicated list of include roots for the specified .proto files, in the order they are first referenced
+        '''
+        return _unique([os.path.dirname(proto) or "." for proto in protos])
+    
+    def _include_dirs(self, protos):
+        '''
+        Returns the list of directories that protoc will search when resolving imports for the specified .proto files
+        '''
+        return self._include_roots(protos) + [self._builtin_includes]
+    
+    def _cache_key(self, proto, roots, graph, flags):
+        '''
+        Computes the cache key for a .proto file, based on its contents, the contents of its transitive imports,
+        the protoc and plugin binaries and the code generation flags
+        '''
+        
+        # Compute the hash of the protoc and plugin binaries if we have not already done so
+        if self._toolchain_hash is None:
+            self._toolchain_hash = _hash_file(self.protoc) + _hash_file(self.plugin)
+        
+        # Include the name of the .proto file relative to its include directory, since this determines the output filenames
+        sha = hashlib.sha256()
+        sha.update(self._toolchain_hash.encode("utf-8"))
+        sha.update(json.dumps(flags).encode("utf-8"))
+        sha.update(_proto_name(proto, roots).replace(os.sep, "/").encode("utf-8"))
+        sha.update(graph.hash(proto).encode("utf-8"))
+        
+        # Walk the transitive imports of the .proto file and include each of them in the hash
+        # (Imports are identified by name rather than path, so that cache entries can be shared between different checkouts)
+        pending = [proto]
+        visited = set()
+        while len(pending) > 0:
+            for name, resolved in sorted(graph.imports(pending.pop()), key=lambda edge: edge[0]):
+                if name not in visited:
+                    visited.add(name)
+                    sha.update(name.encode("utf-8"))
+                    sha.update((graph.hash(resolved) if resolved is not None else "").encode("utf-8"))
+                    if resolved is not None:
+                        pending.append(resolved)
+        
+        return sha.hexdigest()
+    
+    def _cache_entry(self, key):
         '''
-        includes = list(_interleave(["-I" for proto in protos], [os.path.dirname(proto) for proto in protos]))
-        subprocess.call([self.protoc] + includes + ["--grpc_out=" + outdir, "--plugin=protoc-gen-grpc=" + self.plugin] + protos)
-        subprocess.call([self.protoc] + includes + ["--cpp_out=" + outdir] + protos)
+        Returns the path to the cache directory for the specified cache key
+        '''
+        return os.path.join(self.cache_dir, key[:2], key)
+    
+    def _restore(self, key, staging):
+        '''
+        Restores the generated code for the specified cache key to the staging directory, returning False on a cache miss
+        '''
+        entry = self._cache_entry(key)
+        if not os.path.isdir(entry):
+            return False
+        
+        # Copy the cached files without preserving their timestamps, so build tools correctly detect any files that have changed
+        # (An entry that is evicted by a concurrent build part way through being copied is treated as a cache miss)
+        try:
+            for root, dirs, files in os.walk(entry):
+                for filename in files:
+                    source = os.path.join(root, filename)
+                    target = os.path.join(staging, os.path.relpath(source, entry))
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copyfile(source, target)
+            
+            # Mark the entry as recently used so that it is evicted after entries that have not been used recently
+            os.utime(entry)
+            return True
+        
+        except OSError:
+            return False
+    
+    def _store(self, key, proto, roots, staging):
+        '''
+        Stores the generated code for the specified .proto file in the cache, preserving the paths of the generated files
+        relative to the staging directory, and returns True if a new cache entry was created
+        '''
+        entry = self._cache_entry(key)
+        if os.path.isdir(entry):
+            return False
+        
+        # Determine which of the generated files for the .proto file are present in the staging directory
+        outputs = [output for output in self._outputs(proto, roots, staging) if os.path.exists(output)]
+        if len(outputs) == 0:
+            return False
+        
+        # Populate a temporary directory and then move it into place, so concurrent builds never observe a partial cache entry
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        temp = tempfile.mkdtemp(dir=os.path.dirname(entry))
+        for output in outputs:
+            target = os.path.join(temp, os.path.relpath(output, staging))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(output, target)
+        try:
+            os.rename(temp, entry)
+            return True
+        except OSError:
+            shutil.rmtree(temp, ignore_errors=True)
+            return False
+    
+    def _evict(self):
+        '''
+        Removes the least recently used cache entries until the cache no longer exceeds its size limit
+        '''
+        if self.cache_size <= 0:
+            return
+        
+        # Determine the size and last use of each cache entry
+        # (The temporary directories of entries that concurrent builds are still populating are ignored)
+        entries = []
+        for entry in glob.glob(os.path.join(self.cache_dir, "*", "*")):
+            if len(os.path.basename(entry)) != 64:
+                continue
+            try:
+                size = sum([os.path.getsize(os.path.join(root, filename)) for root, dirs, files in os.walk(entry) for filename in files])
+                entries.append((os.stat(entry).st_mtime, entry, size))
+            except OSError:
+                pass
+        
+        # Remove the entries that were used least recently until the remaining entries fit within the limit
+        total = sum([size for mtime, entry, size in entries])
+        for mtime, entry, size in sorted(entries):
+            if total <= self.cache_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+class ProtoWatcher():
+    '''
+    Monitors one or more directories of .proto files and regenerates code whenever they change.
+    
+    Consumers can run a watcher like so:
+    
+    ```
+    from grpc_helper import ProtoCompiler, ProtoWatcher
+    compiler = ProtoCompiler(build_data)
+    ProtoWatcher(compiler, ["/path/to/protos"], "/path/to/generated").run()
+    ```
+    
+    Changes are detected using inotify under Linux and by polling file modification times under other
+    platforms. Bursts of edits are debounced so that they only trigger a single regeneration, and only
+    the changed .proto files and the files that import them are regenerated.
+    '''
+    
+    # The inotify event flags that indicate a change to a directory's contents
+    _IN_MODIFY = 0x00000002
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_FROM = 0x00000040
+    _IN_MOVED_TO = 0x00000080
+    _IN_CREATE = 0x00000100
+    _IN_DELETE = 0x00000200
+    _IN_ISDIR = 0x40000000
+    _IN_NONBLOCK = 0x00000800
+    _IN_CLOEXEC = 0x00080000
+    
+    def __init__(self, compiler, roots, outdir, debounce=0.25, interval=1.0, jobs=None, callback=None):
+        '''
+        Creates a new ProtoWatcher that uses the supplied ProtoCompiler to generate code for the .proto files in `roots`.
+        
+        `debounce` specifies how long (in seconds) to wait for further changes before regenerating code, and
+        `interval` specifies how frequently to poll for changes when inotify is unavailable. If `callback` is
+        specified then it is called with the list of changed generated files after each regeneration.
+        '''
+        self.compiler = compiler
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.outdir = outdir
+        self.debounce = debounce
+        self.interval = interval
+        self.jobs = jobs
+        self.callback = callback
+        self._stopped = threading.Event()
+        self._previous = None
+    
+    def protos(self):
+        '''
+        Returns the list of .proto files that are currently present under the watched directories
+        
+        Files closer to the watched directories are listed first, so that their directories come first in the include roots
+        and the generated code for files in subdirectories mirrors the layout of the watched directories.
+        '''
+        protos = set(sum([glob.glob(os.path.join(root, "**", "*.proto"), recursive=True) for root in self.roots], []))
+        return sorted(protos, key=lambda proto: (proto.count(os.sep), proto))
+    
+    def run(self):
+        '''
+        Performs an initial code generation pass and then regenerates code each time the .proto files change,
+        until `stop()` is called or the process is interrupted
+        '''
+        self._regenerate()
+        inotify = self._inotify()
+        try:
+            while not self._stopped.is_set():
+                changed = self._wait_inotify(inotify) if inotify is not None else self._wait_poll()
+                if changed and not self._stopped.is_set():
+                    self._regenerate()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if inotify is not None:
+                os.close(inotify[0])
+    
+    def stop(self):
+        '''
+        Signals a running watcher to stop
+        '''
+        self._stopped.set()
+    
+    def _regenerate(self):
+        '''
+        Regenerates code for the .proto files, reporting rather than propagating any errors so that the watcher keeps running
+        '''
+        try:
+            written = self.compiler.codegen(self.protos(), self.outdir, jobs=self.jobs)
+            if self.callback is not None:
+                self.callback(written)
+        except Exception as err:
+            print("Error: code generation failed: {}".format(err), file=sys.stderr)
+    
+    def _inotify(self):
+        '''
+        Creates an inotify instance watching each of the directories under our roots, returning None if inotify is unavailable
+        '''
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(self._IN_NONBLOCK | self._IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        
+        # inotify watches are not recursive, so we need to add a watch for every directory
+        inotify = (fd, libc)
+        for root in self.roots:
+            for directory, subdirs, files in os.walk(root):
+                self._add_watch(inotify, directory)
+        return inotify
+    
+    def _add_watch(self, inotify, directory):
+        '''
+        Adds an inotify watch for the specified directory
+        '''
+        fd, libc = inotify
+        mask = self._IN_MODIFY | self._IN_CLOSE_WRITE | self._IN_MOVED_FROM | self._IN_MOVED_TO | self._IN_CREATE | self._IN_DELETE
+        libc.inotify_add_watch(fd, os.fsencode(directory), mask)
+    
+    def _read_events(self, inotify, timeout):
+        '''
+        Waits up to `timeout` seconds for inotify events and returns True if any events relevant to .proto files were received
+        '''
+        fd, libc = inotify
+        readable, _, _ = select.select([fd], [], [], timeout)
+        if len(readable) == 0:
+            return False
+        
+        # Parse the `struct inotify_event` records, watching any newly-created directories
+        relevant = False
+        buffer = os.read(fd, 65536)
+        offset = 0
+        while offset + 16 <= len(buffer):
+            wd, mask, cookie, length = struct.unpack_from("iIII", buffer, offset)
+            name = buffer[offset + 16 : offset + 16 + length].rstrip(b"\0").decode("utf-8", errors="replace")
+            offset += 16 + length
+            if mask & self._IN_ISDIR:
+                relevant = True
+                if mask & (self._IN_CREATE | self._IN_MOVED_TO):
+                    for root in self.roots:
+                        for directory, subdirs, files in os.walk(root):
+                            self._add_watch(inotify, directory)
+            elif name.endswith(".proto"):
+                relevant = True
+        return relevant
+    
+    def _wait_inotify(self, inotify):
+        '''
+        Blocks until a burst of changes to .proto files has settled, returning False if no changes were observed
+        '''
+        if not self._read_events(inotify, self.interval):
+            return False
+        while self._read_events(inotify, self.debounce):
+            pass
+        return True
+    
+    def _snapshot(self):
+        '''
+        Returns the modification time and size of each of the .proto files under our roots
+        '''
+        snapshot = {}
+        for proto in self.protos():
+            try:
+                stat = os.stat(proto)
+                snapshot[proto] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+        return snapshot
+    
+    def _wait_poll(self):
+        '''
+        Polls for changes to the .proto files, returning False if no changes were observed
+        '''
+        if self._previous is None:
+            self._previous = self._snapshot()
+        self._stopped.wait(self.interval)
+        current = self._snapshot()
+        if current == self._previous:
+            return False
+        
+        # Keep polling until the files stop changing, so that a burst of edits only triggers a single regeneration
+        while True:
+            self._stopped.wait(self.debounce)
+            settled = self._snapshot()
+            if settled == current:
+                break
+            current = settled
+        self._previous = current
+        return True
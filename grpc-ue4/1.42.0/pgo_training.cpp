@@ -0,0 +1,226 @@
+// Training workload for profile-guided optimisation builds of gRPC.
+//
+// The workload starts an echo server and performs unary and bidirectional streaming calls against it, both over a
+// loopback TCP connection (which exercises the HTTP/2 transport) and over an in-process channel. The calls use the
+// generic API with protobuf messages that are compiled into libprotobuf, so that the workload does not depend on
+// generated code.
+#include <grpcpp/grpcpp.h>
+#include <grpcpp/generic/async_generic_service.h>
+#include <grpcpp/generic/generic_stub.h>
+#include <grpcpp/impl/codegen/proto_utils.h>
+#include <google/protobuf/descriptor.h>
+#include <google/protobuf/descriptor.pb.h>
+#include <google/protobuf/struct.pb.h>
+#include <iostream>
+#include <memory>
+#include <string>
+#include <thread>
+
+namespace
+{
+	const int UnaryCalls = 2000;
+	const int StreamMessages = 4000;
+
+	// Every call has at most one pending operation, so a single tag suffices
+	void* const Tag = reinterpret_cast<void*>(1);
+
+	// Waits for the pending operation on a completion queue, returning whether it succeeded
+	bool Await(grpc::CompletionQueue* Queue)
+	{
+		void* CompletedTag = nullptr;
+		bool Succeeded = false;
+		return Queue->Next(&CompletedTag, &Succeeded) && Succeeded;
+	}
+
+	// Shuts down a completion queue and discards any remaining events
+	void Drain(grpc::CompletionQueue* Queue)
+	{
+		Queue->Shutdown();
+		void* CompletedTag = nullptr;
+		bool Succeeded = false;
+		while (Queue->Next(&CompletedTag, &Succeeded)) {}
+	}
+
+	// Serialises a protobuf message into a gRPC byte buffer
+	template <typename MessageType>
+	bool Serialize(const MessageType& Message, grpc::ByteBuffer* Buffer)
+	{
+		bool OwnBuffer = false;
+		return grpc::SerializationTraits<MessageType>::Serialize(Message, Buffer, &OwnBuffer).ok();
+	}
+
+	// Deserialises a protobuf message from a gRPC byte buffer
+	template <typename MessageType>
+	bool Deserialize(grpc::ByteBuffer* Buffer, MessageType* Message)
+	{
+		return grpc::SerializationTraits<MessageType>::Deserialize(Buffer, Message).ok();
+	}
+
+	// Builds a Struct that resembles a typical game state update
+	google::protobuf::Struct MakeStateUpdate(int Seed)
+	{
+		google::protobuf::Struct State;
+		google::protobuf::Map<std::string, google::protobuf::Value>& Fields = *State.mutable_fields();
+		Fields["name"].set_string_value("player-" + std::to_string(Seed));
+		Fields["health"].set_number_value(Seed * 0.5);
+		Fields["alive"].set_bool_value(Seed % 2 == 0);
+
+		google::protobuf::ListValue* Position = Fields["position"].mutable_list_value();
+		for (int Axis = 0; Axis < 3; ++Axis)
+		{
+			Position->add_values()->set_number_value(Seed + Axis * 0.25);
+		}
+
+		return State;
+	}
+
+	// Echoes each message that the client sends on each call, one call at a time, until the server shuts down
+	// (Unary calls are handled identically, since the client sends exactly one message and then half-closes)
+	void Serve(grpc::AsyncGenericService* Service, grpc::ServerCompletionQueue* Queue)
+	{
+		while (true)
+		{
+			grpc::GenericServerContext Context;
+			grpc::GenericServerAsyncReaderWriter Stream(&Context);
+			Service->RequestCall(&Context, &Stream, Queue, Queue, Tag);
+			if (!Await(Queue))
+			{
+				return;
+			}
+
+			grpc::ByteBuffer Message;
+			while (true)
+			{
+				Stream.Read(&Message, Tag);
+				if (!Await(Queue))
+				{
+					break;
+				}
+
+				Stream.Write(Message, Tag);
+				if (!Await(Queue))
+				{
+					break;
+				}
+			}
+
+			Stream.Finish(grpc::Status::OK, Tag);
+			Await(Queue);
+		}
+	}
+
+	// Performs unary calls with small messages
+	bool RunUnaryCalls(std::shared_ptr<grpc::Channel> Channel)
+	{
+		grpc::GenericStub Stub(Channel);
+		grpc::CompletionQueue Queue;
+		bool Succeeded = true;
+		for (int Call = 0; Call < UnaryCalls && Succeeded; ++Call)
+		{
+			grpc::ByteBuffer Request;
+			grpc::ByteBuffer Response;
+			grpc::ClientContext Context;
+			grpc::Status Status;
+			google::protobuf::Struct Decoded;
+			Succeeded = Serialize(MakeStateUpdate(Call), &Request);
+			if (Succeeded)
+			{
+				auto Reader = Stub.PrepareUnaryCall(&Context, "/pgo.Training/Unary", Request, &Queue);
+				Reader->StartCall();
+				Reader->Finish(&Response, &Status, Tag);
+				Succeeded = Await(&Queue) && Status.ok() && Deserialize(&Response, &Decoded);
+			}
+		}
+
+		Drain(&Queue);
+		return Succeeded;
+	}
+
+	// Performs a bidirectional streaming call, interleaving small messages with occasional large ones
+	bool RunStreamingCall(std::shared_ptr<grpc::Channel> Channel)
+	{
+		google::protobuf::FileDescriptorProto Descriptor;
+		google::protobuf::FileDescriptorProto::descriptor()->file()->CopyTo(&Descriptor);
+
+		grpc::GenericStub Stub(Channel);
+		grpc::CompletionQueue Queue;
+		grpc::ClientContext Context;
+		grpc::Status Status;
+		auto Stream = Stub.PrepareCall(&Context, "/pgo.Training/Stream", &Queue);
+		Stream->StartCall(Tag);
+		bool Succeeded = Await(&Queue);
+		for (int Index = 0; Index < StreamMessages && Succeeded; ++Index)
+		{
+			grpc::ByteBuffer Request;
+			grpc::ByteBuffer Response;
+			if (Index % 16 == 0)
+			{
+				google::protobuf::FileDescriptorProto Decoded;
+				Succeeded = Serialize(Descriptor, &Request);
+				Stream->Write(Request, Tag);
+				Succeeded = Succeeded && Await(&Queue);
+				Stream->Read(&Response, Tag);
+				Succeeded = Succeeded && Await(&Queue) && Deserialize(&Response, &Decoded);
+			}
+			else
+			{
+				google::protobuf::Struct Decoded;
+				Succeeded = Serialize(MakeStateUpdate(Index), &Request);
+				Stream->Write(Request, Tag);
+				Succeeded = Succeeded && Await(&Queue);
+				Stream->Read(&Response, Tag);
+				Succeeded = Succeeded && Await(&Queue) && Deserialize(&Response, &Decoded);
+			}
+		}
+
+		Stream->WritesDone(Tag);
+		Await(&Queue);
+		Stream->Finish(&Status, Tag);
+		Succeeded = Await(&Queue) && Status.ok() && Succeeded;
+		Drain(&Queue);
+		return Succeeded;
+	}
+}
+
+int main()
+{
+	// Start the echo server on an ephemeral loopback port
+	int Port = 0;
+	grpc::AsyncGenericService Service;
+	grpc::ServerBuilder Builder;
+	Builder.AddListeningPort("127.0.0.1:0", grpc::InsecureServerCredentials(), &Port);
+	Builder.RegisterAsyncGenericService(&Service);
+	std::unique_ptr<grpc::ServerCompletionQueue> ServerQueue = Builder.AddCompletionQueue();
+	std::unique_ptr<grpc::Server> Server = Builder.BuildAndStart();
+	if (!Server || Port == 0)
+	{
+		std::cerr << "Failed to start the gRPC server" << std::endl;
+		return 1;
+	}
+	std::thread ServerThread(Serve, &Service, ServerQueue.get());
+
+	// Perform the calls over each type of channel
+	bool Succeeded = true;
+	std::shared_ptr<grpc::Channel> Channels[] = {
+		grpc::CreateChannel("127.0.0.1:" + std::to_string(Port), grpc::InsecureChannelCredentials()),
+		Server->InProcessChannel(grpc::ChannelArguments())
+	};
+	for (const std::shared_ptr<grpc::Channel>& Channel : Channels)
+	{
+		Succeeded = Succeeded && RunUnaryCalls(Channel) && RunStreamingCall(Channel);
+	}
+
+	// Shut down the server
+	Server->Shutdown();
+	ServerThread.join();
+	Drain(ServerQueue.get());
+
+	if (!Succeeded)
+	{
+		std::cerr << "The gRPC training calls failed" << std::endl;
+		return 1;
+	}
+
+	std::cout << "Completed " << UnaryCalls << " unary calls and " << StreamMessages << " streamed messages per channel" << std::endl;
+	return 0;
+}
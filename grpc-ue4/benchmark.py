@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+import argparse, importlib.util, json, os, shutil, statistics, tempfile, time
+
+# The directory containing the recipes for each version of the grpc-ue4 package
+RECIPES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The versions of the grpc-ue4 package that are benchmarked by default
+DEFAULT_VERSIONS = ["1.16.0", "1.30.2", "1.42.0"]
+
+
+def load_helper(version):
+    '''
+    Loads the `grpc_helper` module from the recipe for the specified version of the grpc-ue4 package
+    '''
+    spec = importlib.util.spec_from_file_location("grpc_helper_{}".format(version.replace(".", "_")), os.path.join(RECIPES_DIR, version, "grpc_helper.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def generate_tree(root, files, depth, messages, services, fanout):
+    '''
+    Generates a synthetic tree of .proto files, arranged in `depth` layers where each file imports up to
+    `fanout` files from the layer beneath it, and returns the list of generated files ordered by layer
+    '''
+    
+    # Distribute the files as evenly as possible across the layers
+    # (All files are placed in a single directory, since ProtoCompiler uses the directory of each input file as an include root)
+    layers = [[] for _ in range(depth)]
+    for index in range(files):
+        layers[index % depth].append("layer{}_file{}.proto".format(index % depth, index))
+    
+    for layer, names in enumerate(layers):
+        for position, name in enumerate(names):
+            
+            # Import files from the layer beneath this one, wrapping around so that every file in that layer has dependents
+            imports = []
+            if layer > 0 and len(layers[layer - 1]) > 0:
+                below = layers[layer - 1]
+                imports = sorted(set([below[(position + offset) % len(below)] for offset in range(fanout)]))
+            
+            # Each message embeds the first message of each imported file, so the imports are actually used
+            package = "bench.{}".format(os.path.splitext(os.path.basename(name))[0])
+            lines = ["syntax = \"proto3\";", "package {};".format(package), ""]
+            lines.extend(["import \"{}\";".format(imported) for imported in imports] + [""])
+            for message in range(messages):
+                lines.append("message Message{} {{".format(message))
+                lines.append("    string name = 1;")
+                lines.append("    repeated int64 values = 2;")
+                lines.append("    map<string, bytes> attributes = 3;")
+                for field, imported in enumerate(imports):
+                    importedPackage = "bench.{}".format(os.path.splitext(os.path.basename(imported))[0])
+                    lines.append("    {}.Message0 dependency{} = {};".format(importedPackage, field, field + 4))
+                lines.append("}")
+                lines.append("")
+            
+            # Each service exposes a unary and a streaming method
+            for service in range(services):
+                lines.append("service Service{} {{".format(service))
+                lines.append("    rpc Unary(Message0) returns (Message0);")
+                lines.append("    rpc Stream(stream Message0) returns (stream Message0);")
+                lines.append("}")
+                lines.append("")
+            
+            os.makedirs(root, exist_ok=True)
+            with open(os.path.join(root, name), "w") as f:
+                f.write("\n".join(lines))
+    
+    return [os.path.join(root, name) for names in layers for name in names]
+
+
+def time_codegen(compiler, protos, outdir, jobs):
+    '''
+    Times a single invocation of `ProtoCompiler.codegen`
+    '''
+    start = time.perf_counter()
+    compiler.codegen(protos, outdir, jobs=jobs)
+    return time.perf_counter() - start
+
+
+def benchmark(version, build_data, args):
+    '''
+    Runs each of the benchmark scenarios for the specified version of the grpc-ue4 package
+    '''
+    helper = load_helper(version)
+    timings = {"cold": [], "cached": [], "warm": [], "edit": []}
+    for iteration in range(args.repeat):
+        workdir = tempfile.mkdtemp(prefix="grpc-ue4-benchmark-")
+        try:
+            protos = generate_tree(os.path.join(workdir, "protos"), args.files, args.depth, args.messages, args.services, args.fanout)
+            cache = os.path.join(workdir, "cache")
+            compiler = helper.ProtoCompiler(build_data, cache_dir=cache)
+            
+            # Cold: empty output directory and empty cache
+            outdir = os.path.join(workdir, "cold")
+            os.makedirs(outdir)
+            timings["cold"].append(time_codegen(compiler, protos, outdir, args.jobs))
+            
+            # Cached: empty output directory with a populated cache
+            outdir = os.path.join(workdir, "cached")
+            os.makedirs(outdir)
+            timings["cached"].append(time_codegen(compiler, protos, outdir, args.jobs))
+            
+            # Warm: no changes since the previous run
+            timings["warm"].append(time_codegen(compiler, protos, outdir, args.jobs))
+            
+            # Edit: add a message to a file in the lowest layer, which is imported by files in the layer above it
+            with open(protos[0], "a") as f:
+                f.write("\nmessage Edited{} {{ int32 value = 1; }}\n".format(iteration))
+            timings["edit"].append(time_codegen(compiler, protos, outdir, args.jobs))
+        
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    return {
+        scenario: {"median": statistics.median(samples), "min": min(samples), "max": max(samples), "samples": samples}
+        for scenario, samples in timings.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks ProtoCompiler code generation for synthetic .proto trees across grpc-ue4 versions. " +
+        "The `ue4util` module must be importable (e.g. by adding the ue4util package folder to PYTHONPATH.)"
+    )
+    parser.add_argument("--build-data", nargs=2, action="append", metavar=("VERSION", "JSON"), required=True,
+        help="The `user_info.build_data` value from a built grpc-ue4 package (can be specified once per version)")
+    parser.add_argument("--versions", nargs="+", default=DEFAULT_VERSIONS, help="The grpc-ue4 versions to benchmark (default: all)")
+    parser.add_argument("--files", type=int, default=200, help="Number of .proto files to generate (default: 200)")
+    parser.add_argument("--depth", type=int, default=4, help="Number of import layers (default: 4)")
+    parser.add_argument("--fanout", type=int, default=2, help="Number of imports per file (default: 2)")
+    parser.add_argument("--messages", type=int, default=5, help="Number of messages per file (default: 5)")
+    parser.add_argument("--services", type=int, default=1, help="Number of services per file (default: 1)")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of repetitions of each scenario (default: 3)")
+    parser.add_argument("--jobs", type=int, default=None, help="Number of concurrent protoc invocations (default: CPU count)")
+    parser.add_argument("--output", default=None, help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+    
+    # Verify that we have build data for every version we are benchmarking
+    buildData = dict(args.build_data)
+    missing = [version for version in args.versions if version not in buildData]
+    if len(missing) > 0:
+        parser.error("no build data specified for version(s): {}".format(", ".join(missing)))
+    
+    results = {
+        "parameters": {
+            "files": args.files,
+            "depth": args.depth,
+            "fanout": args.fanout,
+            "messages": args.messages,
+            "services": args.services,
+            "repeat": args.repeat,
+            "jobs": args.jobs
+        },
+        "results": {version: benchmark(version, buildData[version], args) for version in args.versions}
+    }
+    
+    # Report the results
+    serialised = json.dumps(results, indent=4)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            f.write(serialised)
+    else:
+        print(serialised)
+
+
+if __name__ == "__main__":
+    main()
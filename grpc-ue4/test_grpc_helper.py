@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+import asyncio, importlib.util, json, os, shutil, tempfile, unittest
+
+# The directory containing the recipes for each version of the grpc-ue4 package
+RECIPES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The versions of the grpc-ue4 package whose helper modules are tested
+VERSIONS = ["1.16.0", "1.30.2", "1.42.0"]
+
+# The protobuf compiler that the tests generate code with
+PROTOC = shutil.which("protoc")
+
+# The .proto files in the nested tree that the tests generate code for, where `a.proto` imports `sub/n.proto`
+NESTED_TREE = {
+    "a.proto": 'syntax = "proto3";\npackage a;\nimport "sub/n.proto";\nmessage A { n.N value = 1; }\n',
+    os.path.join("sub", "n.proto"): 'syntax = "proto3";\npackage n;\nmessage N { int32 value = 1; }\n'
+}
+
+
+def load_helper(version):
+    '''
+    Loads the `grpc_helper` module from the recipe for the specified version of the grpc-ue4 package
+    '''
+    spec = importlib.util.spec_from_file_location("grpc_helper_{}".format(version.replace(".", "_")), os.path.join(RECIPES_DIR, version, "grpc_helper.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@unittest.skipUnless(importlib.util.find_spec("ue4util") is not None, "the `ue4util` module must be importable")
+@unittest.skipUnless(PROTOC is not None and os.name != "nt", "protoc must be on the PATH of a non-Windows system")
+class NestedTreeTests():
+    '''
+    Tests code generation for a tree of .proto files in which one file is in a subdirectory of another file's directory,
+    so that protoc nests its generated code. The gRPC plugin is replaced with a script that generates no files.
+    
+    The tests are run against the helper module of each version of the grpc-ue4 package, by the test cases below.
+    '''
+    
+    # The version of the grpc-ue4 package whose helper module is tested
+    VERSION = None
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        
+        # Create the stand-in for the gRPC plugin, which discards its request and writes an empty response
+        bindir = os.path.join(self.root, "bin")
+        os.makedirs(bindir)
+        plugin = os.path.join(bindir, "grpc_cpp_plugin")
+        with open(plugin, "w") as f:
+            f.write("#!/bin/sh\ncat > /dev/null\n")
+        os.chmod(plugin, 0o755)
+        
+        # Write the .proto files
+        self.protodir = os.path.join(self.root, "protos")
+        for name, contents in NESTED_TREE.items():
+            self.write_proto(name, contents)
+        self.protos = [os.path.join(self.protodir, name) for name in sorted(NESTED_TREE)]
+        
+        # Create a ProtoCompiler using the helper module, along with an empty output directory for it
+        self.helper = load_helper(self.VERSION)
+        self.compiler = self.helper.ProtoCompiler(json.dumps([os.path.dirname(PROTOC), bindir]), cache_dir="")
+        self.outdir = os.path.join(self.root, "generated")
+        os.makedirs(self.outdir)
+    
+    def write_proto(self, name, contents):
+        '''
+        Writes a .proto file to the nested tree
+        '''
+        path = os.path.join(self.protodir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(contents)
+    
+    def test_codegen_generates_nested_outputs(self):
+        written = self.compiler.codegen(self.protos, self.outdir)
+        self.assertIn(os.path.join(self.outdir, "sub", "n.pb.h"), written)
+        self.assertEqual(self.compiler.outdated(self.protos, self.outdir), [])
+        
+        # Rewriting the files with an option policy should generate the outputs at the same paths
+        policy = self.helper.OptionPolicy()
+        self.compiler.codegen(self.protos, self.outdir, options=policy)
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, "sub", "n.pb.h")))
+        self.assertEqual(self.compiler.outdated(self.protos, self.outdir, options=policy), [])
+    
+    def test_dependencies_list_nested_outputs(self):
+        manifest = os.path.join(self.outdir, "manifest.json")
+        depfile = os.path.join(self.outdir, "protos.d")
+        self.compiler.codegen(self.protos, self.outdir, manifest=manifest, depfile=depfile)
+        
+        # The outputs of the nested file should be listed at their nested paths
+        nested = os.path.join(self.outdir, "sub", "n.pb.cc")
+        with open(manifest, "r") as f:
+            outputs = json.load(f)["outputs"]
+        self.assertEqual(outputs[nested], [os.path.join(self.protodir, "sub", "n.proto")])
+        with open(depfile, "r") as f:
+            self.assertIn(nested, f.read())
+    
+    def test_watcher_does_not_regenerate_unchanged_tree(self):
+        written = []
+        watcher = self.helper.ProtoWatcher(self.compiler, [self.protodir], self.outdir, callback=written.append)
+        
+        # The initial pass should generate the nested outputs, and a subsequent pass should find nothing to do
+        watcher._regenerate()
+        self.assertIn(os.path.join(self.outdir, "sub", "n.pb.h"), written[0])
+        self.assertEqual(self.compiler.outdated(watcher.protos(), self.outdir), [])
+        watcher._regenerate()
+        self.assertEqual(written[1], [])
+        
+        # Changing the nested file should only regenerate it and the file that imports it
+        self.write_proto(os.path.join("sub", "n.proto"), NESTED_TREE[os.path.join("sub", "n.proto")] + "message M {}\n")
+        self.assertEqual(sorted(self.compiler.outdated(watcher.protos(), self.outdir)), self.protos)
+    
+    def test_unity_includes_nested_sources(self):
+        unity = {"max_bytes": 1024 * 1024}
+        self.compiler.codegen(self.protos, self.outdir, unity=unity)
+        
+        # The single translation unit should include the nested source by its path relative to the output directory
+        with open(os.path.join(self.outdir, "ProtoUnity_1.cpp"), "r") as f:
+            self.assertIn('#include "sub/n.pb.cc"', f.read())
+        with open(os.path.join(self.outdir, "sub", "n.pb.cc"), "r") as f:
+            source = f.read()
+        self.assertTrue(source.startswith("#ifdef GRPC_HELPER_UNITY_BUILD"))
+        
+        # Variables whose names include the mangled .proto filename should not be renamed
+        self.assertIn("file_level_metadata_sub_2fn_2eproto[", source)
+        self.assertEqual(self.compiler.outdated(self.protos, self.outdir, unity=unity), [])
+    
+    def test_outputs_of_deleted_protos_are_removed(self):
+        extra = os.path.join(self.protodir, "sub", "extra.proto")
+        self.write_proto(os.path.join("sub", "extra.proto"), 'syntax = "proto3";\npackage extra;\nmessage E {}\n')
+        self.compiler.codegen(self.protos + [extra], self.outdir)
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, "sub", "extra.pb.h")))
+        
+        # Deleting the file should remove its generated code, but leave the code for the remaining files alone
+        os.unlink(extra)
+        self.compiler.codegen(self.protos, self.outdir)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.outdir, "sub"))), ["n.pb.cc", "n.pb.h"])
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, "a.pb.h")))
+    
+    def test_adapters_are_removed_when_disabled(self):
+        self.compiler.codegen(self.protos, self.outdir, adapters=True)
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, "sub", "n.ue4.h")))
+        self.compiler.codegen(self.protos, self.outdir, adapters=False)
+        self.assertFalse(os.path.exists(os.path.join(self.outdir, "sub", "n.ue4.h")))
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, "sub", "n.pb.h")))
+    
+    def test_async_codegen_generates_nested_outputs(self):
+        written = asyncio.run(self.compiler.codegen_async(self.protos, self.outdir))
+        self.assertIn(os.path.join(self.outdir, "sub", "n.pb.h"), written)
+        self.assertEqual(self.compiler.outdated(self.protos, self.outdir), [])
+
+
+# Create a test case that runs the tests against the helper module of each version of the grpc-ue4 package
+for version in VERSIONS:
+    name = "NestedTreeTests_{}".format(version.replace(".", "_"))
+    globals()[name] = type(name, (NestedTreeTests, unittest.TestCase), {"VERSION": version})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,12 +8,23 @@ class MergetiffUe4Conan(ConanFile):
     description = "mergetiff header-only package for Unreal Engine 4"
     generators = "cmake"
     
+    def build_requirements(self):
+        self.build_requires("buildhelper-ue4/0.0.1@{}/{}".format(self.user, self.channel))
+    
     def source(self):
-        self.run("git clone --progress --depth=1 https://github.com/adamrehn/mergetiff-cxx.git -b v{}".format(self.version))
+        from build_helper import BuildTrace, SourceCache
+        with BuildTrace(self).phase("source"):
+            SourceCache(self).clone("https://github.com/adamrehn/mergetiff-cxx.git", ref="v{}".format(self.version))
     
     def build(self):
         
+        # Record the duration and resource usage of each build phase if tracing has been enabled
+        from build_helper import BuildTrace
+        trace = BuildTrace(self)
+        
         # Install the mergetiff headers
         cmake = CMake(self)
-        cmake.configure(source_folder="mergetiff-cxx", args=["-DHEADER_ONLY=ON"])
-        cmake.install()
+        with trace.phase("configure"):
+            cmake.configure(source_folder="mergetiff-cxx", args=["-DHEADER_ONLY=ON"])
+        with trace.phase("install"):
+            cmake.install()
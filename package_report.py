@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# Reports the size and symbol footprint of the built packages for the recipes in this repository.
+#
+# Each package is resolved with `conan install` to find its package folder and the libraries that its `package_info()`
+# method exposes to consumers. Every library in the package's library directories (i.e. every library that
+# `tools.collect_libs()` would list) is then inspected to record its size, the contribution of each of the object files
+# in static libraries, and its exported and undefined symbol counts (when `nm` is available.) Libraries that are
+# present in the package but are not exposed to consumers are flagged, since they add to the package size without
+# being linked (or indicate that a filter in `package_info()` has stopped matching.)
+#
+# The report is written as JSON, and two reports (e.g. from builds with different options) can be compared:
+#
+# Usage: package_report.py [--user USER] [--channel CHANNEL] [--profile PROFILE] [-o OPTION ...] [--output FILE] [PACKAGE[==VERSION] ...]
+#        package_report.py --compare BEFORE AFTER [--threshold PERCENT]
+import argparse, json, os, shutil, subprocess, sys, tempfile
+from build_all import default_channel, discover_recipes, select_recipes
+
+# The file extensions that `tools.collect_libs()` recognises as libraries
+_LIBRARY_EXTENSIONS = [".so", ".lib", ".a", ".dylib", ".bpi"]
+
+# The `nm` symbol types that represent undefined (strong or weak) symbols
+_UNDEFINED_SYMBOL_TYPES = ["U", "w", "v"]
+
+# The filename of the metadata manifest that recipes write to their package folders (see `PackageManifest` in build_helper)
+_MANIFEST = "package-info.json"
+
+# The number of objects with the largest size changes that are listed for each library when comparing reports
+_OBJECTS_PER_LIBRARY = 5
+
+# Lists the libraries in the specified directories, returning a dictionary that maps library names to filenames
+# (This mirrors the logic of `tools.collect_libs()`, including the stripping of the "lib" prefix)
+def _collect_libs(lib_paths):
+    libs = {}
+    for directory in lib_paths:
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            name, extension = os.path.splitext(filename)
+            if extension in _LIBRARY_EXTENSIONS:
+                if extension != ".lib" and name.startswith("lib"):
+                    name = name[3:]
+                libs.setdefault(name, os.path.join(directory, filename))
+    return libs
+
+# Parses the member headers of an archive (a Unix static library or a Windows import or static library), returning
+# a dictionary that maps member names to their sizes in bytes, or None if the file is not an archive
+# (Members with the same name are combined, since `nm` cannot distinguish between them when reporting symbols)
+def _archive_members(filename):
+    members = {}
+    longNames = b""
+    with open(filename, "rb") as f:
+        if f.read(8) != b"!<arch>\n":
+            return None
+        while True:
+            header = f.read(60)
+            if len(header) < 60:
+                break
+            name = header[0:16].decode("utf-8", "replace").rstrip()
+            size = int(header[48:58].decode("ascii").strip())
+            start = f.tell()
+            
+            # BSD archives store long member names at the start of the member data
+            memberSize = size
+            if name.startswith("#1/"):
+                nameLength = int(name[3:])
+                name = f.read(nameLength).decode("utf-8", "replace").rstrip("\0")
+                memberSize = size - nameLength
+            
+            # GNU and Windows archives store long member names in a table, which members reference by offset
+            elif name == "//":
+                longNames = f.read(size)
+                name = None
+            elif name.startswith("/") and name[1:].isdigit():
+                offset = int(name[1:])
+                ends = [end for end in [longNames.find(b"/\n", offset), longNames.find(b"\0", offset)] if end != -1]
+                name = longNames[offset : min(ends) if len(ends) > 0 else len(longNames)].decode("utf-8", "replace")
+            
+            # Symbol tables are not members
+            elif name in ["/", "/SYM64/"] or name.startswith("__.SYMDEF"):
+                name = None
+            elif name.endswith("/"):
+                name = name[:-1]
+            
+            if name is not None:
+                members[name] = members.get(name, 0) + memberSize
+            f.seek(start + size + (size % 2))
+    
+    return members
+
+# Lists the external symbols of the specified library using `nm`, returning a dictionary that maps member names
+# (or None for shared libraries) to (defined symbols, undefined symbols) sets, or None if `nm` is not available
+def _list_symbols(filename, archive):
+    nm = shutil.which("nm")
+    if nm is None:
+        return None
+    
+    # Shared libraries may have had their regular symbol table stripped, so we read their dynamic symbol table instead
+    args = [nm, "-A", "-g"] + (["-D"] if not archive and filename.endswith(".so") else []) + [filename]
+    result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    
+    # Each line is prefixed with the filename and member name, followed by the symbol's value (if any), type and name
+    symbols = {}
+    for line in result.stdout.splitlines():
+        fields = line.rsplit(None, 2)
+        if len(fields) != 3 or not line.startswith(filename + ":"):
+            continue
+        prefix, symbolType, symbol = fields
+        member = prefix[len(filename) + 1 :].split(":")[0] if archive else None
+        defined, undefined = symbols.setdefault(member, (set(), set()))
+        (undefined if symbolType in _UNDEFINED_SYMBOL_TYPES else defined).add(symbol)
+    
+    return symbols
+
+# Inspects a single library, returning its size, the contribution of each of its objects and its symbol counts
+def _inspect_library(filename, rootpath, linked):
+    members = _archive_members(filename)
+    symbols = _list_symbols(filename, members is not None)
+    report = {
+        "file": os.path.relpath(filename, rootpath),
+        "size": os.path.getsize(filename),
+        "linked": linked,
+        "objects": {}
+    }
+    
+    # Record the size and symbol counts of each object in static libraries
+    for member, size in sorted((members or {}).items()):
+        report["objects"][member] = {"size": size}
+        if symbols is not None:
+            defined, undefined = symbols.get(member, (set(), set()))
+            report["objects"][member].update({"exported": len(defined), "undefined": len(undefined)})
+    
+    # Symbols that are undefined in one object but defined by another object in the same library are not external dependencies
+    if symbols is not None:
+        defined = set().union(*[defined for defined, undefined in symbols.values()])
+        undefined = set().union(*[undefined for defined, undefined in symbols.values()]) - defined
+        report["symbols"] = {"exported": len(defined), "undefined": len(undefined)}
+    
+    return report
+
+# Resolves the specified package with `conan install`, returning its dependency information from the JSON generator
+def _resolve_package(reference, user, channel, profile, options):
+    with tempfile.TemporaryDirectory() as folder:
+        command = ["conan", "install", "{}@{}/{}".format(reference, user, channel), "--build", "never", "-g", "json", "--install-folder", folder]
+        command += (["--profile", profile] if profile is not None else []) + sum([["-o", option] for option in options], [])
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        if result.returncode != 0:
+            raise RuntimeError("failed to resolve the package, has it been built? ({})".format(result.stdout.strip().splitlines()[-1] if result.stdout.strip() else "no output"))
+        with open(os.path.join(folder, "conanbuildinfo.json"), "r") as f:
+            info = json.load(f)
+    
+    name = reference.split("/")[0]
+    for dependency in info["dependencies"]:
+        if dependency["name"] == name:
+            return dependency, info.get("options", {}).get(name, {})
+    raise RuntimeError("conan install did not report the package information for {}".format(reference))
+
+# Reads the system libraries listed in the metadata manifest of the specified package folder
+# (Packages created before the manifest was introduced don't contain it, so none of their libraries are known to be system libraries)
+def _system_libs(rootpath):
+    manifest = os.path.join(rootpath, _MANIFEST)
+    if not os.path.exists(manifest):
+        return set()
+    with open(manifest, "r") as f:
+        return set(json.load(f).get("system_libs", []))
+
+# Generates the report for the specified package
+def _report_package(reference, user, channel, profile, options):
+    dependency, packageOptions = _resolve_package(reference, user, channel, profile, options)
+    rootpath = dependency["rootpath"]
+    linked = set(dependency.get("libs", []))
+    
+    # System libraries are exposed to consumers alongside a package's own libraries (e.g. by python-ue4), but are not packaged
+    system = _system_libs(rootpath)
+    libraries = {
+        name: _inspect_library(filename, rootpath, name in linked)
+        for name, filename in _collect_libs(dependency.get("lib_paths", [])).items()
+    }
+    
+    return {
+        "rootpath": rootpath,
+        "options": packageOptions,
+        "size": sum([library["size"] for library in libraries.values()]),
+        "libraries": libraries,
+        "unlinked": sorted([name for name, library in libraries.items() if not library["linked"]]),
+        "missing": sorted(linked - system - set(libraries))
+    }
+
+# Formats a size in bytes for display
+def _format_size(size):
+    for unit in ["B", "KiB", "MiB"]:
+        if abs(size) < 1024:
+            return "{:.1f} {}".format(size, unit) if unit != "B" else "{} {}".format(size, unit)
+        size /= 1024.0
+    return "{:.1f} GiB".format(size)
+
+# Formats the change between two values for display
+def _format_change(before, after):
+    if before == 0:
+        return "new" if after != 0 else "0.0%"
+    return "{:+.1f}%".format((after - before) * 100.0 / before)
+
+# Compares two reports, printing the differences and returning the libraries whose size grew by more than the threshold
+def _compare(before, after, threshold):
+    regressions = []
+    rows = []
+    for reference in sorted(set(before["packages"]) | set(after["packages"])):
+        oldLibraries = before["packages"].get(reference, {}).get("libraries", {})
+        newLibraries = after["packages"].get(reference, {}).get("libraries", {})
+        for name in sorted(set(oldLibraries) | set(newLibraries)):
+            old = oldLibraries.get(name, {"size": 0, "objects": {}, "linked": False})
+            new = newLibraries.get(name, {"size": 0, "objects": {}, "linked": False})
+            
+            # Flag libraries that have appeared in or disappeared from the set of libraries exposed to consumers
+            notes = []
+            if old["linked"] != new["linked"]:
+                notes.append("now linked" if new["linked"] else "no longer linked")
+            if "symbols" in old and "symbols" in new:
+                for kind in ["exported", "undefined"]:
+                    if old["symbols"][kind] != new["symbols"][kind]:
+                        notes.append("{} symbols {} -> {}".format(kind, old["symbols"][kind], new["symbols"][kind]))
+            
+            if old["size"] != new["size"] or len(notes) > 0:
+                rows.append(("{} {}".format(reference, name), _format_size(old["size"]), _format_size(new["size"]), _format_change(old["size"], new["size"]), "; ".join(notes)))
+                
+                # List the objects with the largest size changes
+                objects = set(old["objects"]) | set(new["objects"])
+                changes = [(new["objects"].get(o, {}).get("size", 0) - old["objects"].get(o, {}).get("size", 0), o) for o in objects]
+                changes = sorted([change for change in changes if change[0] != 0], key=lambda change: -abs(change[0]))
+                for change, member in changes[:_OBJECTS_PER_LIBRARY]:
+                    rows.append(("    " + member, "", "", "{:+d} B".format(change), ""))
+            
+            if old["size"] > 0 and threshold is not None and (new["size"] - old["size"]) * 100.0 / old["size"] > threshold:
+                regressions.append("{} {}".format(reference, name))
+    
+    # Print the differences as a table
+    if len(rows) == 0:
+        print("No differences")
+    else:
+        widths = [max([len(row[column]) for row in rows]) for column in range(0, 4)]
+        for row in rows:
+            print("  ".join([row[0].ljust(widths[0])] + [row[column].rjust(widths[column]) for column in range(1, 4)] + [row[4]]).rstrip())
+    
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Reports the size and symbol footprint of the built packages for the recipes in this repository")
+    parser.add_argument("packages", nargs="*", help="packages to report on, specified as NAME or NAME==VERSION (defaults to all packages)")
+    parser.add_argument("--user", default="adamrehn", help="Conan user of the built packages (defaults to adamrehn)")
+    parser.add_argument("--channel", default=None, help="Conan channel of the built packages (defaults to the engine version reported by ue4cli)")
+    parser.add_argument("--profile", default=None, help="Conan profile that the packages were built with (defaults to Conan's default profile)")
+    parser.add_argument("-o", "--option", dest="options", action="append", default=[], help="package option that the packages were built with (e.g. grpc-ue4:lto=True)")
+    parser.add_argument("--output", default=None, help="file to which the JSON report is written (defaults to stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), default=None, help="compare two previously generated reports instead of generating a new one")
+    parser.add_argument("--threshold", type=float, default=None, help="when comparing reports, exit with an error if any library grew by more than this percentage")
+    args = parser.parse_args()
+    
+    try:
+        
+        # Compare two existing reports if requested
+        if args.compare is not None:
+            reports = []
+            for filename in args.compare:
+                with open(filename, "r") as f:
+                    reports.append(json.load(f))
+            regressions = _compare(reports[0], reports[1], args.threshold)
+            if len(regressions) > 0:
+                print("Error: size grew by more than {}% for: {}".format(args.threshold, ", ".join(regressions)), file=sys.stderr)
+                sys.exit(1)
+            return
+        
+        # Discover the recipes and select the ones we are reporting on
+        recipes = discover_recipes(os.path.dirname(os.path.abspath(__file__)))
+        if len(args.packages) > 0:
+            recipes = select_recipes(recipes, args.packages)
+        
+        # Generate the report for each package, skipping packages that have not been built or that do not contain any libraries
+        channel = args.channel if args.channel is not None else default_channel()
+        report = {"user": args.user, "channel": channel, "profile": args.profile, "options": args.options, "packages": {}}
+        for reference in sorted(recipes):
+            try:
+                package = _report_package(reference, args.user, channel, args.profile, args.options)
+            except RuntimeError as e:
+                print("Warning: skipping {}: {}".format(reference, e), file=sys.stderr)
+                continue
+            if len(package["libraries"]) > 0:
+                report["packages"][reference] = package
+            
+            # Warn about libraries that consumers do not link against, or that consumers link against but are missing
+            if len(package["unlinked"]) > 0:
+                print("Warning: {} contains libraries that are not exposed to consumers: {}".format(reference, ", ".join(package["unlinked"])), file=sys.stderr)
+            if len(package["missing"]) > 0:
+                print("Warning: {} exposes libraries that it does not contain: {}".format(reference, ", ".join(package["missing"])), file=sys.stderr)
+    
+    except (OSError, RuntimeError) as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        sys.exit(1)
+    
+    # Write the report
+    output = json.dumps(report, indent=4, sort_keys=True)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
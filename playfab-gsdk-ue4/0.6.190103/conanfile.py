@@ -1,5 +1,5 @@
-from conans import ConanFile, CMake, tools
-import os, shutil
+from conans import ConanFile, tools
+import json, os, shutil
 
 class PlayfabGSDKUe4Conan(ConanFile):
     name = "playfab-gsdk-ue4"
@@ -8,8 +8,8 @@ class PlayfabGSDKUe4Conan(ConanFile):
     url = "https://github.com/adamrehn/ue4-conan-recipes/playfab-gsdk-ue4"
     description = "PlayFab Server SDK custom build for Unreal Engine 4"
     settings = "os", "compiler", "build_type", "arch"
-    options = {"shared": [True, False]}
-    default_options = {"shared": False}
+    options = {"shared": [True, False], "gc_sections": [True, False]}
+    default_options = {"shared": False, "gc_sections": False}
     generators = "cmake"
     exports_sources = ("CMakeLists.txt")
     requires = (
@@ -17,10 +17,19 @@ class PlayfabGSDKUe4Conan(ConanFile):
         "ue4util/ue4@adamrehn/profile"
     )
     
+    def config_options(self):
+        
+        # Section garbage collection is only supported by GCC-compatible toolchains
+        if self.settings.os == "Windows":
+            del self.options.gc_sections
+    
     def requirements(self):
         self.requires("libcurl/ue4@adamrehn/{}".format(self.channel))
         self.requires("OpenSSL/ue4@adamrehn/{}".format(self.channel))
     
+    def build_requirements(self):
+        self.build_requires("buildhelper-ue4/0.0.1@{}/{}".format(self.user, self.channel))
+    
     def cmake_flags(self):
         
         # Determine if we are building the SDK as a shared library or a static library
@@ -44,9 +53,9 @@ class PlayfabGSDKUe4Conan(ConanFile):
             raise RuntimeError("unsupported platform {} - only Linux is currently supported".format(self.settings.os))
         
         # Clone the source code and checkout our target commit
-        self.run("git clone --progress --recursive https://github.com/PlayFab/gsdk.git")
-        with tools.chdir("gsdk"):
-            self.run("git checkout 7d5d6bd")
+        from build_helper import BuildTrace, SourceCache
+        with BuildTrace(self).phase("source"):
+            SourceCache(self).clone("https://github.com/PlayFab/gsdk.git", commit="7d5d6bd", submodules=True)
         
         # Inject our CMakeLists.txt
         shutil.move("CMakeLists.txt", "gsdk/cpp/CMakeLists.txt")
@@ -65,10 +74,22 @@ class PlayfabGSDKUe4Conan(ConanFile):
         LibCxx.set_vars(self)
         
         # Build the SDK
-        cmake = CMake(self)
-        cmake.configure(source_folder="gsdk/cpp", args=self.cmake_flags())
-        cmake.build()
-        cmake.install()
+        # (Hidden symbol visibility is only used for static builds, since the shared library relies on default visibility to export its symbols)
+        from build_helper import RecipeBuild
+        build = RecipeBuild(self, memory_per_job=768, build_size=256, folders=["gsdk"], hidden_visibility=self.options.shared != True)
+        cmake = build.cmake()
+        with build.phase("configure"):
+            cmake.configure(source_folder="gsdk/cpp", build_folder=build.build_folder, args=self.cmake_flags())
+        with build.phase("compile"):
+            cmake.build()
+        with build.phase("install"):
+            cmake.install()
+        build.finish()
+    
+    def package(self):
+        from build_helper import PackageManifest
+        PackageManifest(self).write()
     
     def package_info(self):
-        self.cpp_info.libs = tools.collect_libs(self)
+        manifest = os.path.join(self.package_folder, "package-info.json")
+        self.cpp_info.libs = json.loads(tools.load(manifest))["libs"] if os.path.exists(manifest) else tools.collect_libs(self)
@@ -1,4 +1,5 @@
-from conans import ConanFile, CMake, tools
+from conans import ConanFile, tools
+import json, os
 
 class ProjUe4Conan(ConanFile):
     name = "proj-ue4"
@@ -7,9 +8,20 @@ class ProjUe4Conan(ConanFile):
     url = "https://github.com/adamrehn/ue4-conan-recipes/proj-ue4"
     description = "PROJ custom build for Unreal Engine 4"
     settings = "os", "compiler", "build_type", "arch"
+    options = {"gc_sections": [True, False]}
+    default_options = {"gc_sections": False}
     generators = "cmake"
     requires = ("libcxx/ue4@adamrehn/profile")
     
+    def config_options(self):
+        
+        # Section garbage collection is only supported by GCC-compatible toolchains
+        if self.settings.os == "Windows":
+            del self.options.gc_sections
+    
+    def build_requirements(self):
+        self.build_requires("buildhelper-ue4/0.0.1@{}/{}".format(self.user, self.channel))
+    
     def cmake_flags(self):
         return [
             "-DPROJ_LIB_SUBDIR=lib",
@@ -24,7 +36,9 @@ class ProjUe4Conan(ConanFile):
     def source(self):
         
         # Clone the source code
-        self.run("git clone --progress --depth=1 https://github.com/OSGeo/proj.4.git -b {}".format(self.version))
+        from build_helper import BuildTrace, SourceCache
+        with BuildTrace(self).phase("source"):
+            SourceCache(self).clone("https://github.com/OSGeo/proj.4.git", ref=self.version)
         
         # We need to patch the PROJ CMakeLists to fix a bug when the PROJ binaries are not being built
         tools.replace_in_file(
@@ -50,10 +64,21 @@ class ProjUe4Conan(ConanFile):
         LibCxx.set_vars(self)
         
         # Build PROJ
-        cmake = CMake(self)
-        cmake.configure(source_folder="proj.4", args=self.cmake_flags())
-        cmake.build()
-        cmake.install()
+        from build_helper import RecipeBuild
+        build = RecipeBuild(self, memory_per_job=512, build_size=256, folders=["proj.4"])
+        cmake = build.cmake()
+        with build.phase("configure"):
+            cmake.configure(source_folder="proj.4", build_folder=build.build_folder, args=self.cmake_flags())
+        with build.phase("compile"):
+            cmake.build()
+        with build.phase("install"):
+            cmake.install()
+        build.finish()
+    
+    def package(self):
+        from build_helper import PackageManifest
+        PackageManifest(self).write()
     
     def package_info(self):
-        self.cpp_info.libs = tools.collect_libs(self)
+        manifest = os.path.join(self.package_folder, "package-info.json")
+        self.cpp_info.libs = json.loads(tools.load(manifest))["libs"] if os.path.exists(manifest) else tools.collect_libs(self)
@@ -0,0 +1,95 @@
+// Training workload for profile-guided optimisation builds of libprotobuf.
+//
+// The workload encodes and decodes representative messages: a `Struct` resembling a game state update (strings,
+// numbers, booleans, lists and maps) and the `FileDescriptorProto` for descriptor.proto itself (deeply nested
+// messages with many string and repeated fields.) It uses only the messages that are compiled into libprotobuf,
+// so that it does not depend on protoc.
+#include <google/protobuf/arena.h>
+#include <google/protobuf/descriptor.h>
+#include <google/protobuf/descriptor.pb.h>
+#include <google/protobuf/struct.pb.h>
+#include <google/protobuf/util/json_util.h>
+#include <iostream>
+#include <string>
+
+namespace
+{
+	const int Iterations = 20000;
+
+	// Builds a Struct that resembles a typical game state update
+	google::protobuf::Struct MakeStateUpdate(int Seed)
+	{
+		google::protobuf::Struct State;
+		google::protobuf::Map<std::string, google::protobuf::Value>& Fields = *State.mutable_fields();
+		Fields["name"].set_string_value("player-" + std::to_string(Seed));
+		Fields["health"].set_number_value(Seed * 0.5);
+		Fields["alive"].set_bool_value(Seed % 2 == 0);
+
+		google::protobuf::ListValue* Position = Fields["position"].mutable_list_value();
+		for (int Axis = 0; Axis < 3; ++Axis)
+		{
+			Position->add_values()->set_number_value(Seed + Axis * 0.25);
+		}
+
+		google::protobuf::Map<std::string, google::protobuf::Value>& Inventory = *Fields["inventory"].mutable_struct_value()->mutable_fields();
+		for (int Item = 0; Item < Seed % 16; ++Item)
+		{
+			Inventory["item-" + std::to_string(Item)].set_number_value(Item);
+		}
+
+		return State;
+	}
+}
+
+int main()
+{
+	google::protobuf::FileDescriptorProto Descriptor;
+	google::protobuf::FileDescriptorProto::descriptor()->file()->CopyTo(&Descriptor);
+
+	std::string Encoded;
+	size_t Checksum = 0;
+	for (int Iteration = 0; Iteration < Iterations; ++Iteration)
+	{
+		// Round-trip a small message through the binary wire format, both on the heap and in an arena
+		google::protobuf::Struct State = MakeStateUpdate(Iteration);
+		State.SerializeToString(&Encoded);
+		google::protobuf::Struct Decoded;
+		google::protobuf::Arena Arena;
+		google::protobuf::Struct* ArenaDecoded = google::protobuf::Arena::CreateMessage<google::protobuf::Struct>(&Arena);
+		if (!Decoded.ParseFromString(Encoded) || !ArenaDecoded->ParseFromString(Encoded))
+		{
+			std::cerr << "Failed to parse a state update" << std::endl;
+			return 1;
+		}
+		Checksum += Decoded.fields_size() + Encoded.size();
+
+		// Round-trip a large message less frequently
+		if (Iteration % 8 == 0)
+		{
+			Descriptor.SerializeToString(&Encoded);
+			google::protobuf::FileDescriptorProto DecodedDescriptor;
+			if (!DecodedDescriptor.ParseFromString(Encoded))
+			{
+				std::cerr << "Failed to parse a file descriptor" << std::endl;
+				return 1;
+			}
+			Checksum += DecodedDescriptor.message_type_size() + DecodedDescriptor.ByteSizeLong();
+		}
+
+		// Round-trip a small message through JSON occasionally
+		if (Iteration % 32 == 0)
+		{
+			std::string Json;
+			google::protobuf::Struct Parsed;
+			if (!google::protobuf::util::MessageToJsonString(State, &Json).ok() || !google::protobuf::util::JsonStringToMessage(Json, &Parsed).ok())
+			{
+				std::cerr << "Failed to round-trip a state update through JSON" << std::endl;
+				return 1;
+			}
+			Checksum += Json.size();
+		}
+	}
+
+	std::cout << "Completed " << Iterations << " iterations (checksum " << Checksum << ")" << std::endl;
+	return 0;
+}
@@ -1,4 +1,5 @@
-from conans import ConanFile, CMake, tools
+from conans import ConanFile, tools
+import json, os
 
 class ProtobufUe4Conan(ConanFile):
     name = "protobuf-ue4"
@@ -7,15 +8,39 @@ class ProtobufUe4Conan(ConanFile):
     url = "https://github.com/adamrehn/ue4-conan-recipes/protobuf-ue4"
     description = "Protocol Buffers custom build for Unreal Engine 4"
     settings = "os", "compiler", "build_type", "arch"
+    options = {"split_debug_info": [True, False], "gc_sections": [True, False], "lto": [True, False], "pgo": [True, False]}
+    default_options = {"split_debug_info": False, "gc_sections": False, "lto": False, "pgo": False}
     generators = "cmake"
+    exports = "*.cpp"
     requires = (
         "libcxx/ue4@adamrehn/profile",
         "ue4util/ue4@adamrehn/profile"
     )
     
+    def config_options(self):
+        
+        # Splitting debug information is only supported for ELF binaries
+        if self.settings.os != "Linux":
+            del self.options.split_debug_info
+        
+        # Section garbage collection is only supported by GCC-compatible toolchains
+        if self.settings.os == "Windows":
+            del self.options.gc_sections
+        
+        # Link-time optimisation is not supported under Windows, since MSVC ties the resulting libraries to a specific compiler version
+        if self.settings.os == "Windows":
+            del self.options.lto
+        
+        # Profile-guided optimisation is only supported when building with clang under Linux, since Apple's toolchain lacks `llvm-profdata`
+        if self.settings.os != "Linux" or self.settings.compiler != "clang":
+            del self.options.pgo
+    
     def requirements(self):
         self.requires("zlib/ue4@adamrehn/{}".format(self.channel))
     
+    def build_requirements(self):
+        self.build_requires("buildhelper-ue4/0.0.1@{}/{}".format(self.user, self.channel))
+    
     def cmake_flags(self):
         
         # Generate the CMake flags to ensure the UE4-bundled version of zlib is used
@@ -30,7 +55,9 @@ class ProtobufUe4Conan(ConanFile):
         ]
     
     def source(self):
-        self.run("git clone --progress --depth=1 https://github.com/protocolbuffers/protobuf.git -b v{}".format(self.version))
+        from build_helper import BuildTrace, SourceCache
+        with BuildTrace(self).phase("source"):
+            SourceCache(self).clone("https://github.com/protocolbuffers/protobuf.git", ref="v{}".format(self.version))
         
         # Prevent libprotobuf-lite from being included in our built package
         tools.replace_in_file(
@@ -45,11 +72,37 @@ class ProtobufUe4Conan(ConanFile):
         from libcxx import LibCxx
         LibCxx.set_vars(self)
         
+        # Set up the build first, since both stages of a profile-guided optimisation build share it
+        from build_helper import ProfileGuidedOptimisation, RecipeBuild
+        build = RecipeBuild(self, memory_per_job=1024, build_size=1024, folders=["protobuf"])
+        
+        # If profile-guided optimisation has been requested then build an instrumented copy of libprotobuf and train it with the bundled workload
+        if self.options.get_safe("pgo"):
+            pgo = ProfileGuidedOptimisation(self)
+            with pgo.instrumented():
+                cmake = build.cmake(lto=False)
+                pgo.apply(cmake)
+                with build.phase("pgo-instrumented"):
+                    cmake.configure(source_folder="protobuf/cmake", build_folder=pgo.build_folder, args=self.cmake_flags())
+                    cmake.install()
+                with build.phase("pgo-training"):
+                    pgo.train(["pgo_training.cpp"])
+            pgo.optimise()
+        
         # Build libprotobuf
-        cmake = CMake(self)
-        cmake.configure(source_folder="protobuf/cmake", args=self.cmake_flags())
-        cmake.build()
-        cmake.install()
+        cmake = build.cmake()
+        with build.phase("configure"):
+            cmake.configure(source_folder="protobuf/cmake", build_folder=build.build_folder, args=self.cmake_flags())
+        with build.phase("compile"):
+            cmake.build()
+        with build.phase("install"):
+            cmake.install()
+        build.finish()
+    
+    def package(self):
+        from build_helper import PackageManifest
+        PackageManifest(self).write()
     
     def package_info(self):
-        self.cpp_info.libs = tools.collect_libs(self)
+        manifest = os.path.join(self.package_folder, "package-info.json")
+        self.cpp_info.libs = json.loads(tools.load(manifest))["libs"] if os.path.exists(manifest) else tools.collect_libs(self)
@@ -1,5 +1,5 @@
 from conans import AutoToolsBuildEnvironment, ConanFile, tools
-import io, os
+import io, json, os
 
 class PythonUe4Conan(ConanFile):
     name = "python-ue4"
@@ -8,12 +8,23 @@ class PythonUe4Conan(ConanFile):
     url = "https://github.com/adamrehn/ue4-conan-recipes/python-ue4"
     description = "CPython custom build for Unreal Engine 4"
     settings = "os", "compiler", "build_type", "arch"
+    options = {"gc_sections": [True, False]}
+    default_options = {"gc_sections": False}
     requires = ("libcxx/ue4@adamrehn/profile")
     
+    def config_options(self):
+        
+        # Section garbage collection is only supported by GCC-compatible toolchains
+        if self.settings.os == "Windows":
+            del self.options.gc_sections
+    
     def requirements(self):
         self.requires("OpenSSL/ue4@adamrehn/{}".format(self.channel))
         self.requires("zlib/ue4@adamrehn/{}".format(self.channel))
     
+    def build_requirements(self):
+        self.build_requires("buildhelper-ue4/0.0.1@{}/{}".format(self.user, self.channel))
+    
     def _capture(self, command):
         output = io.StringIO()
         self.run(command, output=output)
@@ -23,7 +34,9 @@ class PythonUe4Conan(ConanFile):
         if self.settings.os != "Windows":
             
             # Clone the CPython source code
-            self.run("git clone --progress --depth=1 https://github.com/python/cpython.git -b v{}".format(self.version))
+            from build_helper import BuildTrace, SourceCache
+            with BuildTrace(self).phase("source"):
+                SourceCache(self).clone("https://github.com/python/cpython.git", ref="v{}".format(self.version))
             
             # Disable the use of the getrandom() function, since this causes issues when statically linking under Linux
             tools.replace_in_file("cpython/configure", "have_getrandom=yes", "have_getrandom=no")
@@ -66,21 +79,44 @@ class PythonUe4Conan(ConanFile):
             LibCxx.set_vars(self)
             
             # Build CPython from source
+            # (Hidden symbol visibility is not used, since extension modules resolve the CPython API symbols from the interpreter,
+            # and CPython is built inside its source tree by autotools, so no separate RAM disk build folder is needed)
+            from build_helper import RecipeBuild
+            build = RecipeBuild(self, memory_per_job=512, build_size=768, folders=["cpython"], build_folder=False, hidden_visibility=False, autotools=True)
             os.chdir("cpython")
             autotools = AutoToolsBuildEnvironment(self)
             LibCxx.fix_autotools(autotools)
-            autotools.configure(args=["--disable-shared"])
-            autotools.make()
-            autotools.install()
+            with build.phase("configure"):
+                autotools.configure(args=["--disable-shared"])
+            with build.phase("compile"):
+                autotools.make(args=["-j{}".format(build.jobs)])
+            with build.phase("install"):
+                autotools.install()
+            build.finish()
     
-    def package_info(self):
-        self.cpp_info.libs = tools.collect_libs(self)
+    def package(self):
         
+        # Record our libraries and the system libraries once, so the config script doesn't need to be run each time the package is resolved
+        from build_helper import PackageManifest
+        PackageManifest(self).write(**self._metadata())
+    
+    def _metadata(self):
+        libs = tools.collect_libs(self, folder="lib")
+        
+        systemLibs = []
         if self.settings.os != "Windows":
             
             # Retrieve the list of required system libraries from the config script
-            os.chdir(os.path.join(self.package_folder, "bin"))
-            output = self._capture("./python3.6-config --libs")
-            libs = [lib.replace("-l", "") for lib in output.split(" ")]
-            libs = [lib for lib in libs if lib not in self.cpp_info.libs + self.deps_cpp_info.libs]
-            self.cpp_info.libs.extend(libs)
+            with tools.chdir(os.path.join(self.package_folder, "bin")):
+                output = self._capture("./python3.6-config --libs")
+            systemLibs = [lib.replace("-l", "") for lib in output.split(" ")]
+            systemLibs = [lib for lib in systemLibs if lib not in libs + self.deps_cpp_info.libs]
+        
+        return {"libs": libs, "system_libs": systemLibs}
+    
+    def package_info(self):
+        manifest = os.path.join(self.package_folder, "package-info.json")
+        metadata = json.loads(tools.load(manifest)) if os.path.exists(manifest) else self._metadata()
+        
+        # The system libraries are passed to consumers alongside our own libraries
+        self.cpp_info.libs = metadata["libs"] + metadata["system_libs"]
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+import json, os, shutil, tempfile, unittest
+from unittest import mock
+import package_report
+
+
+class ReportPackageTests(unittest.TestCase):
+    '''
+    Tests the report for a package whose `package_info()` method exposes system libraries alongside its own libraries,
+    as python-ue4 does. The package is resolved from a fake package folder rather than with `conan install`.
+    '''
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        
+        # Create a package folder containing a single static library
+        self.libdir = os.path.join(self.root, "lib")
+        os.makedirs(self.libdir)
+        with open(os.path.join(self.libdir, "libpython3.6m.a"), "wb") as f:
+            f.write(b"!<arch>\n")
+    
+    def write_manifest(self, libs, system_libs):
+        '''
+        Writes the metadata manifest to the package folder
+        '''
+        with open(os.path.join(self.root, "package-info.json"), "w") as f:
+            json.dump({"libs": libs, "system_libs": system_libs, "defines": [], "binaries": []}, f)
+    
+    def report(self, libs):
+        '''
+        Generates the report for the package, which exposes the specified libraries to consumers
+        '''
+        dependency = {"rootpath": self.root, "libs": libs, "lib_paths": [self.libdir]}
+        with mock.patch.object(package_report, "_resolve_package", return_value=(dependency, {})):
+            return package_report._report_package("python-ue4/3.6.8", "adamrehn", "4.27", None, [])
+    
+    def test_system_libraries_are_not_missing(self):
+        self.write_manifest(["python3.6m"], ["pthread", "dl", "util"])
+        package = self.report(["python3.6m", "pthread", "dl", "util"])
+        self.assertEqual(package["missing"], [])
+        self.assertEqual(package["unlinked"], [])
+        self.assertTrue(package["libraries"]["python3.6m"]["linked"])
+    
+    def test_missing_libraries_are_reported(self):
+        self.write_manifest(["python3.6m", "removed"], ["pthread"])
+        self.assertEqual(self.report(["python3.6m", "removed", "pthread"])["missing"], ["removed"])
+        
+        # Without a manifest, none of the libraries are known to be system libraries
+        os.unlink(os.path.join(self.root, "package-info.json"))
+        self.assertEqual(self.report(["python3.6m", "pthread"])["missing"], ["pthread"])
+
+
+if __name__ == "__main__":
+    unittest.main()